@@ -0,0 +1,296 @@
+"""Frozen copy of the multi-pass plan post-processing that PlanPipeline replaced.
+
+Taken verbatim from services/planner.py and services/schedule.py as they were
+before the fused pipeline, so plan_pipeline_bench keeps measuring the old code
+even as the live modules change. Not imported by the application.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+
+from services.geo import activity_coords, haversine_pairs
+
+
+def _normalize_compact_text(text: str) -> str:
+    return re.sub(r"\s+", " ", (text or "").strip().lower())
+
+
+def _is_travel_placeholder_activity(activity: dict) -> bool:
+    """Detect AI-generated travel-only rows like 'Di chuyển'."""
+    try:
+        place = _normalize_compact_text(str(activity.get("place", "")))
+        if not place:
+            return False
+
+        # Vietnamese placeholders
+        if place == "di chuyển" or place.startswith("di chuyển "):
+            return True
+        if place == "di chuyen" or place.startswith("di chuyen "):
+            return True
+
+        # Common English placeholders
+        if place in {"travel", "transit", "commute", "move"}:
+            return True
+    except Exception:
+        return False
+
+    return False
+
+
+def sanitize_trip_plan(trip_plan: dict) -> dict:
+    """Remove travel-only placeholder activities from a plan."""
+    if not isinstance(trip_plan, dict):
+        return trip_plan
+    days = trip_plan.get("days")
+    if not isinstance(days, list):
+        return trip_plan
+
+    for day in days:
+        if not isinstance(day, dict):
+            continue
+        activities = day.get("activities")
+        if not isinstance(activities, list) or not activities:
+            continue
+        day["activities"] = [
+            a for a in activities
+            if isinstance(a, dict) and not _is_travel_placeholder_activity(a)
+        ]
+
+    return trip_plan
+
+
+@dataclass(frozen=True)
+class ParsedTimeRange:
+    start_min: int
+    end_min: int
+
+    @property
+    def duration_min(self) -> int:
+        return max(0, self.end_min - self.start_min)
+
+
+def _parse_hhmm(text: str) -> Optional[int]:
+    text = (text or "").strip()
+    if not text:
+        return None
+    # Accept HH:MM
+    if ":" not in text:
+        return None
+    hh, mm = text.split(":", 1)
+    try:
+        h = int(hh)
+        m = int(mm)
+    except ValueError:
+        return None
+    if h < 0 or h > 23 or m < 0 or m > 59:
+        return None
+    return h * 60 + m
+
+
+def parse_time_range(time_text: str) -> Optional[ParsedTimeRange]:
+    """Parse strings like '08:00 - 10:00' into minute ranges."""
+    s = (time_text or "").strip()
+    if not s:
+        return None
+
+    # Normalize separators
+    s = s.replace("–", "-").replace("—", "-")
+
+    # Support '08:00-10:00' or '08:00 - 10:00'
+    parts = [p.strip() for p in s.split("-") if p.strip()]
+    if len(parts) < 2:
+        return None
+
+    start = _parse_hhmm(parts[0])
+    end = _parse_hhmm(parts[1])
+    if start is None or end is None:
+        return None
+
+    # If AI outputs reversed times, fix ordering
+    if end < start:
+        start, end = end, start
+
+    return ParsedTimeRange(start_min=start, end_min=end)
+
+
+def format_time_range(start_min: int, end_min: int) -> str:
+    start_min = max(0, int(start_min))
+    end_min = max(0, int(end_min))
+    sh, sm = divmod(start_min, 60)
+    eh, em = divmod(end_min, 60)
+    return f"{sh:02d}:{sm:02d} - {eh:02d}:{em:02d}"
+
+
+# Door-to-door speed (km/h) and fixed overhead (parking, waiting) per travel mode.
+SPEED_PROFILES = {
+    "walking": {"speed_kmh": 4.5, "overhead_min": 0, "fallback_min": 15},
+    "bicycle": {"speed_kmh": 12.0, "overhead_min": 3, "fallback_min": 20},
+    "motorbike": {"speed_kmh": 25.0, "overhead_min": 5, "fallback_min": 25},
+    "car": {"speed_kmh": 22.0, "overhead_min": 8, "fallback_min": 30},
+    "public": {"speed_kmh": 15.0, "overhead_min": 10, "fallback_min": 30},
+}
+DEFAULT_PROFILE = {"speed_kmh": 20.0, "overhead_min": 5, "fallback_min": 20}
+
+# Road distance is longer than the great-circle distance.
+DETOUR_FACTOR = 1.3
+MIN_BUFFER_MIN = 10
+MAX_BUFFER_MIN = 120
+
+
+def travel_profile(travel_mode: Optional[str]) -> dict:
+    mode = (travel_mode or "").strip().lower()
+    if not mode:
+        return DEFAULT_PROFILE
+
+    if "đi bộ" in mode or "di bo" in mode:
+        return SPEED_PROFILES["walking"]
+    if "xe đạp" in mode or "xe dap" in mode:
+        return SPEED_PROFILES["bicycle"]
+    if "xe máy" in mode or "xe may" in mode:
+        return SPEED_PROFILES["motorbike"]
+    if "ô tô" in mode or "oto" in mode or "o to" in mode:
+        return SPEED_PROFILES["car"]
+    if "công cộng" in mode or "cong cong" in mode:
+        return SPEED_PROFILES["public"]
+
+    return DEFAULT_PROFILE
+
+
+def buffer_minutes_for_mode(travel_mode: Optional[str]) -> int:
+    return travel_profile(travel_mode)["fallback_min"]
+
+
+def travel_buffers_for_plan(days: list[Any], travel_mode: Optional[str]) -> list[list[int]]:
+    """Buffer (minutes) before each activity, from the distance to the previous one.
+
+    All consecutive pairs of the plan are evaluated in one vectorized pass.
+    Gaps where either side lacks coordinates fall back to the per-mode default.
+    """
+    profile = travel_profile(travel_mode)
+    fallback = profile["fallback_min"]
+
+    buffers: list[list[int]] = []
+    pair_slots: list[tuple[int, int]] = []
+    prev_coords: list[tuple[float, float]] = []
+    next_coords: list[tuple[float, float]] = []
+
+    for d, day in enumerate(days):
+        activities = day.get("activities") if isinstance(day, dict) else None
+        if not isinstance(activities, list):
+            buffers.append([])
+            continue
+        coords, valid = activity_coords(activities)
+        buffers.append([fallback] * len(activities))
+        for i in range(1, len(activities)):
+            if valid[i - 1] and valid[i]:
+                pair_slots.append((d, i))
+                prev_coords.append(tuple(coords[i - 1]))
+                next_coords.append(tuple(coords[i]))
+
+    if not pair_slots:
+        return buffers
+
+    km = haversine_pairs(np.asarray(prev_coords), np.asarray(next_coords)) * DETOUR_FACTOR
+    minutes = profile["overhead_min"] + km / profile["speed_kmh"] * 60.0
+    # Round up to the next 5 minutes so schedules stay readable.
+    minutes = np.clip(np.ceil(minutes / 5.0) * 5.0, MIN_BUFFER_MIN, MAX_BUFFER_MIN).astype(int)
+
+    for (d, i), value in zip(pair_slots, minutes.tolist()):
+        buffers[d][i] = value
+    return buffers
+
+
+def apply_time_buffers(trip_plan: dict[str, Any], *,
+                       active_time_start: Optional[int],
+                       active_time_end: Optional[int],
+                       travel_mode: Optional[str]) -> dict[str, Any]:
+
+    start_floor = None
+    if isinstance(active_time_start, int) and 0 <= active_time_start <= 23:
+        start_floor = active_time_start * 60
+
+    end_cap = None
+    if isinstance(active_time_end, int) and 0 <= active_time_end <= 23:
+        end_cap = active_time_end * 60
+
+    days = trip_plan.get("days")
+    if not isinstance(days, list):
+        return trip_plan
+
+    day_buffers = travel_buffers_for_plan(days, travel_mode)
+
+    for day, buffers in zip(days, day_buffers):
+        activities = day.get("activities") if isinstance(day, dict) else None
+        if not isinstance(activities, list) or len(activities) == 0:
+            continue
+
+        current_end = None
+
+        force_sequential = start_floor is not None
+
+        for idx, activity in enumerate(activities):
+            if not isinstance(activity, dict):
+                continue
+
+            parsed = parse_time_range(str(activity.get("time", "")))
+            if parsed is None:
+                continue
+
+            duration = max(30, parsed.duration_min)  # never shorter than 30min
+
+            if idx == 0:
+                start = parsed.start_min
+                if start_floor is not None:
+                    # Force the day to begin at the configured start hour.
+                    # This avoids AI plans always starting at 09:00.
+                    start = start_floor
+                end = start + duration
+                activity["time"] = format_time_range(start, end)
+                current_end = end
+                continue
+
+            if current_end is None:
+                current_end = parsed.end_min
+
+            # Enforce buffer between previous end and next start
+            desired_start = current_end + buffers[idx]
+            # If active_time_start is set, schedule sequentially from the day start,
+            # ignoring the AI-provided absolute times to optimize earlier starts.
+            start = desired_start if force_sequential else max(parsed.start_min, desired_start)
+            end = start + duration
+
+            if end_cap is not None:
+                # We do not try to squeeze earlier activities; only cap extreme overflow.
+                end = min(end, end_cap)
+                start = min(start, end)
+
+            activity["time"] = format_time_range(start, end)
+            current_end = end
+
+    return trip_plan
+
+
+def cap_activities_per_day(trip_plan: dict[str, Any], *, max_per_day: int = 8) -> dict[str, Any]:
+    """Cap number of activities per day to avoid overly dense itineraries."""
+    if not isinstance(max_per_day, int) or max_per_day <= 0:
+        return trip_plan
+
+    days = trip_plan.get("days")
+    if not isinstance(days, list):
+        return trip_plan
+
+    for day in days:
+        if not isinstance(day, dict):
+            continue
+        activities = day.get("activities")
+        if not isinstance(activities, list):
+            continue
+        if len(activities) > max_per_day:
+            day["activities"] = activities[:max_per_day]
+
+    return trip_plan
@@ -0,0 +1,88 @@
+"""Benchmark: legacy multi-pass plan post-processing vs. the fused PlanPipeline.
+
+The legacy side runs the frozen pre-pipeline code in benchmarks/legacy_postprocess.py.
+
+Run from backend/:  python -m benchmarks.plan_pipeline_bench [n_plans]
+"""
+import copy
+import random
+import sys
+import time
+
+from benchmarks import legacy_postprocess as legacy
+from services.plan_pipeline import SANITIZE_PIPELINE, SAVE_PIPELINE, is_normalized
+
+CHUNK = 5000
+PLACES = ["Bảo tàng", "Chợ đêm", "Bãi biển", "Chùa", "Quán cà phê", "Công viên", "Nhà hàng", "Phố cổ"]
+
+
+def _make_plan(rng: random.Random) -> dict:
+    days = []
+    for d in range(rng.randint(1, 5)):
+        activities = []
+        hour = 8
+        for _ in range(rng.randint(4, 11)):
+            place = "Di chuyển" if rng.random() < 0.15 else f"{rng.choice(PLACES)} {rng.randint(1, 99)}"
+            activities.append({
+                "time": f"{hour:02d}:00 - {hour + 1:02d}:30",
+                "place": place,
+                "description": "...",
+                "place_details": {"lat": 16.0 + rng.random() * 0.1, "lng": 108.2 + rng.random() * 0.1},
+            })
+            hour = min(hour + 2, 21)
+        days.append({"day": d + 1, "activities": activities})
+    return {"trip_name": "bench", "days": days}
+
+
+def _legacy_save(plan: dict) -> dict:
+    plan = legacy.sanitize_trip_plan(plan)
+    plan = legacy.cap_activities_per_day(plan, max_per_day=8)
+    return legacy.apply_time_buffers(plan, active_time_start=8, active_time_end=22, travel_mode="driving")
+
+
+def _fused_save(plan: dict) -> dict:
+    return SAVE_PIPELINE.run(plan, active_time_start=8, active_time_end=22, travel_mode="driving")
+
+
+def _legacy_read(plan: dict) -> dict:
+    # Before stamping, every read re-sanitized the plan.
+    return legacy.sanitize_trip_plan(plan)
+
+
+def _read(plan: dict) -> dict:
+    if is_normalized(plan):
+        return plan
+    return SANITIZE_PIPELINE.run(plan)
+
+
+def _time(fn, plans: list) -> float:
+    t0 = time.perf_counter()
+    for plan in plans:
+        fn(plan)
+    return time.perf_counter() - t0
+
+
+def main(n_plans: int = 100_000) -> None:
+    rng = random.Random(42)
+    totals = {"legacy_save": 0.0, "fused_save": 0.0, "read_legacy": 0.0, "read_stamped": 0.0}
+
+    done = 0
+    while done < n_plans:
+        size = min(CHUNK, n_plans - done)
+        corpus = [_make_plan(rng) for _ in range(size)]
+
+        totals["legacy_save"] += _time(_legacy_save, copy.deepcopy(corpus))
+        stamped = copy.deepcopy(corpus)
+        totals["fused_save"] += _time(_fused_save, stamped)
+        totals["read_legacy"] += _time(_legacy_read, copy.deepcopy(corpus))
+        totals["read_stamped"] += _time(_read, stamped)
+        done += size
+
+    print(f"[INFO] {n_plans} plans")
+    for name, seconds in totals.items():
+        print(f"  {name:<13} {seconds:8.2f}s  {seconds / n_plans * 1e6:8.1f} us/plan")
+    print(f"  save speedup  {totals['legacy_save'] / totals['fused_save']:.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,59 @@
+"""Benchmark: per-plan vs. batched re-scheduling with the array-backed schedule engine.
+
+Run from backend/:  python -m benchmarks.schedule_bench [n_plans]
+"""
+import copy
+import random
+import sys
+import time
+
+from services.schedule import apply_time_buffers, apply_time_buffers_batch
+
+CHUNK = 5000
+
+
+def _make_plan(rng: random.Random) -> dict:
+    days = []
+    for d in range(rng.randint(1, 5)):
+        activities = []
+        for i in range(rng.randint(3, 8)):
+            hour = 8 + i * 2
+            activities.append({
+                "time": f"{hour:02d}:00 - {hour + 1:02d}:30",
+                "place": f"Địa điểm {i}",
+                "place_details": {"lat": 16.0 + rng.random() * 0.1, "lng": 108.2 + rng.random() * 0.1},
+            })
+        days.append({"day": d + 1, "activities": activities})
+    return {"days": days}
+
+
+def main(n_plans: int = 100_000) -> None:
+    rng = random.Random(7)
+    per_plan = batched = 0.0
+    overflow = 0
+
+    done = 0
+    while done < n_plans:
+        size = min(CHUNK, n_plans - done)
+        corpus = [_make_plan(rng) for _ in range(size)]
+
+        plans = copy.deepcopy(corpus)
+        t0 = time.perf_counter()
+        for plan in plans:
+            apply_time_buffers(plan, active_time_start=8, active_time_end=22, travel_mode="xe máy")
+        per_plan += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        overflow += apply_time_buffers_batch(
+            corpus, active_time_start=8, active_time_end=22, travel_modes=["xe máy"] * size,
+        )
+        batched += time.perf_counter() - t0
+        done += size
+
+    print(f"[INFO] {n_plans} plans, {overflow} activities clamped at day end")
+    print(f"  per plan  {per_plan:8.2f}s  {per_plan / n_plans * 1e6:8.1f} us/plan")
+    print(f"  batched   {batched:8.2f}s  {batched / n_plans * 1e6:8.1f} us/plan")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
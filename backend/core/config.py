@@ -25,14 +25,85 @@ GENERATION_CONFIG = {
     "top_k": 40,
 }
 
+# Plans use the compact JSON contract: no code fences or prose around the object.
+PLAN_GENERATION_CONFIG = {**GENERATION_CONFIG, "response_mime_type": "application/json"}
+
 SAFETY_SETTINGS = [
     {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
     {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
 ]
 
-# Initialize Gemini model
-model = genai.GenerativeModel(
-    'gemini-2.5-pro',
-    generation_config=GENERATION_CONFIG,
-    safety_settings=SAFETY_SETTINGS
-)
+# Gemini model tiers, ordered from slowest/most capable to fastest.
+# The router falls back along this list when a tier breaches its budget.
+GEMINI_MODEL_TIERS = [
+    os.getenv("GEMINI_TIER_PRO", "gemini-2.5-pro"),
+    os.getenv("GEMINI_TIER_FLASH", "gemini-2.5-flash"),
+    os.getenv("GEMINI_TIER_LITE", "gemini-2.5-flash-lite"),
+]
+
+# Per-task model registry: primary model, generation config, hard timeout (s)
+# and latency budget (s) used to decide when a tier is too slow.
+LLM_TASKS = {
+    "plan": {
+        "model": os.getenv("GEMINI_PLAN_MODEL", GEMINI_MODEL_TIERS[0]),
+        "generation_config": PLAN_GENERATION_CONFIG,
+        "timeout": float(os.getenv("GEMINI_PLAN_TIMEOUT", "90")),
+        "latency_budget": float(os.getenv("GEMINI_PLAN_LATENCY_BUDGET", "60")),
+    },
+    "day": {
+        "model": os.getenv("GEMINI_DAY_MODEL", GEMINI_MODEL_TIERS[1]),
+        "generation_config": PLAN_GENERATION_CONFIG,
+        "timeout": float(os.getenv("GEMINI_DAY_TIMEOUT", "45")),
+        "latency_budget": float(os.getenv("GEMINI_DAY_LATENCY_BUDGET", "25")),
+    },
+    "blog": {
+        "model": os.getenv("GEMINI_BLOG_MODEL", GEMINI_MODEL_TIERS[1]),
+        "generation_config": {**GENERATION_CONFIG, "temperature": 0.9},
+        "timeout": float(os.getenv("GEMINI_BLOG_TIMEOUT", "60")),
+        "latency_budget": float(os.getenv("GEMINI_BLOG_LATENCY_BUDGET", "40")),
+    },
+    "podcast": {
+        "model": os.getenv("GEMINI_PODCAST_MODEL", GEMINI_MODEL_TIERS[1]),
+        "generation_config": {**GENERATION_CONFIG, "temperature": 0.9},
+        "timeout": float(os.getenv("GEMINI_PODCAST_TIMEOUT", "45")),
+        "latency_budget": float(os.getenv("GEMINI_PODCAST_LATENCY_BUDGET", "30")),
+    },
+}
+
+# Health window used to trip a tier: last N calls, max error rate, cooldown (s)
+LLM_HEALTH_WINDOW = int(os.getenv("LLM_HEALTH_WINDOW", "20"))
+LLM_ERROR_BUDGET = float(os.getenv("LLM_ERROR_BUDGET", "0.5"))
+LLM_TIER_COOLDOWN = float(os.getenv("LLM_TIER_COOLDOWN", "120"))
+
+# LLM admission control: concurrent Gemini calls, queued waiters, queue deadline (s)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "20"))
+
+# Background jobs: worker concurrency, result TTL (s), worker lease (s), max persisted result size,
+# and runs per job before it is marked failed (overload retries and expired leases count)
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "2"))
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "3600"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_RESULT_MAX_BYTES = int(os.getenv("JOB_RESULT_MAX_BYTES", "900000"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+
+# Firestore: threads for blocking client calls issued from async handlers
+FIRESTORE_MAX_WORKERS = int(os.getenv("FIRESTORE_MAX_WORKERS", "16"))
+
+# Catalog: serve /api/catalog/trips from a snapshot-listener-fed in-memory copy
+CATALOG_CACHE_ENABLED = os.getenv("CATALOG_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Public profile fields (author name/photo): process cache TTL (s) and max entries
+USER_PROFILE_CACHE_TTL = float(os.getenv("USER_PROFILE_CACHE_TTL", "60"))
+USER_PROFILE_CACHE_SIZE = int(os.getenv("USER_PROFILE_CACHE_SIZE", "10000"))
+
+# Counters: shards per hot counter (0/1 disables sharding), increments/s per doc before
+# sharding kicks in, and seconds between shard roll-ups
+COUNTER_SHARDS = int(os.getenv("COUNTER_SHARDS", "8"))
+COUNTER_HOT_RATE = float(os.getenv("COUNTER_HOT_RATE", "1"))
+COUNTER_ROLLUP_INTERVAL = float(os.getenv("COUNTER_ROLLUP_INTERVAL", "30"))
+
+# Trip views: buffered in memory and flushed every interval (s) or once this many are pending
+VIEW_FLUSH_INTERVAL = float(os.getenv("VIEW_FLUSH_INTERVAL", "10"))
+VIEW_FLUSH_MAX_PENDING = int(os.getenv("VIEW_FLUSH_MAX_PENDING", "500"))
@@ -1,7 +1,13 @@
 """Database configuration and connections"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
 from firebase import get_db
 from google.cloud import firestore as firestore_module
 
+from core.config import FIRESTORE_MAX_WORKERS
+
 # Create a wrapper to call get_db() each time (since it's a lazy-loading function)
 class DatabaseWrapper:
     def __call__(self):
@@ -16,3 +22,47 @@ db = DatabaseWrapper()
 
 # Export firestore module for queries
 firestore = firestore_module
+
+
+# Non-blocking access for async handlers.
+# The sync client is thread-safe, so its calls run on a bounded pool instead of
+# the event loop; the pool size caps concurrent Firestore round trips per worker.
+_executor = ThreadPoolExecutor(max_workers=FIRESTORE_MAX_WORKERS, thread_name_prefix="firestore")
+
+
+async def run_db(fn, *args, **kwargs):
+    """Run any blocking Firestore work (transactions, service helpers) off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def get_doc(ref):
+    return await run_db(ref.get)
+
+
+async def get_all(refs: list, field_paths: list = None) -> list:
+    """Fetch many documents in one batched round trip (missing ones have exists=False)."""
+    if not refs:
+        return []
+    return await run_db(lambda: list(db.get_all(refs, field_paths=field_paths)))
+
+
+async def stream_docs(query) -> list:
+    """Run a query and collect its snapshots."""
+    return await run_db(lambda: list(query.stream()))
+
+
+async def set_doc(ref, data: dict, merge: bool = False):
+    return await run_db(ref.set, data, merge=merge)
+
+
+async def update_doc(ref, data: dict):
+    return await run_db(ref.update, data)
+
+
+async def delete_doc(ref):
+    return await run_db(ref.delete)
+
+
+def shutdown_db_executor():
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -10,7 +10,16 @@ from routers.trips import router as trips_router
 from routers.profile import router as profile_router
 from routers.blog import router as blog_router
 from routers.catalog import router as catalog_router
+from routers.jobs import router as jobs_router
 from firebase import get_current_user
+from core.config import CATALOG_CACHE_ENABLED
+from core.database import shutdown_db_executor
+from services.admission import llm_admission
+from services.llm import llm_router
+from services.jobs import job_manager
+from services.catalog_cache import catalog_cache
+from services.counters import counters
+from services.view_buffer import view_buffer
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -49,6 +58,25 @@ app.include_router(trips_router, tags=["Trips"])
 app.include_router(profile_router, tags=["Profile"])
 app.include_router(blog_router, tags=["Blog"])
 app.include_router(catalog_router, tags=["Catalog"])
+app.include_router(jobs_router, tags=["Jobs"])
+
+
+@app.on_event("startup")
+async def start_background_services():
+    await job_manager.start()
+    await counters.start()
+    await view_buffer.start()
+    if CATALOG_CACHE_ENABLED:
+        catalog_cache.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    await job_manager.stop()
+    await view_buffer.stop()
+    await counters.stop()
+    catalog_cache.stop()
+    shutdown_db_executor()
 
 
 @app.get("/")
@@ -80,6 +108,15 @@ async def test_auth(user = Depends(get_current_user)):
     }
 
 
+@app.get("/api/metrics/llm")
+async def llm_metrics():
+    """LLM admission queue and model tier health"""
+    return {
+        "admission": llm_admission.metrics(),
+        "tiers": llm_router.status(),
+    }
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
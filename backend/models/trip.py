@@ -16,6 +16,8 @@ class TripRequest(BaseModel):
     categories: Optional[list] = []
     active_time_start: Optional[int] = 8
     active_time_end: Optional[int] = 22
+    # Opt-in: fork a similar public trip instead of generating with Gemini
+    instant: Optional[bool] = False
 
 
 class RatingRequest(BaseModel):
@@ -34,6 +36,10 @@ class UpdateTripPlanRequest(BaseModel):
     trip_plan: dict
 
 
+class RegenerateDayRequest(BaseModel):
+    instructions: Optional[str] = ""
+
+
 class TogglePublicRequest(BaseModel):
     is_public: bool
     category_tags: Optional[list] = []
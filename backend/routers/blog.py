@@ -1,29 +1,32 @@
 """Blog management router"""
 from fastapi import APIRouter, Depends, Request
 from fastapi.responses import JSONResponse
+from google.api_core.exceptions import NotFound
 from datetime import datetime
 import re
 
 from firebase import get_current_user
-from core.database import db, firestore
+from core.database import db, set_doc, stream_docs
 from models.blog import BlogCreateRequest, BlogGenerateRequest, CommentCreate
 from services.ai import generate_blog_from_trip
+from services.admission import LLMOverloadedError, overloaded_response
+from services.counters import counters
+from services.reactions import ReactionTargetNotFound, cast_blog_vote, remove_blog_comment
+from services.user_profiles import UserProfileLoader, get_profile_loader
 
 router = APIRouter()
 
 
 @router.post("/api/blog/create")
-async def create_blog_post(blog_data: BlogCreateRequest, user = Depends(get_current_user)):
+async def create_blog_post(blog_data: BlogCreateRequest, user = Depends(get_current_user),
+                           profiles: UserProfileLoader = Depends(get_profile_loader)):
     """Create a new blog post"""
     try:
         blog_id = f"{user['uid']}_{int(datetime.now().timestamp())}"
         slug = re.sub(r'[^a-z0-9]+', '-', blog_data.title.lower()).strip('-')
         
-        user_doc = db.collection("users").document(user["uid"]).get()
-        author_name = "Anonymous"
-        if user_doc.exists:
-            user_data = user_doc.to_dict()
-            author_name = user_data.get("username", user.get("email", "Anonymous"))
+        user_data = await profiles.load(user["uid"])
+        author_name = (user_data or {}).get("username") or user.get("email", "Anonymous")
         
         blog_post = {
             "id": blog_id,
@@ -46,7 +49,7 @@ async def create_blog_post(blog_data: BlogCreateRequest, user = Depends(get_curr
             "is_published": True,
         }
         
-        db.collection("blogs").document(blog_id).set(blog_post)
+        await set_doc(db.collection("blogs").document(blog_id), blog_post)
         
         return JSONResponse(content={"success": True, "slug": slug, "id": blog_id})
     
@@ -59,30 +62,36 @@ async def generate_blog_from_trip_endpoint(request: BlogGenerateRequest, user =
     """Generate blog content from a trip using AI"""
     try:
         trip_ref = db.collection("trips").where("user_id", "==", user['uid']).where("id", "==", request.trip_id).limit(1)
-        trips = list(trip_ref.stream())
+        trips = await stream_docs(trip_ref)
         
         if not trips:
             return JSONResponse(status_code=404, content={"error": "Trip not found"})
         
         trip_data = trips[0].to_dict()
-        blog_content = await generate_blog_from_trip(trip_data)
+        blog_content = await generate_blog_from_trip(trip_data, user=user)
         
         return JSONResponse(content={"success": True, "blog": blog_content})
     
+    except LLMOverloadedError as e:
+        return overloaded_response(e)
+    
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": "Failed to generate blog", "details": str(e)})
 
 
 @router.get("/api/blogs")
-async def get_blogs(page: int = 1, limit: int = 10):
+async def get_blogs(page: int = 1, limit: int = 10,
+                    profiles: UserProfileLoader = Depends(get_profile_loader)):
     """Get published blog posts"""
     try:
         blogs_ref = db.collection("blogs").where("is_published", "==", True)
-        blogs = blogs_ref.stream()
+        blogs = await stream_docs(blogs_ref)
         
         blogs_list = []
+        authors = {}
         for blog in blogs:
             blog_data = blog.to_dict()
+            authors[blog.id] = blog_data.get("user_id")
             blogs_list.append({
                 "id": blog.id,
                 "title": blog_data.get("title"),
@@ -107,6 +116,12 @@ async def get_blogs(page: int = 1, limit: int = 10):
         end_idx = start_idx + limit
         paginated_blogs = blogs_list[start_idx:end_idx]
         
+        # Current author names for the page, one batched read for uncached authors
+        profiles_by_uid = await profiles.load_many(authors[b["id"]] for b in paginated_blogs)
+        for blog in paginated_blogs:
+            profile = profiles_by_uid.get(authors[blog["id"]]) or {}
+            blog["author"] = profile.get("username") or blog["author"]
+        
         return JSONResponse(content={"blogs": paginated_blogs})
     
     except Exception as e:
@@ -126,65 +141,33 @@ async def vote_blog(blog_id: str, request: Request, user: dict = Depends(get_cur
         if vote_type not in ["up", "down"]:
             return JSONResponse(status_code=400, content={"error": "Invalid vote type"})
         
-        blog_ref = db.collection("blogs").document(blog_id)
-        blog_doc = blog_ref.get()
-        
-        if not blog_doc.exists:
-            return JSONResponse(status_code=404, content={"error": "Blog not found"})
-        
-        blog_data = blog_doc.to_dict()
-        
-        votes_ref = db.collection("blog_votes").where("blog_id", "==", blog_id).where("user_id", "==", user["uid"])
-        existing_votes = list(votes_ref.stream())
-        
-        if existing_votes:
-            old_vote = existing_votes[0]
-            old_vote_data = old_vote.to_dict()
-            
-            if old_vote_data.get("vote_type") == vote_type:
-                return JSONResponse(content={"message": "Already voted"})
-            
-            old_vote.reference.delete()
-            
-            if old_vote_data.get("vote_type") == "up":
-                blog_ref.update({"upvotes": max(0, blog_data.get("upvotes", 0) - 1)})
-            else:
-                blog_ref.update({"downvotes": max(0, blog_data.get("downvotes", 0) - 1)})
-        
-        vote_id = f"{blog_id}_{user['uid']}"
-        db.collection("blog_votes").document(vote_id).set({
-            "blog_id": blog_id,
-            "user_id": user["uid"],
-            "vote_type": vote_type,
-            "created_at": datetime.now().isoformat()
-        })
-        
-        if vote_type == "up":
-            blog_ref.update({"upvotes": blog_data.get("upvotes", 0) + 1})
-        else:
-            blog_ref.update({"downvotes": blog_data.get("downvotes", 0) + 1})
-        
-        return JSONResponse(content={"message": "Vote added", "vote_type": vote_type})
+        result = await cast_blog_vote(blog_id, user["uid"], vote_type)
+        return JSONResponse(content=result)
     
+    except ReactionTargetNotFound:
+        return JSONResponse(status_code=404, content={"error": "Blog not found"})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 
 @router.get("/api/blog/{blog_id}/comments")
-async def get_blog_comments(blog_id: str):
+async def get_blog_comments(blog_id: str, profiles: UserProfileLoader = Depends(get_profile_loader)):
     """Get comments for a blog post"""
     try:
         comments_ref = db.collection("blog_comments").where("blog_id", "==", blog_id)
-        comments = comments_ref.stream()
+        comments = await stream_docs(comments_ref)
+        
+        comment_docs = [comment.to_dict() for comment in comments]
+        profiles_by_uid = await profiles.load_many(c.get("user_id") for c in comment_docs)
         
         comments_list = []
-        for comment in comments:
-            comment_data = comment.to_dict()
+        for comment, comment_data in zip(comments, comment_docs):
+            profile = profiles_by_uid.get(comment_data.get("user_id")) or {}
             comments_list.append({
                 "id": comment.id,
                 "user_id": comment_data.get("user_id"),
-                "user_name": comment_data.get("user_name"),
-                "user_photo": comment_data.get("user_photo"),
+                "user_name": profile.get("username") or comment_data.get("user_name"),
+                "user_photo": profile.get("photo_url") or comment_data.get("user_photo"),
                 "content": comment_data.get("content"),
                 "created_at": comment_data.get("created_at"),
                 "likes": comment_data.get("likes", 0),
@@ -200,14 +183,14 @@ async def get_blog_comments(blog_id: str):
 
 
 @router.post("/api/blog/{blog_id}/comments")
-async def add_blog_comment(blog_id: str, comment: CommentCreate, user: dict = Depends(get_current_user)):
+async def add_blog_comment(blog_id: str, comment: CommentCreate, user: dict = Depends(get_current_user),
+                           profiles: UserProfileLoader = Depends(get_profile_loader)):
     """Add a comment to a blog post"""
     if not user:
         return JSONResponse(status_code=401, content={"error": "Authentication required"})
     
     try:
-        user_doc = db.collection("users").document(user["uid"]).get()
-        user_data = user_doc.to_dict() if user_doc.exists else {}
+        user_data = await profiles.load(user["uid"])
         
         comment_id = f"{blog_id}_{user['uid']}_{int(datetime.now().timestamp())}"
         comment_data = {
@@ -220,12 +203,12 @@ async def add_blog_comment(blog_id: str, comment: CommentCreate, user: dict = De
             "likes": 0,
         }
         
-        db.collection("blog_comments").document(comment_id).set(comment_data)
+        await set_doc(db.collection("blog_comments").document(comment_id), comment_data)
         
-        blog_ref = db.collection("blogs").document(blog_id)
-        blog_doc = blog_ref.get()
-        if blog_doc.exists:
-            blog_ref.update({"comments_count": blog_doc.to_dict().get("comments_count", 0) + 1})
+        try:
+            await counters.increment(db.collection("blogs").document(blog_id), "comments_count", 1)
+        except NotFound:
+            pass
         
         return JSONResponse(content={"message": "Comment added", "comment": {**comment_data, "id": comment_id}})
     
@@ -240,24 +223,13 @@ async def delete_blog_comment(blog_id: str, comment_id: str, user: dict = Depend
         return JSONResponse(status_code=401, content={"error": "Authentication required"})
     
     try:
-        comment_ref = db.collection("blog_comments").document(comment_id)
-        comment_doc = comment_ref.get()
-        
-        if not comment_doc.exists:
-            return JSONResponse(status_code=404, content={"error": "Comment not found"})
-        
-        comment_data = comment_doc.to_dict()
-        if comment_data.get("user_id") != user["uid"]:
-            return JSONResponse(status_code=403, content={"error": "Not authorized to delete this comment"})
-        
-        comment_ref.delete()
-        
-        blog_ref = db.collection("blogs").document(blog_id)
-        blog_doc = blog_ref.get()
-        if blog_doc.exists:
-            blog_ref.update({"comments_count": max(0, blog_doc.to_dict().get("comments_count", 0) - 1)})
+        await remove_blog_comment(blog_id, comment_id, user["uid"])
         
         return JSONResponse(content={"message": "Comment deleted"})
     
+    except ReactionTargetNotFound:
+        return JSONResponse(status_code=404, content={"error": "Comment not found"})
+    except PermissionError:
+        return JSONResponse(status_code=403, content={"error": "Not authorized to delete this comment"})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
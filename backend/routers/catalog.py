@@ -1,9 +1,13 @@
 """Catalog router for public trips"""
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from fastapi.responses import JSONResponse
 from typing import Optional
 
-from core.database import db
+from core.database import db, get_doc, stream_docs
+from services.catalog_cache import catalog_cache
+from services.catalog_index import (DURATION_BUCKETS, SORT_ORDERS, catalog_card, catalog_query, count_catalog,
+                                    decode_cursor, encode_cursor, matches_search, normalize_tags)
+from services.user_profiles import UserProfileLoader, get_profile_loader
 
 router = APIRouter()
 
@@ -16,122 +20,114 @@ async def get_catalog_trips(
     budget: Optional[str] = None,
     category_tags: Optional[str] = None,
     sort_by: str = "newest",
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    profiles: UserProfileLoader = Depends(get_profile_loader)
 ):
-    """Get all public trips for the catalog with filters"""
+    """Get public trips for the catalog with filters.
+
+    Served from the in-memory catalog when its listener is live, otherwise as
+    one indexed query on catalog_index. Pass the returned `next_cursor` as
+    `cursor` to fetch the following page.
+    """
     try:
-        # Query all public trips from the trips collection
-        query = db.collection("trips").where("is_public", "==", True)
-        
-        if budget:
-            query = query.where("budget", "==", budget)
-        
-        trips = query.stream()
-        trips_list = []
-        
-        for trip in trips:
-            trip_data = trip.to_dict()
-            
-            # Apply additional filters
-            if duration:
-                if duration == "1" and trip_data.get("duration") != 1:
-                    continue
-                elif duration == "2-3" and trip_data.get("duration") not in [2, 3]:
-                    continue
-                elif duration == "4-7" and not (4 <= trip_data.get("duration", 0) <= 7):
-                    continue
-                elif duration == "7+" and trip_data.get("duration", 0) <= 7:
-                    continue
-            
-            if category_tags:
-                tag_mapping = {
-                    "Văn hóa": ["Văn hóa", "culture"],
-                    "Phiêu lưu": ["Phiêu lưu", "adventure"],
-                    "Thư giãn": ["Thư giãn", "relaxation", "relax"],
-                    "Thiên nhiên": ["Thiên nhiên", "nature"],
-                    "Ẩm thực": ["Ẩm thực", "food"],
-                    "Mua sắm": ["Mua sắm", "shopping"],
-                    "Lịch sử": ["Lịch sử", "history"],
-                    "Giải trí đêm": ["Giải trí đêm", "nightlife"],
-                    "Nhiếp ảnh": ["Nhiếp ảnh", "photography"],
-                }
-                tags = [t.strip() for t in category_tags.split(",")]
-                trip_tags = trip_data.get("category_tags", [])
-                expanded_tags = []
-                for tag in tags:
-                    if tag in tag_mapping:
-                        expanded_tags.extend(tag_mapping[tag])
-                    else:
-                        expanded_tags.append(tag)
-                trip_tags_lower = [t.lower() for t in trip_tags]
-                expanded_tags_lower = [t.lower() for t in expanded_tags]
-                if not any(t in trip_tags_lower for t in expanded_tags_lower):
-                    continue
-            
-            if search:
-                search_lower = search.lower()
-                destination = trip_data.get("destination", "").lower()
-                trip_name = trip_data.get("trip_plan", {}).get("trip_name", "").lower()
-                if search_lower not in destination and search_lower not in trip_name:
-                    continue
-            
-            # Get user info
-            user_id = trip_data.get("user_id")
-            user_doc = db.collection("users").document(user_id).get()
-            user_data = user_doc.to_dict() if user_doc.exists else {}
-            
-            trips_list.append({
-                "trip_id": trip.id,
-                "user_id": user_id,
-                "username": user_data.get("username", "Anonymous"),
-                "photo_url": user_data.get("photo_url", ""),
-                "destination": trip_data.get("destination"),
-                "duration": trip_data.get("duration"),
-                "budget": trip_data.get("budget"),
-                "start_date": trip_data.get("start_date"),
-                "trip_name": trip_data.get("trip_plan", {}).get("trip_name", ""),
-                "overview": trip_data.get("trip_plan", {}).get("overview", ""),
-                "category_tags": trip_data.get("category_tags", []),
-                "cover_image": trip_data.get("cover_image"),
-                "views_count": trip_data.get("views_count", 0),
-                "likes_count": trip_data.get("likes_count", 0),
-                "rating": trip_data.get("rating") if trip_data.get("rating") and trip_data.get("rating") > 0 else None,
-                "published_at": trip_data.get("published_at", trip_data.get("created_at")),
-                "activity_level": trip_data.get("activity_level", "medium"),
-                "travel_group": trip_data.get("travel_group", "solo"),
-            })
-        
-        # Sort trips
-        if sort_by == "newest":
-            trips_list.sort(key=lambda x: x.get("published_at", ""), reverse=True)
-        elif sort_by == "popular":
-            trips_list.sort(key=lambda x: (x.get("likes_count", 0), x.get("views_count", 0)), reverse=True)
-        elif sort_by == "views":
-            trips_list.sort(key=lambda x: x.get("views_count", 0), reverse=True)
-        
-        # Pagination
-        total = len(trips_list)
-        start_idx = (page - 1) * limit
-        end_idx = start_idx + limit
-        paginated_trips = trips_list[start_idx:end_idx]
-        
+        limit = max(1, min(limit, 100))
+        if sort_by not in SORT_ORDERS:
+            sort_by = "newest"
+        if duration and duration not in DURATION_BUCKETS:
+            return JSONResponse(status_code=400, content={"error": "Invalid duration filter"})
+
+        tags = normalize_tags(t.strip() for t in category_tags.split(",")) if category_tags else []
+        search = (search or "").strip()
+        try:
+            after = decode_cursor(cursor, sort_by) if cursor else None
+        except ValueError:
+            return JSONResponse(status_code=400, content={"error": "Invalid cursor"})
+        # Page numbers without a cursor (old clients / deep links) fall back to an offset.
+        offset = 0 if after else (max(page, 1) - 1) * limit
+
+        if catalog_cache.ready:
+            entries, total, next_cursor = catalog_cache.page(
+                sort_by=sort_by, limit=limit, budget=budget, duration=duration,
+                tags=tags, search=search, after=after, offset=offset,
+            )
+        else:
+            query = catalog_query(budget=budget, duration=duration, tags=tags, sort_by=sort_by)
+            start_query = query
+            if after:
+                start_query = query.start_after({k: v for k, v in after.items() if k != "__score__"})
+            elif offset and not search:
+                start_query = query.offset(offset)
+
+            # Searches filter after the query, so their offset counts matches, not rows.
+            entries = await _scan_page(query, start_query, limit, search, skip=offset if search else 0)
+            has_more = len(entries) > limit
+            entries = entries[:limit]
+            next_cursor = encode_cursor(entries[-1], sort_by) if has_more and entries else None
+
+            # Exact totals come from a count aggregation; searches are filtered
+            # after the query (unranked), so their total is not known up front.
+            total = None if search else await count_catalog(query)
+
+        # Summaries copy the author's name and photo; overlay the current ones
+        # (one batched read for authors not in the profile cache).
+        authors = await profiles.load_many(entry.get("user_id") for entry in entries)
+        cards = []
+        for entry in entries:
+            card = catalog_card(entry)
+            author = authors.get(entry.get("user_id")) or {}
+            card["username"] = author.get("username") or card.get("username", "Anonymous")
+            card["photo_url"] = author.get("photo_url") or card.get("photo_url", "")
+            cards.append(card)
+
         return JSONResponse(content={
-            "trips": paginated_trips,
+            "trips": cards,
             "total": total,
             "page": page,
             "limit": limit,
-            "has_more": end_idx < total
+            "has_more": next_cursor is not None,
+            "next_cursor": next_cursor,
         })
     
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": "Failed to fetch catalog trips", "details": str(e)})
 
 
+async def _scan_page(query, start_query, limit: int, search: str, skip: int = 0) -> list:
+    """Up to limit + 1 entries (the extra one signals another page).
+
+    Without a search this is a single `limit + 1` read; with one, the query is
+    walked in chunks until enough entries match, after dropping the first
+    `skip` matches (page-number requests without a cursor).
+    """
+    if not search:
+        docs = await stream_docs(start_query.limit(limit + 1))
+        return [doc.to_dict() for doc in docs]
+
+    chunk = max(limit * 4, 50)
+    matches = []
+    current = start_query
+    while True:
+        docs = await stream_docs(current.limit(chunk))
+        for doc in docs:
+            entry = doc.to_dict()
+            if matches_search(entry, search):
+                if skip:
+                    skip -= 1
+                    continue
+                matches.append(entry)
+                if len(matches) > limit:
+                    return matches
+        if len(docs) < chunk:
+            return matches
+        current = query.start_after(docs[-1])
+
+
 @router.get("/api/public-trip/{trip_id}")
-async def get_public_trip(trip_id: str):
+async def get_public_trip(trip_id: str, profiles: UserProfileLoader = Depends(get_profile_loader)):
     """Get a specific public trip"""
     try:
-        trip_doc = db.collection("trips").document(trip_id).get()
+        trip_doc = await get_doc(db.collection("trips").document(trip_id))
         
         if not trip_doc.exists:
             return JSONResponse(status_code=404, content={"error": "Trip not found"})
@@ -142,9 +138,7 @@ async def get_public_trip(trip_id: str):
             return JSONResponse(status_code=403, content={"error": "This trip is not public"})
         
         # Get user info
-        user_id = trip_data.get("user_id")
-        user_doc = db.collection("users").document(user_id).get()
-        user_data = user_doc.to_dict() if user_doc.exists else {}
+        user_data = await profiles.load(trip_data.get("user_id"))
         
         trip_data["username"] = user_data.get("username", "Anonymous")
         trip_data["user_photo"] = user_data.get("photo_url", "")
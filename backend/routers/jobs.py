@@ -0,0 +1,118 @@
+"""Background job router for long-running generation work"""
+from fastapi import APIRouter, Depends, Header
+from fastapi.responses import JSONResponse
+from typing import Optional
+
+from firebase import get_current_user, get_optional_user
+from models.blog import BlogGenerateRequest
+from models.trip import TripRequest
+from services.jobs import job_manager, JobNotFoundError, is_job_owner
+
+router = APIRouter()
+
+
+def _job_status(job: dict) -> dict:
+    status = {
+        "job_id": job.get("id"),
+        "kind": job.get("kind"),
+        "status": job.get("status"),
+        "attempts": job.get("attempts", 0),
+        "error": job.get("error"),
+        "created_at": job.get("created_at"),
+        "updated_at": job.get("updated_at"),
+        "expires_at": job.get("expires_at"),
+    }
+    if job.get("owner_token"):
+        # Only present right after an anonymous submit; send it back as X-Job-Token.
+        status["job_token"] = job["owner_token"]
+    return status
+
+
+async def _load_owned_job(job_id: str, user, job_token: Optional[str]):
+    """Return (job, None) or (None, error_response) after an ownership check."""
+    try:
+        job = await job_manager.get(job_id)
+    except JobNotFoundError:
+        return None, JSONResponse(status_code=404, content={"error": "Job not found"})
+
+    if not is_job_owner(job, user, job_token):
+        return None, JSONResponse(status_code=403, content={"error": "Not authorized"})
+    return job, None
+
+
+@router.post("/api/jobs/plan-trip")
+async def submit_plan_job(trip_request: TripRequest, user = Depends(get_optional_user)):
+    """Queue trip planning and return a job id immediately"""
+    try:
+        job = await job_manager.submit("plan", {"trip_request": trip_request.model_dump()}, user)
+        return JSONResponse(status_code=202, content=_job_status(job))
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": "Failed to submit job", "details": str(e)})
+
+
+@router.post("/api/jobs/blog/generate-from-trip")
+async def submit_blog_job(request: BlogGenerateRequest, user = Depends(get_current_user)):
+    """Queue blog generation from a trip"""
+    try:
+        job = await job_manager.submit("blog", {"trip_id": request.trip_id}, user)
+        return JSONResponse(status_code=202, content=_job_status(job))
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": "Failed to submit job", "details": str(e)})
+
+
+@router.post("/api/jobs/trip/{trip_id}/generate-podcast")
+async def submit_podcast_job(trip_id: str, language: str = "vi", user = Depends(get_current_user)):
+    """Queue podcast generation for a trip"""
+    try:
+        job = await job_manager.submit("podcast", {"trip_id": trip_id, "language": language}, user)
+        return JSONResponse(status_code=202, content=_job_status(job))
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": "Failed to submit job", "details": str(e)})
+
+
+@router.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str, user = Depends(get_optional_user),
+                        job_token: Optional[str] = Header(None, alias="X-Job-Token")):
+    """Get job status"""
+    try:
+        job, error = await _load_owned_job(job_id, user, job_token)
+        if error:
+            return error
+        return JSONResponse(content=_job_status(job))
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": "Failed to fetch job", "details": str(e)})
+
+
+@router.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str, user = Depends(get_optional_user),
+                        job_token: Optional[str] = Header(None, alias="X-Job-Token")):
+    """Get job result once it has succeeded"""
+    try:
+        job, error = await _load_owned_job(job_id, user, job_token)
+        if error:
+            return error
+
+        status = job.get("status")
+        if status == "succeeded":
+            return JSONResponse(content=job.get("result") or {})
+        if status == "failed":
+            return JSONResponse(status_code=500, content={"error": "Job failed", "details": job.get("error")})
+        if status == "cancelled":
+            return JSONResponse(status_code=410, content={"error": "Job was cancelled"})
+        return JSONResponse(status_code=202, content=_job_status(job))
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": "Failed to fetch job result", "details": str(e)})
+
+
+@router.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str, user = Depends(get_optional_user),
+                    job_token: Optional[str] = Header(None, alias="X-Job-Token")):
+    """Cancel a queued or running job"""
+    try:
+        job, error = await _load_owned_job(job_id, user, job_token)
+        if error:
+            return error
+        job = await job_manager.cancel(job_id)
+        return JSONResponse(content=_job_status(job))
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": "Failed to cancel job", "details": str(e)})
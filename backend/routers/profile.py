@@ -2,33 +2,39 @@
 from fastapi import APIRouter, Depends, Request
 from fastapi.responses import JSONResponse
 from datetime import datetime
+from typing import Optional
 
 from firebase import get_current_user
-from core.database import db, firestore
+from core.database import db, firestore, get_all, get_doc, run_db, set_doc, stream_docs, update_doc
+from services.catalog_index import catalog_ref, update_author_in_catalog
 from services.gamification import (calculate_user_stats, get_user_badges, 
                                   calculate_user_level, calculate_level_progress)
+from services.pagination import decode_page_token, encode_page_token
 
 router = APIRouter()
 
+# Rounds of like reads per liked-trips page when private/deleted trips leave it short.
+MAX_LIKE_READS = 3
+
 
 @router.get("/api/user/profile")
 async def get_user_profile(user = Depends(get_current_user)):
     """Get user profile information"""
     try:
-        user_doc = db.collection("users").document(user['uid']).get()
+        user_doc = await get_doc(db.collection("users").document(user['uid']))
         user_data = user_doc.to_dict() if user_doc.exists else {}
         
         # Get trip count
         trips_ref = db.collection("trips").where("user_id", "==", user['uid'])
-        total_trips = len(list(trips_ref.stream()))
+        total_trips = len(await stream_docs(trips_ref))
         
         #Get public trips count
         public_trips_ref = db.collection("trips").where("user_id", "==", user['uid']).where("is_public", "==", True)
-        public_trips_count = len(list(public_trips_ref.stream()))
+        public_trips_count = len(await stream_docs(public_trips_ref))
         
         # Get liked trips count
         liked_ref = db.collection("trip_likes").where("user_id", "==", user['uid'])
-        liked_count = len(list(liked_ref.stream()))
+        liked_count = len(await stream_docs(liked_ref))
         
         profile = {
             "uid": user['uid'],
@@ -56,19 +62,19 @@ async def get_complete_profile(user = Depends(get_current_user)):
         user_id = user['uid']
         
         # Get basic profile
-        user_doc = db.collection("users").document(user_id).get()
+        user_doc = await get_doc(db.collection("users").document(user_id))
         user_data = user_doc.to_dict() if user_doc.exists else {}
         
         # Calculate statistics
-        stats = calculate_user_stats(user_id)
-        badges = get_user_badges(user_id)
+        stats = await run_db(calculate_user_stats, user_id)
+        badges = await run_db(get_user_badges, user_id)
         earned_badges = [b for b in badges if b.get("earned")]
         level_info = calculate_user_level(stats)
         progress_to_next = calculate_level_progress(stats)
         
         # Get recent trips
         trips_ref = db.collection("trips").where("user_id", "==", user_id)
-        all_trips = list(trips_ref.stream())
+        all_trips = await stream_docs(trips_ref)
         # Sort in Python and take first 5
         all_trips.sort(key=lambda x: x.to_dict().get("created_at", ""), reverse=True)
         recent_trips = []
@@ -85,7 +91,7 @@ async def get_complete_profile(user = Depends(get_current_user)):
         
         # Get liked trips count
         liked_trips_ref = db.collection("trip_likes").where("user_id", "==", user_id)
-        liked_count = len(list(liked_trips_ref.stream()))
+        liked_count = len(await stream_docs(liked_trips_ref))
         
         return JSONResponse(content={
             "success": True,
@@ -128,10 +134,10 @@ async def update_user_profile(request: Request, user = Depends(get_current_user)
         data = await request.json()
         
         user_ref = db.collection("users").document(user['uid'])
-        user_doc = user_ref.get()
+        user_doc = await get_doc(user_ref)
         
         if not user_doc.exists:
-            user_ref.set({
+            await set_doc(user_ref, {
                 "email": user.get("email"),
                 "created_at": datetime.now().isoformat()
             })
@@ -158,10 +164,17 @@ async def update_user_profile(request: Request, user = Depends(get_current_user)
         
         if update_data:
             update_data["updated_at"] = datetime.now().isoformat()
-            user_ref.update(update_data)
+            await update_doc(user_ref, update_data)
+            previous = user_doc.to_dict() if user_doc.exists else {}
+            author_changes = {
+                k: update_data[k] for k in ("username", "photo_url")
+                if k in update_data and update_data[k] != previous.get(k)
+            }
+            if author_changes:
+                await update_author_in_catalog(user['uid'], author_changes)
         
         # Get updated profile to return
-        updated_doc = user_ref.get()
+        updated_doc = await get_doc(user_ref)
         updated_data = updated_doc.to_dict() if updated_doc.exists else {}
         
         return JSONResponse(content={
@@ -182,32 +195,73 @@ async def update_user_profile(request: Request, user = Depends(get_current_user)
 
 
 @router.get("/api/user/liked-trips")
-async def get_liked_trips(user = Depends(get_current_user)):
-    """Get all trips that the user has liked"""
+async def get_liked_trips(limit: int = 50, cursor: Optional[str] = None, user = Depends(get_current_user)):
+    """Get trips the user has liked, newest like first.
+
+    Pages of likes are resolved with one batched read of their catalog
+    summaries; pass `next_cursor` back as `cursor` for the next page.
+    Private or deleted trips are skipped and more likes are read to fill
+    the page, up to MAX_LIKE_READS rounds, so a page can still come back
+    short while `has_more` is true.
+    """
     try:
-        likes_ref = db.collection("trip_likes").where("user_id", "==", user['uid'])
-        likes = likes_ref.stream()
-        
+        limit = max(1, min(limit, 100))
+        likes_query = (
+            db.collection("trip_likes")
+            .where("user_id", "==", user['uid'])
+            .order_by("created_at", direction=firestore.Query.DESCENDING)
+            .order_by("__name__", direction=firestore.Query.DESCENDING)
+        )
+        if cursor:
+            try:
+                token = decode_page_token(cursor)
+                likes_query = likes_query.start_after({"created_at": token["c"], "__name__": token["id"]})
+            except (KeyError, ValueError):
+                return JSONResponse(status_code=400, content={"success": False, "error": "Invalid cursor"})
+
         liked_trips = []
-        for like in likes:
-            like_data = like.to_dict()
-            trip_id = like_data.get("trip_id")
-            
-            trip_doc = db.collection("trips").document(trip_id).get()
-            if trip_doc.exists:
-                trip_data = trip_doc.to_dict()
-                if trip_data.get("is_public"):
+        last_like = None
+        has_more = False
+        for _ in range(MAX_LIKE_READS):
+            wanted = limit - len(liked_trips)
+            page_query = likes_query.start_after(last_like) if last_like is not None else likes_query
+            likes = await stream_docs(page_query.limit(wanted + 1))
+            has_more = len(likes) > wanted
+            likes = likes[:wanted]
+            if not likes:
+                break
+            last_like = likes[-1]
+
+            # Private or deleted trips have no catalog entry and drop out here.
+            trip_ids = [like.to_dict().get("trip_id") for like in likes]
+            summaries = await get_all([catalog_ref(trip_id) for trip_id in trip_ids if trip_id])
+            by_id = {doc.id: doc.to_dict() for doc in summaries if doc.exists}
+
+            for trip_id in trip_ids:
+                entry = by_id.get(trip_id)
+                if entry:
                     liked_trips.append({
                         "trip_id": trip_id,
-                        "destination": trip_data.get("destination"),
-                        "duration": trip_data.get("duration"),
-                        "cover_image": trip_data.get("cover_image"),
-                        "trip_name": trip_data.get("trip_plan", {}).get("trip_name", ""),
-                        "likes_count": trip_data.get("likes_count", 0),
-                        "views_count": trip_data.get("views_count", 0)
+                        "destination": entry.get("destination"),
+                        "duration": entry.get("duration"),
+                        "cover_image": entry.get("cover_image"),
+                        "trip_name": entry.get("trip_name", ""),
+                        "likes_count": entry.get("likes_count", 0),
+                        "views_count": entry.get("views_count", 0)
                     })
-        
-        return JSONResponse(content={"success": True, "liked_trips": liked_trips})
+            if not has_more or len(liked_trips) >= limit:
+                break
+
+        next_cursor = None
+        if has_more and last_like is not None:
+            next_cursor = encode_page_token({"c": last_like.to_dict().get("created_at"), "id": last_like.id})
+
+        return JSONResponse(content={
+            "success": True,
+            "liked_trips": liked_trips,
+            "has_more": has_more,
+            "next_cursor": next_cursor,
+        })
     
     except Exception as e:
         return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
@@ -217,8 +271,8 @@ async def get_liked_trips(user = Depends(get_current_user)):
 async def get_badges(user_id: str):
     """Get badges for a user"""
     try:
-        badges = get_user_badges(user_id)
-        stats = calculate_user_stats(user_id)
+        badges = await run_db(get_user_badges, user_id)
+        stats = await run_db(calculate_user_stats, user_id)
         
         earned_count = sum(1 for b in badges if b.get("earned"))
         
@@ -236,8 +290,8 @@ async def get_badges(user_id: str):
 async def get_user_stats(user_id: str):
     """Get detailed stats for a user"""
     try:
-        stats = calculate_user_stats(user_id)
-        badges = get_user_badges(user_id)
+        stats = await run_db(calculate_user_stats, user_id)
+        badges = await run_db(get_user_badges, user_id)
         earned_badges = [b for b in badges if b.get("earned")]
         
         return JSONResponse(content={
@@ -254,7 +308,7 @@ async def get_user_stats(user_id: str):
 async def get_user_rewards(user_id: str):
     """Get user's reward points and available rewards"""
     try:
-        stats = calculate_user_stats(user_id)
+        stats = await run_db(calculate_user_stats, user_id)
         
         rewards = [
             {
@@ -289,7 +343,7 @@ async def redeem_reward(request: Request, user = Depends(get_current_user)):
         data = await request.json()
         reward_id = data.get("reward_id")
         
-        stats = calculate_user_stats(user['uid'])
+        stats = await run_db(calculate_user_stats, user['uid'])
         available_stars = stats.get("total_stars", 0)
         
         # Implement reward redemption logic here
@@ -3,236 +3,42 @@ from fastapi import APIRouter, Depends, Request
 from fastapi.responses import JSONResponse
 from datetime import datetime
 import json
-import re
-import time
-import asyncio
 
 from firebase import get_current_user, get_optional_user
-from core.database import db, firestore
-from core.config import model
+from core.database import db, delete_doc, get_doc, stream_docs, update_doc
 from models.trip import (TripRequest, RatingRequest, ViewRequest, 
-                         CoverImageRequest, TogglePublicRequest, LikeRequest, UpdateTripPlanRequest)
-from services.ai import create_trip_planning_prompt
-from services.maps import async_geocode, enrich_activities_parallel, generate_booking_link
-from services.schedule import apply_time_buffers, cap_activities_per_day
-from services.weather import get_weather_forecast_async
+                         CoverImageRequest, TogglePublicRequest, LikeRequest, UpdateTripPlanRequest,
+                         RegenerateDayRequest)
+from services.admission import LLMOverloadedError, overloaded_response
+from services.catalog_index import delete_catalog_entry, sync_catalog_entry, update_catalog_fields
+from services.plan_pipeline import SANITIZE_PIPELINE, SAVE_PIPELINE, is_normalized
+from services.planner import TripPlanParseError, plan_and_save_trip, regenerate_trip_day
 from services.image import get_unsplash_image_async
 from services.podcast import podcast_service
+from services.pricing import estimate_cost
+from services import reactions
+from services.reactions import ReactionTargetNotFound
+from services.view_buffer import view_buffer
 
 router = APIRouter()
 
 
-def _normalize_compact_text(text: str) -> str:
-    return re.sub(r"\s+", " ", (text or "").strip().lower())
-
-
-def _is_travel_placeholder_activity(activity: dict) -> bool:
-    """Detect AI-generated travel-only rows like 'Di chuyển'."""
-    try:
-        place = _normalize_compact_text(str(activity.get("place", "")))
-        if not place:
-            return False
-
-        # Vietnamese placeholders
-        if place == "di chuyển" or place.startswith("di chuyển "):
-            return True
-        if place == "di chuyen" or place.startswith("di chuyen "):
-            return True
-
-        # Common English placeholders
-        if place in {"travel", "transit", "commute", "move"}:
-            return True
-    except Exception:
-        return False
-
-    return False
-
-
-def sanitize_trip_plan(trip_plan: dict) -> dict:
-    """Remove travel-only placeholder activities from a plan."""
-    if not isinstance(trip_plan, dict):
-        return trip_plan
-    days = trip_plan.get("days")
-    if not isinstance(days, list):
-        return trip_plan
-
-    for day in days:
-        if not isinstance(day, dict):
-            continue
-        activities = day.get("activities")
-        if not isinstance(activities, list) or not activities:
-            continue
-        day["activities"] = [
-            a for a in activities
-            if isinstance(a, dict) and not _is_travel_placeholder_activity(a)
-        ]
-
-    return trip_plan
-
-
 @router.post("/api/plan-trip")
 async def plan_trip(trip_request: TripRequest, user = Depends(get_optional_user)):
     try:
-        start_time = time.time()
-        print(f"Trip Planning for: {trip_request.destination}")
-        print(f"Duration: {trip_request.duration} days | Budget: {trip_request.budget}")
-        
-        trip_prompt = create_trip_planning_prompt(trip_request)
-        
-        print("[INFO] Gemini processing...")
-        response = await model.generate_content_async(trip_prompt)
-        raw_text = response.text.strip()
-        match = re.search(r'```json\s*(\{.*?\})\s*```|(\{.*?\})', raw_text, re.DOTALL)
-        
-        if not match:
-            print("[ERROR] JSON not found in response")
-            return JSONResponse(
-                status_code=500,
-                content={"error": "JSON not found in response", "raw": raw_text[:500]}
-            )
-        
-        json_str = match.group(1) or match.group(2)
-        trip_plan = json.loads(json_str)
-
-        try:
-            trip_plan = sanitize_trip_plan(trip_plan)
-        except Exception as e:
-            print(f"[WARN] Could not sanitize trip plan: {e}")
-
-        # Cap activities/day before any scheduling adjustments.
-        try:
-            trip_plan = cap_activities_per_day(trip_plan, max_per_day=8)
-        except Exception as e:
-            print(f"[WARN] Could not cap activities per day: {e}")
-
-        # Enforce buffer time between consecutive activities (deterministic post-process)
-        try:
-            trip_plan = apply_time_buffers(
-                trip_plan,
-                active_time_start=getattr(trip_request, "active_time_start", None),
-                active_time_end=getattr(trip_request, "active_time_end", None),
-                travel_mode=getattr(trip_request, "travel_mode", None),
-            )
-        except Exception as e:
-            print(f"[WARN] Could not apply time buffers: {e}")
-        
-        # Get destination weather forecast (Google Maps Platform Weather API supports up to 10 days)
-        destination_weather = []
-        weather_info = {}
-        forecasts = []
-        try:
-            from datetime import timedelta
-            start_date = datetime.strptime(trip_request.start_date, "%Y-%m-%d").date()
-            today = datetime.now().date()
-            days_until_trip = (start_date - today).days
-
-            location_coords = await async_geocode(trip_request.destination)
-            if location_coords.get("lat"):
-                # Request the maximum supported days (10). We'll later map by date.
-                weather_data = await get_weather_forecast_async(
-                    location_coords["lat"],
-                    location_coords["lng"],
-                    10,
-                )
-                forecasts = weather_data.get("forecasts", [])
-                weather_info = {"forecasts": forecasts}
-                print(f"[OK] Weather API returned {len(forecasts)} days of forecast")
-            else:
-                print("[WARN] Missing destination coordinates; skipping weather")
-
-            if forecasts:
-                forecast_by_date = {}
-                for fc in forecasts:
-                    if isinstance(fc, dict) and fc.get("date"):
-                        forecast_by_date[str(fc.get("date"))] = fc
-
-                for i in range(int(trip_request.duration or 0)):
-                    trip_date = (start_date + timedelta(days=i)).strftime("%Y-%m-%d")
-                    fc = forecast_by_date.get(trip_date)
-                    if not fc:
-                        continue
-                    destination_weather.append({
-                        "day": i + 1,
-                        "date": fc.get("date", trip_date),
-                        "temp_max": fc.get("temp_max", 0),
-                        "temp_min": fc.get("temp_min", 0),
-                        "condition": fc.get("condition", ""),
-                        "rain_chance": fc.get("rain_chance", 0),
-                        "humidity": fc.get("humidity", 0),
-                        "is_rainy": fc.get("is_rainy", False),
-                        "is_sunny": fc.get("is_sunny", False),
-                    })
-
-                if destination_weather:
-                    print(f"[OK] Weather forecast added for {len(destination_weather)} days")
-                else:
-                    if days_until_trip > 10:
-                        print(
-                            f"[WARN] Trip starts in {days_until_trip} days; forecast only available for up to 10 days"
-                        )
-                    else:
-                        print("[WARN] No matching forecast dates for trip window")
-        except Exception as e:
-            print(f"[ERROR] Could not fetch destination weather: {e}")
-        
-        trip_plan["weather_forecast"] = destination_weather
-        
-        print("[INFO] Enriching activities with Google Places...")
-        trip_plan = await enrich_activities_parallel(
-            trip_plan, 
-            trip_request.destination, 
-            batch_size=5
-        )
-        
-        total_activities = sum(len(day.get("activities", [])) for day in trip_plan.get("days", []))
-        print(f"[SUCCESS] Trip plan generated with {total_activities} activities!")
-        
-        # Save trip if user is authenticated
-        trip_id = None
-        if user:
-            trip_id = f"{user['uid']}_{int(datetime.now().timestamp())}"
-            
-            # print("[INFO] Fetching Unsplash cover image...")
-            cover_image_url = await get_unsplash_image_async(trip_request.destination)
-            
-            trip_data = {
-                "id": trip_id,
-                "user_id": user['uid'],
-                "is_anonymous": user.get('is_anonymous', False),
-                "destination": trip_request.destination,
-                "duration": trip_request.duration,
-                "budget": trip_request.budget,
-                "start_date": trip_request.start_date,
-                "preferences": trip_request.preferences,
-                "activity_level": trip_request.activity_level,
-                "travel_group": trip_request.travel_group,
-                "group_size": trip_request.group_size,
-                "travel_mode": trip_request.travel_mode,
-                "categories": trip_request.categories,
-                "active_time_start": trip_request.active_time_start,
-                "active_time_end": trip_request.active_time_end,
-                "trip_plan": trip_plan,
-                "weather": weather_info,
-                "created_at": datetime.now().isoformat(),
-                "rating": 0,
-                "is_public": False,
-                "views_count": 0,
-                "likes_count": 0,
-                "category_tags": trip_request.categories or [],
-                "cover_image": cover_image_url,
-            }
-            
-            db.collection("trips").document(trip_id).set(trip_data)
-            print(f"[OK] Trip saved: {trip_id}")
-            
-            trip_plan["trip_id"] = trip_id
-            trip_plan["cover_image"] = cover_image_url
-        
-        elapsed = time.time() - start_time
-        print(f"[SUCCESS] Trip Planning completed in {elapsed:.2f} seconds")
-        
+        trip_plan = await plan_and_save_trip(trip_request, user)
         return JSONResponse(content=trip_plan)
     
+    except TripPlanParseError as e:
+        return JSONResponse(
+            status_code=500,
+            content={"error": "JSON not found in response", "raw": e.raw_text[:500]}
+        )
+    
+    except LLMOverloadedError as e:
+        print(f"[WARN] Trip planning rejected by LLM admission: {e}")
+        return overloaded_response(e)
+    
     except json.JSONDecodeError as e:
         print(f"[ERROR] JSON parsing error: {e}")
         return JSONResponse(status_code=500, content={"error": "Lỗi parse JSON từ AI", "details": str(e)})
@@ -247,7 +53,7 @@ async def get_my_trips(user = Depends(get_current_user)):
     """Get all trips for authenticated user"""
     try:
         trips_ref = db.collection("trips").where("user_id", "==", user['uid'])
-        trips = trips_ref.stream()
+        trips = await stream_docs(trips_ref)
         
         trips_list = []
         for trip in trips:
@@ -286,17 +92,19 @@ async def get_my_trips(user = Depends(get_current_user)):
 async def get_trip(trip_id: str, user = Depends(get_current_user)):
     """Get specific trip"""
     try:
-        trip_doc = db.collection("trips").document(trip_id).get()
+        trip_doc = await get_doc(db.collection("trips").document(trip_id))
         
         if not trip_doc.exists:
             return JSONResponse(status_code=404, content={"error": "Trip not found"})
         
         trip_data = trip_doc.to_dict()
 
-        # Sanitize plan on read to avoid showing legacy travel-only rows.
+        # Plans normalized at write time are served as-is; only legacy documents
+        # still need travel-only rows stripped on read.
         try:
-            if isinstance(trip_data.get("trip_plan"), dict):
-                trip_data["trip_plan"] = sanitize_trip_plan(trip_data["trip_plan"])
+            trip_plan = trip_data.get("trip_plan")
+            if isinstance(trip_plan, dict) and not is_normalized(trip_plan):
+                trip_data["trip_plan"] = SANITIZE_PIPELINE.run(trip_plan)
         except Exception as e:
             print(f"[WARN] Could not sanitize trip plan on read: {e}")
         
@@ -314,7 +122,7 @@ async def delete_trip(trip_id: str, user = Depends(get_current_user)):
     """Delete trip"""
     try:
         trip_ref = db.collection("trips").document(trip_id)
-        trip_doc = trip_ref.get()
+        trip_doc = await get_doc(trip_ref)
         
         if not trip_doc.exists:
             return JSONResponse(status_code=404, content={"error": "Trip not found"})
@@ -324,7 +132,9 @@ async def delete_trip(trip_id: str, user = Depends(get_current_user)):
         if trip_data.get("user_id") != user['uid']:
             return JSONResponse(status_code=403, content={"error": "Not authorized"})
         
-        trip_ref.delete()
+        await delete_doc(trip_ref)
+        if trip_data.get("is_public"):
+            await delete_catalog_entry(trip_id)
         
         return JSONResponse(content={"message": "Trip deleted successfully"})
     
@@ -340,7 +150,7 @@ async def update_trip_rating(trip_id: str, rating_request: RatingRequest, user =
             return JSONResponse(status_code=400, content={"error": "Rating must be between 1 and 5"})
         
         trip_ref = db.collection("trips").document(trip_id)
-        trip_doc = trip_ref.get()
+        trip_doc = await get_doc(trip_ref)
         
         if not trip_doc.exists:
             return JSONResponse(status_code=404, content={"error": "Trip not found"})
@@ -350,7 +160,8 @@ async def update_trip_rating(trip_id: str, rating_request: RatingRequest, user =
         if trip_data.get("user_id") != user['uid']:
             return JSONResponse(status_code=403, content={"error": "Not authorized"})
         
-        trip_ref.update({"rating": rating_request.rating})
+        await update_doc(trip_ref, {"rating": rating_request.rating})
+        await update_catalog_fields(trip_id, trip_data, {"rating": rating_request.rating})
         
         return JSONResponse(content={"message": "Rating updated successfully", "rating": rating_request.rating})
     
@@ -363,7 +174,7 @@ async def update_trip_plan(trip_id: str, payload: UpdateTripPlanRequest, user =
     """Update trip plan (used by Create Plan save)."""
     try:
         trip_ref = db.collection("trips").document(trip_id)
-        trip_doc = trip_ref.get()
+        trip_doc = await get_doc(trip_ref)
 
         if not trip_doc.exists:
             return JSONResponse(status_code=404, content={"error": "Trip not found"})
@@ -377,27 +188,16 @@ async def update_trip_plan(trip_id: str, payload: UpdateTripPlanRequest, user =
         if isinstance(trip_plan, dict):
             trip_name = trip_plan.get("trip_name")
 
-            # Remove travel-only rows like 'Di chuyển' on save.
+            # Drop travel-only rows, cap activities/day and re-apply buffers in one pass.
             try:
-                trip_plan = sanitize_trip_plan(trip_plan)
-            except Exception as e:
-                print(f"[WARN] Could not sanitize trip plan on save: {e}")
-
-            # Enforce backend constraints on saved plans.
-            try:
-                trip_plan = cap_activities_per_day(trip_plan, max_per_day=8)
-            except Exception as e:
-                print(f"[WARN] Could not cap activities per day on save: {e}")
-
-            try:
-                trip_plan = apply_time_buffers(
+                trip_plan = SAVE_PIPELINE.run(
                     trip_plan,
                     active_time_start=8,
                     active_time_end=22,
                     travel_mode=trip_data.get("travel_mode"),
                 )
             except Exception as e:
-                print(f"[WARN] Could not apply time buffers on save: {e}")
+                print(f"[WARN] Could not normalize trip plan on save: {e}")
 
         update_data = {
             "trip_plan": trip_plan,
@@ -408,19 +208,68 @@ async def update_trip_plan(trip_id: str, payload: UpdateTripPlanRequest, user =
         if trip_name:
             update_data["trip_name"] = trip_name
 
-        trip_ref.update(update_data)
+        await update_doc(trip_ref, update_data)
+        if trip_data.get("is_public"):
+            await sync_catalog_entry(trip_id, {**trip_data, **update_data})
         return JSONResponse(content={"message": "Trip plan updated", "trip_plan": trip_plan})
 
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": "Failed to update trip plan", "details": str(e)})
 
 
+@router.post("/api/trip/{trip_id}/day/{day_number}/regenerate")
+async def regenerate_day(trip_id: str, day_number: int, payload: RegenerateDayRequest = None,
+                         user = Depends(get_current_user)):
+    """Regenerate a single day of a saved trip, leaving the other days untouched."""
+    try:
+        trip_ref = db.collection("trips").document(trip_id)
+        trip_doc = await get_doc(trip_ref)
+
+        if not trip_doc.exists:
+            return JSONResponse(status_code=404, content={"error": "Trip not found"})
+
+        trip_data = trip_doc.to_dict()
+        if trip_data.get("user_id") != user["uid"]:
+            return JSONResponse(status_code=403, content={"error": "Not authorized"})
+
+        trip_plan = trip_data.get("trip_plan") or {}
+        days = trip_plan.get("days") if isinstance(trip_plan, dict) else None
+        if not isinstance(days, list):
+            return JSONResponse(status_code=400, content={"error": "Trip has no plan"})
+        day_index = next(
+            (i for i, day in enumerate(days) if isinstance(day, dict) and day.get("day", i + 1) == day_number),
+            None,
+        )
+        if day_index is None:
+            return JSONResponse(status_code=404, content={"error": f"Day {day_number} not found"})
+
+        instructions = (payload.instructions if payload else "") or ""
+        new_day = await regenerate_trip_day(trip_data, day_number, instructions, user=user)
+
+        days[day_index] = new_day
+        # Only the days array changes; the rest of the trip document is left as is.
+        await update_doc(trip_ref, {
+            "trip_plan.days": days,
+            "updated_at": datetime.now().isoformat(),
+        })
+        if trip_data.get("is_public"):
+            await sync_catalog_entry(trip_id, {**trip_data, "trip_plan": {**trip_plan, "days": days}})
+        return JSONResponse(content={"message": "Day regenerated", "day": new_day})
+
+    except TripPlanParseError as e:
+        return JSONResponse(status_code=500, content={"error": "JSON not found in response", "raw": e.raw_text[:500]})
+    except LLMOverloadedError as e:
+        return overloaded_response(e)
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": "Failed to regenerate day", "details": str(e)})
+
+
 @router.put("/api/trip/{trip_id}/cover-image")
 async def update_trip_cover_image(trip_id: str, request: CoverImageRequest, user = Depends(get_current_user)):
     """Update trip cover image"""
     try:
         trip_ref = db.collection("trips").document(trip_id)
-        trip_doc = trip_ref.get()
+        trip_doc = await get_doc(trip_ref)
         
         if not trip_doc.exists:
             return JSONResponse(status_code=404, content={"error": "Trip not found"})
@@ -433,10 +282,11 @@ async def update_trip_cover_image(trip_id: str, request: CoverImageRequest, user
         trip_plan = trip_data.get("trip_plan", {})
         trip_plan["cover_image"] = request.cover_image
         
-        trip_ref.update({
+        await update_doc(trip_ref, {
             "trip_plan": trip_plan,
             "cover_image": request.cover_image
         })
+        await update_catalog_fields(trip_id, trip_data, {"cover_image": request.cover_image})
         
         return JSONResponse(content={"message": "Cover image updated successfully"})
     
@@ -449,7 +299,7 @@ async def toggle_trip_public(trip_id: str, request: TogglePublicRequest, user =
     """Toggle trip public status"""
     try:
         trip_ref = db.collection("trips").document(trip_id)
-        trip_doc = trip_ref.get()
+        trip_doc = await get_doc(trip_ref)
         
         if not trip_doc.exists:
             return JSONResponse(status_code=404, content={"error": "Trip not found"})
@@ -470,7 +320,11 @@ async def toggle_trip_public(trip_id: str, request: TogglePublicRequest, user =
             cover_image = await get_unsplash_image_async(trip_data.get("destination", ""))
             update_data["cover_image"] = cover_image
         
-        trip_ref.update(update_data)
+        if request.is_public and not trip_data.get("published_at"):
+            update_data["published_at"] = datetime.now().isoformat()
+        
+        await update_doc(trip_ref, update_data)
+        await sync_catalog_entry(trip_id, {**trip_data, **update_data})
         
         return JSONResponse(content={
             "message": f"Trip is now {'public' if request.is_public else 'private'}",
@@ -483,20 +337,10 @@ async def toggle_trip_public(trip_id: str, request: TogglePublicRequest, user =
 
 @router.post("/api/trip/{trip_id}/view")
 async def increment_trip_view(trip_id: str, request: ViewRequest):
-    """Increment trip view count"""
+    """Count a trip view (buffered; the stored count catches up within a flush interval)"""
     try:
-        trip_ref = db.collection("trips").document(trip_id)
-        trip_doc = trip_ref.get()
-        
-        if not trip_doc.exists:
-            return JSONResponse(status_code=404, content={"error": "Trip not found"})
-        
-        trip_data = trip_doc.to_dict()
-        current_views = trip_data.get("views_count", 0)
-        
-        trip_ref.update({"views_count": current_views + 1})
-        
-        return JSONResponse(content={"views_count": current_views + 1})
+        views_count = await view_buffer.record(trip_id)
+        return JSONResponse(content={"views_count": views_count})
     
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": "Failed to increment views", "details": str(e)})
@@ -506,32 +350,11 @@ async def increment_trip_view(trip_id: str, request: ViewRequest):
 async def toggle_trip_like(trip_id: str, request: LikeRequest):
     """Toggle trip like"""
     try:
-        trip_ref = db.collection("trips").document(trip_id)
-        trip_doc = trip_ref.get()
-        
-        if not trip_doc.exists:
-            return JSONResponse(status_code=404, content={"error": "Trip not found"})
-        
-        trip_data = trip_doc.to_dict()
-        like_id = f"{trip_id}_{request.user_id}"
-        like_ref = db.collection("trip_likes").document(like_id)
-        like_doc = like_ref.get()
-        
-        if like_doc.exists:
-            like_ref.delete()
-            new_likes = max(0, trip_data.get("likes_count", 0) - 1)
-            trip_ref.update({"likes_count": new_likes})
-            return JSONResponse(content={"liked": False, "likes_count": new_likes})
-        else:
-            like_ref.set({
-                "trip_id": trip_id,
-                "user_id": request.user_id,
-                "created_at": datetime.now().isoformat()
-            })
-            new_likes = trip_data.get("likes_count", 0) + 1
-            trip_ref.update({"likes_count": new_likes})
-            return JSONResponse(content={"liked": True, "likes_count": new_likes})
+        result = await reactions.toggle_trip_like(trip_id, request.user_id)
+        return JSONResponse(content=result)
     
+    except ReactionTargetNotFound:
+        return JSONResponse(status_code=404, content={"error": "Trip not found"})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
@@ -542,7 +365,7 @@ async def get_like_status(trip_id: str, user_id: str):
     try:
         like_id = f"{trip_id}_{user_id}"
         like_ref = db.collection("trip_likes").document(like_id)
-        like_doc = like_ref.get()
+        like_doc = await get_doc(like_ref)
         
         return JSONResponse(content={"liked": like_doc.exists})
     except Exception as e:
@@ -553,8 +376,10 @@ async def get_like_status(trip_id: str, user_id: str):
 async def generate_podcast(trip_id: str, language: str = "vi", user = Depends(get_current_user)):
     """Generate podcast for trip"""
     try:
-        result = await podcast_service.generate_trip_podcast(trip_id, user['uid'], language)
+        result = await podcast_service.generate_trip_podcast(trip_id, user['uid'], language, user=user)
         return JSONResponse(content=result)
+    except LLMOverloadedError as e:
+        return overloaded_response(e)
     except Exception as e:
         return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
 
@@ -563,7 +388,7 @@ async def generate_podcast(trip_id: str, language: str = "vi", user = Depends(ge
 async def get_podcast(trip_id: str):
     """Get podcast for trip"""
     try:
-        podcast = podcast_service.get_podcast(trip_id)
+        podcast = await podcast_service.get_podcast(trip_id)
         if podcast:
             return JSONResponse(content={"success": True, "podcast": podcast})
         return JSONResponse(status_code=404, content={"success": False, "error": "Podcast not found"})
@@ -600,24 +425,8 @@ async def resolve_place(request: Request):
             place_type_hint=place_type_hint,
         )
         
-        # Estimate cost based on budget level
-        estimated_cost = "100.000 - 200.000 đ"
-        if budget == "low":
-            estimated_cost = "50.000 - 100.000 đ"
-        elif budget == "high":
-            estimated_cost = "500.000 - 1.000.000 đ"
-        
-        # If we got place details with price_level, adjust cost
-        if place_info.get("price_level"):
-            price_level = place_info["price_level"]
-            if price_level == 1:
-                estimated_cost = "50.000 - 150.000 đ"
-            elif price_level == 2:
-                estimated_cost = "150.000 - 400.000 đ"
-            elif price_level == 3:
-                estimated_cost = "400.000 - 800.000 đ"
-            elif price_level >= 4:
-                estimated_cost = "800.000 - 2.000.000 đ"
+        # Cost band from Places price_level, falling back to the budget level
+        estimated_cost = estimate_cost(place_info.get("price_level"), budget)
         
         tips = place_info.get("phone") or place_info.get("website") or "Check opening hours before visiting"
         
@@ -0,0 +1,139 @@
+"""Process-wide admission control for Gemini calls"""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi.responses import JSONResponse
+
+from core.config import LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT
+
+
+# Lower ranks are admitted first. Interactive planning beats background
+# generation; within a class, signed-in users beat anonymous/guest users.
+TASK_RANK = {"plan": 0, "day": 0, "blog": 1, "podcast": 1}
+
+
+class LLMOverloadedError(Exception):
+    """Raised when a request cannot be admitted to the LLM queue."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMQueueTimeoutError(LLMOverloadedError):
+    """Raised when a queued request waited longer than its deadline."""
+
+
+def llm_priority(task: str, user: Optional[dict] = None) -> tuple:
+    user_rank = 0 if user and not user.get("is_anonymous") else 1
+    return (TASK_RANK.get(task, 1), user_rank)
+
+
+def overloaded_response(error: LLMOverloadedError) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"error": "AI service is busy, please retry shortly", "retry_after": error.retry_after},
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
+class AdmissionController:
+    """Bounded-concurrency priority queue in front of the LLM."""
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._heap = []
+        self._seq = itertools.count()
+        self._waits = deque(maxlen=500)
+        self._service_times = deque(maxlen=100)
+        self._counters = {"admitted": 0, "rejected": 0, "timed_out": 0}
+
+    def _queue_depth(self) -> int:
+        return sum(1 for _, _, fut in self._heap if not fut.done())
+
+    def _retry_after(self) -> int:
+        avg_service = (sum(self._service_times) / len(self._service_times)) if self._service_times else 10.0
+        waves = (self._queue_depth() / self.max_concurrency) + 1
+        return max(1, math.ceil(avg_service * waves))
+
+    def _grant_next(self):
+        while self._heap:
+            _, _, fut = heapq.heappop(self._heap)
+            if not fut.done():
+                self._active += 1
+                fut.set_result(True)
+                return
+
+    async def _acquire(self, priority: tuple, deadline: float) -> float:
+        started = time.monotonic()
+        if self._active < self.max_concurrency and not self._queue_depth():
+            self._active += 1
+            return 0.0
+
+        if self._queue_depth() >= self.max_queue:
+            self._counters["rejected"] += 1
+            raise LLMOverloadedError("LLM queue is full", self._retry_after())
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (priority, next(self._seq), fut))
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=deadline)
+        except asyncio.TimeoutError:
+            if fut.done():
+                # Granted at the same moment the deadline fired; hand the slot on.
+                self._active -= 1
+                self._grant_next()
+            else:
+                fut.cancel()
+            self._counters["timed_out"] += 1
+            raise LLMQueueTimeoutError("Timed out waiting for an LLM slot", self._retry_after())
+        except BaseException:
+            if fut.done() and not fut.cancelled():
+                self._active -= 1
+                self._grant_next()
+            else:
+                fut.cancel()
+            raise
+        return time.monotonic() - started
+
+    def _release(self, service_time: float):
+        self._service_times.append(service_time)
+        self._active -= 1
+        self._grant_next()
+
+    @asynccontextmanager
+    async def slot(self, priority: tuple, deadline: Optional[float] = None):
+        """Hold one LLM slot for the duration of the block."""
+        waited = await self._acquire(priority, self.queue_timeout if deadline is None else deadline)
+        self._counters["admitted"] += 1
+        self._waits.append(waited)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - started)
+
+    def metrics(self) -> dict:
+        waits = sorted(self._waits)
+        p95 = waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0
+        return {
+            "active": self._active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self._queue_depth(),
+            "max_queue": self.max_queue,
+            "wait_avg_s": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "wait_p95_s": round(p95, 3),
+            **self._counters,
+        }
+
+
+llm_admission = AdmissionController(LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT)
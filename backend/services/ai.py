@@ -1,10 +1,15 @@
 """AI service for trip planning using Gemini"""
-from core.config import model
+from services.llm import generate_text
 from models.trip import TripRequest
 import re
 import json
 
 
+# Activity categories of the compact output contract; "hotel" doubles as a Places hint.
+ACTIVITY_CATEGORIES = ["sightseeing", "food", "cafe", "nature", "culture", "shopping", "entertainment", "hotel"]
+CATEGORY_LIST = ", ".join(ACTIVITY_CATEGORIES)
+
+
 def create_trip_planning_prompt(trip_request: TripRequest) -> str:
     """Create a specialized prompt for Gemini AI to generate travel itineraries"""
     
@@ -58,65 +63,86 @@ YÊU CẦU QUAN TRỌNG:
    - Nếu là nhà hàng/quán ăn: ghi TÊN CỤ THỂ
    - Nếu là khách sạn: ghi TÊN THẬT
 
-2. **Thời gian hợp lý**: 
-   - Bắt đầu từ 7:00-8:00, kết thúc 20:00-22:00
-   - Mỗi hoạt động từ 45 phút đến 3 giờ, tùy loại hoạt động
-  - LUÔN chừa thời gian di chuyển/nghỉ giữa 2 hoạt động liên tiếp (tối thiểu 15-45 phút)
-  - KHÔNG được để thời gian kết thúc của hoạt động A trùng đúng thời gian bắt đầu của hoạt động B
-
-3. **Chi phí THỰC TẾ**:
-   - Ngân sách Thấp: 50.000-150.000 đ/hoạt động
-   - Ngân sách Trung Bình: 150.000-400.000 đ/hoạt động  
-   - Ngân sách Cao: 500.000-2.000.000 đ/hoạt động
-   - QUAN TRỌNG: Mọi hoạt động ĐỀU PHẢI có chi phí cụ thể
-
-4. **CHI PHÍ FORMAT**: Chỉ ghi số tiền và đơn vị đ, KHÔNG thêm mô tả trong ngoặc đơn
+2. **Thứ tự và thời lượng** (giờ cụ thể và chi phí do hệ thống tự tính, KHÔNG cần ghi):
+   - Sắp xếp hoạt động theo thứ tự trong ngày, tối đa 8 hoạt động/ngày
+   - duration: "short" (~1 giờ), "medium" (~2 giờ), "long" (~3 giờ)
+   - category: một trong {CATEGORY_LIST}
+   - description: NGẮN GỌN, tối đa 20 từ
 
 FORMAT JSON (CHỈ TRẢ VỀ JSON, KHÔNG CÓ TEXT KHÁC):
 {{
   "trip_name": "Tên chuyến đi hấp dẫn",
   "overview": "Tổng quan 2-3 câu về điểm nổi bật của chuyến đi",
-  "total_estimated_cost": "5.000.000 - 7.000.000 đ",
   "days": [
     {{
       "day": 1,
       "title": "Tiêu đề cho ngày 1",
       "activities": [
-        {{
-          "time": "08:00 - 10:00",
-          "place": "Tên địa điểm cụ thể",
-          "description": "Mô tả hoạt động chi tiết",
-          "estimated_cost": "100.000 - 200.000 đ",
-          "tips": "Lời khuyên cụ thể"
-        }}
+        {{"place": "Tên địa điểm cụ thể", "category": "sightseeing", "duration": "medium", "description": "Mô tả ngắn"}}
       ]
     }}
   ],
-  "packing_list": [
-    "Đồ dùng 1",
-    "Đồ dùng 2",
-    "Đồ dùng 3"
-  ],
-  "travel_tips": [
-    "Mẹo du lịch 1",
-    "Mẹo du lịch 2",
-    "Mẹo du lịch 3"
-  ]
+  "packing_list": ["Đồ dùng 1", "Đồ dùng 2"],
+  "travel_tips": ["Mẹo du lịch 1", "Mẹo du lịch 2"]
 }}
 
 QUAN TRỌNG: 
-- packing_list: Liệt kê 5-8 đồ dùng thiết yếu phù hợp với chuyến đi (quần áo, giày dép, thuốc men, đồ cá nhân...)
-- travel_tips: Đưa ra 5-7 lời khuyên hữu ích về thời tiết, giao thông, an toàn, văn hóa địa phương
+- packing_list: 5 đồ dùng thiết yếu phù hợp với chuyến đi
+- travel_tips: 5 lời khuyên ngắn về thời tiết, giao thông, an toàn, văn hóa địa phương
 """
     return prompt
 
 
-async def generate_trip_plan(trip_request: TripRequest) -> dict:
+def create_day_regeneration_prompt(trip_data: dict, day_number: int, exclude_places: list,
+                                   instructions: str = "") -> str:
+    """Prompt Gemini for a single replacement day of an existing trip"""
+    trip_plan = trip_data.get("trip_plan") or {}
+    exclude_text = "\n".join(f"- {p}" for p in exclude_places) if exclude_places else "- (không có)"
+    categories = trip_data.get("categories") or []
+    categories_text = ", ".join(categories) if categories else "tất cả các danh mục"
+    active_start = str(trip_data.get("active_time_start") or 8).zfill(2)
+    active_end = str(trip_data.get("active_time_end") or 22).zfill(2)
+
+    return f"""
+Bạn là một chuyên gia tư vấn du lịch. Hãy lên lại kế hoạch cho NGÀY {day_number} của chuyến đi sau.
+
+THÔNG TIN CHUYẾN ĐI:
+• Tên chuyến đi: {trip_plan.get("trip_name", "")}
+• Địa điểm: {trip_data.get("destination", "")}
+• Thời gian: {trip_data.get("duration", "")} ngày (chỉ làm lại ngày {day_number})
+• Ngân sách: {trip_data.get("budget", "medium")}
+• Mức độ hoạt động: {trip_data.get("activity_level", "medium")}
+• Cách du lịch/Phương tiện: {trip_data.get("travel_mode") or "Không chỉ định"}
+• Danh mục ưu tiên: {categories_text}
+• Thời gian hoạt động: {active_start}:00 - {active_end}:00
+• Yêu cầu cho ngày này: {instructions or "Không có yêu cầu đặc biệt"}
+
+KHÔNG dùng lại các địa điểm đã có trong những ngày khác:
+{exclude_text}
+
+YÊU CẦU:
+- Địa điểm phải CỤ THỂ, CHÍNH XÁC và TÌM ĐƯỢC TRÊN GOOGLE MAPS
+- Tối đa 8 hoạt động, theo thứ tự trong ngày; giờ cụ thể và chi phí do hệ thống tự tính
+- duration: "short" (~1 giờ), "medium" (~2 giờ), "long" (~3 giờ)
+- category: một trong {CATEGORY_LIST}
+- description: NGẮN GỌN, tối đa 20 từ
+
+FORMAT JSON (CHỈ TRẢ VỀ JSON, KHÔNG CÓ TEXT KHÁC):
+{{
+  "day": {day_number},
+  "title": "Tiêu đề cho ngày {day_number}",
+  "activities": [
+    {{"place": "Tên địa điểm cụ thể", "category": "sightseeing", "duration": "medium", "description": "Mô tả ngắn"}}
+  ]
+}}
+"""
+
+
+async def generate_trip_plan(trip_request: TripRequest, user: dict = None) -> dict:
     """Generate trip plan using Gemini AI"""
     try:
         prompt = create_trip_planning_prompt(trip_request)
-        response = await model.generate_content_async(prompt)
-        raw_text = response.text.strip()
+        raw_text = await generate_text("plan", prompt, user=user)
         
         # Extract JSON from response
         match = re.search(r'```json\s*(\{.*?\})\s*```|(\{.*?\})', raw_text, re.DOTALL)
@@ -132,7 +158,7 @@ async def generate_trip_plan(trip_request: TripRequest) -> dict:
         raise
 
 
-async def generate_blog_from_trip(trip_data: dict) -> dict:
+async def generate_blog_from_trip(trip_data: dict, user: dict = None) -> dict:
     """Generate blog content from trip data using AI"""
     try:
         trip_plan = trip_data.get("trip_plan", {})
@@ -169,8 +195,7 @@ Hãy tạo nội dung blog với format JSON sau:
 CHỈ TRẢ VỀ JSON, KHÔNG CÓ TEXT KHÁC.
 """
         
-        response = await model.generate_content_async(prompt)
-        raw_text = response.text.strip()
+        raw_text = await generate_text("blog", prompt, user=user)
         
         match = re.search(r'```json\s*(\{.*?\})\s*```|(\{.*?\})', raw_text, re.DOTALL)
         if match:
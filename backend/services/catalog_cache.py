@@ -0,0 +1,189 @@
+"""Per-worker in-memory catalog kept fresh by a Firestore snapshot listener.
+
+The listener on `catalog_index` delivers the full set once, then only the
+changed summaries. Each sort order is a sorted list of keys maintained with
+bisect, and searches go through an inverted index updated on the same
+changes, so catalog pages are served without any Firestore reads.
+"""
+import threading
+from bisect import bisect_left, insort
+from typing import Optional
+
+from core.database import db
+from services.catalog_index import CATALOG_INDEX_COLLECTION, SORT_ORDERS, encode_cursor
+from services.search_index import SearchIndex
+
+
+def _sort_value(value):
+    # Keys must compare across entries; missing values sort last in descending order.
+    if isinstance(value, bool) or value is None:
+        return (0, "")
+    if isinstance(value, (int, float)):
+        return (1, value)
+    return (1, str(value))
+
+
+def sort_key(entry: dict, sort_by: str) -> tuple:
+    """Ascending key for `sort_by`; pages walk it backwards (descending, id breaks ties)."""
+    return tuple(_sort_value(entry.get(f)) for f in SORT_ORDERS[sort_by]) + (entry.get("trip_id") or "",)
+
+
+def cursor_key(values: dict, sort_by: str) -> tuple:
+    """Sort key for decoded cursor values (see catalog_index.decode_cursor)."""
+    return tuple(_sort_value(values.get(f)) for f in SORT_ORDERS[sort_by]) + (values.get("__name__") or "",)
+
+
+class CatalogCache:
+    """Public-trip summaries with prebuilt sort orders, updated incrementally."""
+
+    def __init__(self):
+        self._entries = {}
+        self._orders = {sort_by: [] for sort_by in SORT_ORDERS}
+        self._search = SearchIndex()
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+        self._watch = None
+        # Filtered key lists per (filters, sort), dropped whenever the catalog changes.
+        self._views = {}
+
+    def __contains__(self, trip_id: str) -> bool:
+        return trip_id in self._entries
+
+    def get(self, trip_id: str) -> Optional[dict]:
+        return self._entries.get(trip_id)
+
+    def search_entries(self, query: str) -> list:
+        """Entries matching every token of `query`, in no particular order."""
+        with self._lock:
+            scores = self._search.search(query) or {}
+            return [self._entries[trip_id] for trip_id in scores]
+
+    @property
+    def ready(self) -> bool:
+        if not self._loaded.is_set() or self._watch is None:
+            return False
+        return getattr(self._watch, "is_active", True)
+
+    @property
+    def loading(self) -> bool:
+        """Listener attached but its first snapshot has not arrived yet."""
+        return self._watch is not None and not self._loaded.is_set()
+
+    def start(self):
+        if self._watch is not None:
+            return
+        try:
+            self._watch = db.collection(CATALOG_INDEX_COLLECTION).on_snapshot(self._on_snapshot)
+            print("[OK] Catalog cache listener started")
+        except Exception as e:
+            self._watch = None
+            print(f"[WARN] Catalog cache disabled, serving from Firestore: {e}")
+
+    def stop(self):
+        if self._watch is not None:
+            try:
+                self._watch.unsubscribe()
+            except Exception as e:
+                print(f"[WARN] Could not stop catalog listener: {e}")
+            self._watch = None
+        self._loaded.clear()
+
+    def _on_snapshot(self, snapshots, changes, read_time):
+        # Runs on the listener's thread; the first call carries every document as ADDED.
+        with self._lock:
+            for change in changes:
+                doc = change.document
+                if change.type.name == "REMOVED":
+                    self._remove(doc.id)
+                else:
+                    entry = doc.to_dict() or {}
+                    entry.setdefault("trip_id", doc.id)
+                    self._upsert(doc.id, entry)
+            if changes:
+                self._views = {}
+        if not self._loaded.is_set():
+            self._loaded.set()
+            print(f"[OK] Catalog cache loaded ({len(self._entries)} trips)")
+
+    def _remove(self, trip_id: str):
+        old = self._entries.pop(trip_id, None)
+        if old is None:
+            return
+        self._search.remove(trip_id)
+        for sort_by, keys in self._orders.items():
+            key = sort_key(old, sort_by)
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+
+    def _upsert(self, trip_id: str, entry: dict):
+        self._remove(trip_id)
+        self._entries[trip_id] = entry
+        self._search.add(trip_id, entry)
+        for sort_by, keys in self._orders.items():
+            insort(keys, sort_key(entry, sort_by))
+
+    def _passes(self, entry: dict, budget: Optional[str], duration: Optional[str], tags: set) -> bool:
+        if budget and entry.get("budget") != budget:
+            return False
+        if duration and entry.get("duration_bucket") != duration:
+            return False
+        if tags and not tags.intersection(entry.get("tags_normalized") or ()):
+            return False
+        return True
+
+    def _filtered_keys(self, sort_by: str, budget: Optional[str], duration: Optional[str],
+                       tags: tuple, search: str) -> tuple:
+        """(ascending keys of the matching entries, ranked), memoized until the next change.
+
+        With a search, keys are prefixed by the relevance score so the best
+        matches come first and the chosen sort order breaks ties.
+        """
+        view_id = (sort_by, budget, duration, tags, search)
+        view = self._views.get(view_id)
+        if view is not None:
+            return view
+
+        wanted_tags = set(tags)
+        entries = self._entries
+        scores = self._search.search(search) if search else None
+        if scores is not None:
+            keys = sorted(
+                (score,) + sort_key(entries[trip_id], sort_by)
+                for trip_id, score in scores.items()
+                if self._passes(entries[trip_id], budget, duration, wanted_tags)
+            )
+        elif budget or duration or wanted_tags:
+            keys = [
+                key for key in self._orders[sort_by]
+                if self._passes(entries[key[-1]], budget, duration, wanted_tags)
+            ]
+        else:
+            keys = self._orders[sort_by]
+        view = self._views[view_id] = (keys, scores is not None)
+        return view
+
+    def page(self, *, sort_by: str, limit: int, budget: Optional[str] = None,
+             duration: Optional[str] = None, tags: Optional[list] = None, search: str = "",
+             after: Optional[dict] = None, offset: int = 0) -> tuple:
+        """(entries, total, next_cursor) for one page, best match / newest / most popular first."""
+        with self._lock:
+            keys, ranked = self._filtered_keys(sort_by, budget, duration, tuple(tags or ()), search)
+            if after:
+                key = cursor_key(after, sort_by)
+                if ranked:
+                    key = (after.get("__score__", 0.0),) + key
+                end = bisect_left(keys, key)
+            else:
+                end = len(keys) - offset
+            start = max(0, end - limit)
+            page_keys = list(reversed(keys[start:max(end, 0)]))
+            entries = [self._entries[key[-1]] for key in page_keys]
+
+        next_cursor = None
+        if start > 0 and page_keys:
+            next_cursor = encode_cursor(entries[-1], sort_by, page_keys[-1][0] if ranked else None)
+        return entries, len(keys), next_cursor
+
+
+catalog_cache = CatalogCache()
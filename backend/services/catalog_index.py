@@ -0,0 +1,279 @@
+"""Compact public-trip summaries for the catalog (`catalog_index` collection).
+
+Each public trip has one summary document, keyed by trip id, holding only the
+fields catalog cards need plus the author's name and photo. Trip and profile
+endpoints keep it in sync so catalog reads never touch `trips` or `users`.
+"""
+from datetime import datetime
+from typing import Optional
+
+from core.database import db, delete_doc, firestore, run_db, set_doc, stream_docs, update_doc
+from services.pagination import decode_page_token, encode_page_token
+from services.search_index import score_entry
+from services.user_profiles import PUBLIC_PROFILE_FIELDS, UserProfileLoader, profile_cache
+from services.text import fold_vietnamese
+
+
+CATALOG_INDEX_COLLECTION = "catalog_index"
+
+# Trip fields copied into the summary as-is.
+SUMMARY_TRIP_FIELDS = ("user_id", "destination", "duration", "budget", "start_date", "cover_image")
+
+
+# Canonical tag keys; catalog filters match on these (stored as `tags_normalized`).
+TAG_ALIASES = {
+    "culture": ["Văn hóa", "culture"],
+    "adventure": ["Phiêu lưu", "adventure"],
+    "relaxation": ["Thư giãn", "relaxation", "relax"],
+    "nature": ["Thiên nhiên", "nature"],
+    "food": ["Ẩm thực", "food"],
+    "shopping": ["Mua sắm", "shopping"],
+    "history": ["Lịch sử", "history"],
+    "nightlife": ["Giải trí đêm", "nightlife"],
+    "photography": ["Nhiếp ảnh", "photography"],
+}
+_TAG_LOOKUP = {fold_vietnamese(alias): key for key, aliases in TAG_ALIASES.items() for alias in aliases}
+# array-contains-any accepts at most 30 values.
+MAX_TAG_FILTERS = 30
+
+DURATION_BUCKETS = ("1", "2-3", "4-7", "7+")
+
+# Activity place names kept for search (not returned to clients).
+MAX_PLACE_NAMES = 60
+
+# Sort fields per catalog order, all descending; the document id breaks ties.
+SORT_ORDERS = {
+    "newest": ("published_at",),
+    "popular": ("likes_count", "views_count"),
+    "views": ("views_count",),
+}
+
+
+def duration_bucket(duration) -> str:
+    try:
+        days = int(duration or 0)
+    except (TypeError, ValueError):
+        return ""
+    if days <= 0:
+        return ""
+    if days == 1:
+        return "1"
+    if days <= 3:
+        return "2-3"
+    if days <= 7:
+        return "4-7"
+    return "7+"
+
+
+def normalize_tags(tags) -> list:
+    """Map Vietnamese/English tag labels to canonical keys (unknown tags are folded)."""
+    normalized = []
+    for tag in tags or []:
+        folded = fold_vietnamese(str(tag))
+        key = _TAG_LOOKUP.get(folded, folded)
+        if key and key not in normalized:
+            normalized.append(key)
+    return normalized
+
+
+def catalog_ref(trip_id: str):
+    return db.collection(CATALOG_INDEX_COLLECTION).document(trip_id)
+
+
+def _place_names(trip_plan: dict) -> list:
+    names = []
+    for day in trip_plan.get("days") or []:
+        for activity in (day.get("activities") if isinstance(day, dict) else None) or []:
+            place = activity.get("place") if isinstance(activity, dict) else None
+            if place and place not in names:
+                names.append(str(place))
+    return names[:MAX_PLACE_NAMES]
+
+
+def build_catalog_entry(trip_id: str, trip_data: dict, author: Optional[dict] = None) -> dict:
+    """Summary document for one public trip."""
+    author = author or {}
+    trip_plan = trip_data.get("trip_plan") if isinstance(trip_data.get("trip_plan"), dict) else {}
+    entry = {field: trip_data.get(field) for field in SUMMARY_TRIP_FIELDS}
+    entry.update({
+        "trip_id": trip_id,
+        "username": author.get("username", "Anonymous"),
+        "photo_url": author.get("photo_url", ""),
+        "trip_name": trip_plan.get("trip_name", "") or trip_data.get("trip_name", ""),
+        "overview": trip_plan.get("overview", ""),
+        "place_names": _place_names(trip_plan),
+        "destination_folded": fold_vietnamese(str(trip_data.get("destination") or "")),
+        "category_tags": trip_data.get("category_tags") or [],
+        "tags_normalized": normalize_tags(trip_data.get("category_tags")),
+        "duration_bucket": duration_bucket(trip_data.get("duration")),
+        "views_count": trip_data.get("views_count", 0),
+        "likes_count": trip_data.get("likes_count", 0),
+        "rating": trip_data.get("rating") or 0,
+        "published_at": trip_data.get("published_at") or trip_data.get("created_at") or "",
+        "activity_level": trip_data.get("activity_level") or "medium",
+        "travel_group": trip_data.get("travel_group") or "solo",
+        "indexed_at": datetime.now().isoformat(),
+    })
+    return entry
+
+
+INTERNAL_FIELDS = {"indexed_at", "tags_normalized", "duration_bucket", "place_names", "destination_folded"}
+
+
+def catalog_card(entry: dict) -> dict:
+    """API shape of a catalog card (unrated trips report rating as None)."""
+    card = {k: v for k, v in entry.items() if k not in INTERNAL_FIELDS}
+    card["rating"] = entry.get("rating") if entry.get("rating") and entry.get("rating") > 0 else None
+    return card
+
+
+def matches_search(entry: dict, search: str) -> bool:
+    """Same token/prefix rule as the in-memory search index, for one entry."""
+    return score_entry(entry, search) > 0
+
+
+def catalog_query(budget: Optional[str] = None, duration: Optional[str] = None,
+                  tags: Optional[list] = None, sort_by: str = "newest"):
+    """Indexed catalog query: equality/array filters plus the sort order (see firestore.indexes.json)."""
+    query = db.collection(CATALOG_INDEX_COLLECTION)
+    if budget:
+        query = query.where("budget", "==", budget)
+    if duration:
+        query = query.where("duration_bucket", "==", duration)
+    if tags:
+        query = query.where("tags_normalized", "array_contains_any", tags[:MAX_TAG_FILTERS])
+    for field in SORT_ORDERS.get(sort_by, SORT_ORDERS["newest"]):
+        query = query.order_by(field, direction=firestore.Query.DESCENDING)
+    return query.order_by("__name__", direction=firestore.Query.DESCENDING)
+
+
+def encode_cursor(entry: dict, sort_by: str, score: Optional[float] = None) -> str:
+    """Opaque page token holding the last entry's sort values and id (plus its search score)."""
+    fields = SORT_ORDERS.get(sort_by, SORT_ORDERS["newest"])
+    payload = {"s": sort_by, "v": [entry.get(f) for f in fields], "id": entry.get("trip_id")}
+    if score is not None:
+        payload["r"] = score
+    return encode_page_token(payload)
+
+
+def decode_cursor(token: str, sort_by: str) -> dict:
+    """`start_after` values for a page token; ValueError if it is malformed or for another sort."""
+    payload = decode_page_token(token)
+    try:
+        fields = SORT_ORDERS.get(sort_by, SORT_ORDERS["newest"])
+        if payload["s"] != sort_by or len(payload["v"]) != len(fields) or not payload["id"]:
+            raise ValueError("cursor does not match this sort order")
+        values = dict(zip(fields, payload["v"]))
+        values["__name__"] = payload["id"]
+        if "r" in payload:
+            values["__score__"] = float(payload["r"])
+        return values
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+
+
+async def count_catalog(query) -> int:
+    """Server-side count aggregation (no documents are transferred)."""
+    result = await run_db(lambda: query.count(alias="total").get())
+    return int(result[0][0].value)
+
+
+async def sync_catalog_entry(trip_id: str, trip_data: dict) -> None:
+    """Write the summary for a public trip, or remove it for a private one.
+
+    Index maintenance never fails the request that triggered it; a stale entry
+    is fixed by the next write or by `rebuild_catalog_index`.
+    """
+    try:
+        if not trip_data.get("is_public"):
+            await delete_doc(catalog_ref(trip_id))
+            return
+        author = await UserProfileLoader().load(trip_data.get("user_id"))
+        await set_doc(catalog_ref(trip_id), build_catalog_entry(trip_id, trip_data, author))
+    except Exception as e:
+        print(f"[WARN] Could not sync catalog entry {trip_id}: {e}")
+
+
+async def update_catalog_fields(trip_id: str, trip_data: dict, fields: dict) -> None:
+    """Patch summary fields (counters, rating, cover) of a trip that is public."""
+    if not trip_data.get("is_public"):
+        return
+    try:
+        await update_doc(catalog_ref(trip_id), fields)
+    except Exception as e:
+        # Missing entry (published before the index existed): write it in full.
+        print(f"[WARN] Catalog entry {trip_id} not patched ({e}); rebuilding it")
+        await sync_catalog_entry(trip_id, {**trip_data, **fields})
+
+
+async def delete_catalog_entry(trip_id: str) -> None:
+    try:
+        await delete_doc(catalog_ref(trip_id))
+    except Exception as e:
+        print(f"[WARN] Could not delete catalog entry {trip_id}: {e}")
+
+
+async def update_author_in_catalog(user_id: str, profile: dict) -> int:
+    """Copy a changed username/photo into every catalog entry by that author."""
+    fields = {k: profile[k] for k in ("username", "photo_url") if k in profile}
+    if not fields:
+        return 0
+    profile_cache.invalidate(user_id)
+    try:
+        entries = await stream_docs(
+            db.collection(CATALOG_INDEX_COLLECTION).where("user_id", "==", user_id)
+        )
+        if not entries:
+            return 0
+
+        def write():
+            # Firestore batches are capped at 500 writes.
+            for start in range(0, len(entries), 500):
+                batch = db.batch()
+                for doc in entries[start:start + 500]:
+                    batch.update(doc.reference, fields)
+                batch.commit()
+
+        await run_db(write)
+        return len(entries)
+    except Exception as e:
+        print(f"[WARN] Could not update catalog author {user_id}: {e}")
+        return 0
+
+
+def rebuild_catalog_index() -> int:
+    """Rebuild every summary from the public trips (backfill / repair)."""
+    trips = list(db.collection("trips").where("is_public", "==", True).stream())
+    user_ids = {t.to_dict().get("user_id") for t in trips} - {None}
+    user_refs = [db.collection("users").document(uid) for uid in user_ids]
+    authors = {
+        doc.id: doc.to_dict() for doc in db.get_all(user_refs, field_paths=PUBLIC_PROFILE_FIELDS) if doc.exists
+    } if user_refs else {}
+
+    public_ids = set()
+    batch, pending = db.batch(), 0
+    for trip in trips:
+        trip_data = trip.to_dict()
+        public_ids.add(trip.id)
+        entry = build_catalog_entry(trip.id, trip_data, authors.get(trip_data.get("user_id")))
+        batch.set(catalog_ref(trip.id), entry)
+        pending += 1
+        if pending == 500:
+            batch.commit()
+            batch, pending = db.batch(), 0
+
+    for doc in db.collection(CATALOG_INDEX_COLLECTION).stream():
+        if doc.id not in public_ids:
+            batch.delete(doc.reference)
+            pending += 1
+            if pending == 500:
+                batch.commit()
+                batch, pending = db.batch(), 0
+    if pending:
+        batch.commit()
+    return len(public_ids)
+
+
+if __name__ == "__main__":
+    count = rebuild_catalog_index()
+    print(f"[OK] Catalog index rebuilt with {count} public trips")
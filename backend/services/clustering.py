@@ -0,0 +1,116 @@
+"""Balanced geographic clustering of a trip's activities into compact days."""
+
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+
+from services.geo import activity_coords, haversine_cross
+from services.routing import is_anchor_activity
+
+
+MAX_ITERATIONS = 20
+# Only rewrite the plan when the total spread shrinks by at least this fraction.
+MIN_IMPROVEMENT = 0.1
+
+
+def _balanced_assign(points: np.ndarray, centers: np.ndarray, capacity: np.ndarray) -> np.ndarray:
+    """Assign each point to a center, closest pairs first, without exceeding capacity."""
+    dist = haversine_cross(points, centers)
+    labels = np.full(len(points), -1, dtype=np.int64)
+    remaining = capacity.copy()
+    for flat in np.argsort(dist, axis=None, kind="stable"):
+        p, c = divmod(int(flat), len(centers))
+        if labels[p] >= 0 or remaining[c] <= 0:
+            continue
+        labels[p] = c
+        remaining[c] -= 1
+    return labels
+
+
+def _centers(points: np.ndarray, labels: np.ndarray, previous: np.ndarray) -> np.ndarray:
+    centers = previous.copy()
+    for c in range(len(centers)):
+        members = points[labels == c]
+        if len(members):
+            centers[c] = members.mean(axis=0)
+    return centers
+
+
+def _spread(points: np.ndarray, labels: np.ndarray, k: int) -> float:
+    """Sum of distances from each point to its own cluster centroid."""
+    centers = _centers(points, labels, np.zeros((k, 2)))
+    return float(haversine_cross(points, centers)[np.arange(len(points)), labels].sum())
+
+
+def balanced_kmeans(points: np.ndarray, initial_labels: np.ndarray, capacity: np.ndarray) -> np.ndarray:
+    """Lloyd iterations with capacity-constrained assignment.
+
+    Clusters start from `initial_labels` so cluster i keeps meaning "day i".
+    """
+    k = len(capacity)
+    labels = initial_labels.copy()
+    centers = _centers(points, labels, np.zeros((k, 2)))
+    # Empty days start from the overall centroid.
+    empty = np.bincount(labels, minlength=k) == 0
+    centers[empty] = points.mean(axis=0)
+
+    for _ in range(MAX_ITERATIONS):
+        new_labels = _balanced_assign(points, centers, capacity)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        centers = _centers(points, labels, centers)
+    return labels
+
+
+def cluster_trip_days(trip_plan: dict[str, Any]) -> dict[str, Any]:
+    """Move activities between days so each day stays within one area.
+
+    Anchors (hotels, meals, check-in/out) and activities without coordinates
+    keep their day and slot; every day keeps its number of activities. Days
+    are only rewritten when the total spread drops noticeably. Intra-day order
+    and buffers are left to the route optimizer and scheduler.
+    """
+    days = trip_plan.get("days") if isinstance(trip_plan, dict) else None
+    if not isinstance(days, list) or len(days) < 2:
+        return trip_plan
+    if not all(isinstance(day, dict) and isinstance(day.get("activities"), list) for day in days):
+        return trip_plan
+
+    slots: list[tuple[int, int]] = []
+    movable: list[dict] = []
+    for d, day in enumerate(days):
+        activities = day["activities"]
+        _, valid = activity_coords(activities)
+        for i, activity in enumerate(activities):
+            if isinstance(activity, dict) and valid[i] and not is_anchor_activity(activity):
+                slots.append((d, i))
+                movable.append(activity)
+
+    k = len(days)
+    if len(movable) <= k:
+        return trip_plan
+
+    points, _ = activity_coords(movable)
+    initial = np.array([d for d, _ in slots], dtype=np.int64)
+    capacity = np.bincount(initial, minlength=k)
+
+    labels = balanced_kmeans(points, initial, capacity)
+    before = _spread(points, initial, k)
+    after = _spread(points, labels, k)
+    if before <= 0 or after > before * (1 - MIN_IMPROVEMENT):
+        return trip_plan
+
+    # Refill each day's free slots with its cluster, keeping the original
+    # relative order of activities that were already on that day.
+    members = [[] for _ in range(k)]
+    for idx in sorted(range(len(movable)), key=lambda j: (initial[j] != labels[j], j)):
+        members[labels[idx]].append(movable[idx])
+    for d, i in slots:
+        days[d]["activities"][i] = members[d].pop(0)
+
+    moved = int(np.count_nonzero(labels != initial))
+    print(f"[INFO] Regrouped {moved} activities by area (spread {before:.1f} -> {after:.1f} km)")
+    return trip_plan
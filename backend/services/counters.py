@@ -0,0 +1,143 @@
+"""Atomic counters for views, likes, votes and comment counts.
+
+Every change is a single `firestore.Increment` write, so concurrent updates
+never lose counts and no read is needed first. Counters that get hot in
+this worker (more increments per second than one document sustains) are
+spread over shard documents in a `counter_shards` subcollection; a
+background roll-up folds the shards back into the main field.
+"""
+import asyncio
+import random
+import time
+from typing import Optional
+
+from google.api_core.exceptions import NotFound
+
+from core.config import COUNTER_HOT_RATE, COUNTER_ROLLUP_INTERVAL, COUNTER_SHARDS
+from core.database import db, firestore, get_all, run_db, update_doc
+
+
+SHARDS_SUBCOLLECTION = "counter_shards"
+# A counter that turned hot stays sharded this long after its last burst.
+HOT_HOLD_SECONDS = 60
+MAX_TRACKED_COUNTERS = 10000
+
+
+def _shard_id(field: str, index: int) -> str:
+    return f"{field}_{index}"
+
+
+class CounterService:
+    def __init__(self, shards: int, hot_rate: float, rollup_interval: float):
+        self.shards = max(0, shards)
+        self.hot_rate = hot_rate
+        self.rollup_interval = rollup_interval
+        # (doc path, field) -> [window start, increments in window, hot until]
+        self._rates = {}
+        # (doc path, field) -> (ref, mirror refs) with shard writes not yet rolled up
+        self._pending = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _is_hot(self, key: tuple) -> bool:
+        if self.shards < 2:
+            return False
+        now = time.monotonic()
+        if len(self._rates) > MAX_TRACKED_COUNTERS:
+            self._rates = {k: w for k, w in self._rates.items() if w[2] > now or now - w[0] < 1.0}
+        window = self._rates.get(key)
+        if window is None or now - window[0] >= 1.0:
+            hot_until = window[2] if window else 0.0
+            window = self._rates[key] = [now, 0, hot_until]
+        window[1] += 1
+        if window[1] > self.hot_rate:
+            window[2] = now + HOT_HOLD_SECONDS
+        return window[2] > now
+
+    def write_target(self, ref, field: str, mirrors: tuple = ()) -> tuple:
+        """(document to increment, sharded) for one change to `ref.field`.
+
+        For callers that write the increment themselves, e.g. inside a
+        transaction. While the counter is hot this is a shard document
+        (written with `set(..., merge=True)`), registered for the next
+        roll-up, which also updates `mirrors`.
+        """
+        key = (ref.path, field)
+        if not self._is_hot(key):
+            return ref, False
+        shard = ref.collection(SHARDS_SUBCOLLECTION).document(_shard_id(field, random.randrange(self.shards)))
+        self._pending[key] = (ref, tuple(mirrors))
+        return shard, True
+
+    async def increment(self, ref, field: str, amount: int = 1, mirrors: tuple = ()):
+        """Add `amount` to `ref.field` in one write.
+
+        `mirrors` are denormalized copies (e.g. the catalog summary) that get
+        the same increment when they exist. Raises NotFound if `ref` does not.
+        """
+        target, sharded = self.write_target(ref, field, mirrors)
+        if sharded:
+            await run_db(target.set, {field: firestore.Increment(amount)}, merge=True)
+            return
+
+        await update_doc(ref, {field: firestore.Increment(amount)})
+        await self._increment_mirrors(mirrors, field, amount)
+
+    async def _increment_mirrors(self, mirrors, field: str, amount: int):
+        for mirror in mirrors:
+            try:
+                await update_doc(mirror, {field: firestore.Increment(amount)})
+            except NotFound:
+                pass
+
+    async def rollup(self) -> int:
+        """Fold pending shard values into their main fields; returns counters rolled up."""
+        pending, self._pending = self._pending, {}
+        rolled = 0
+        for (path, field), (ref, mirrors) in pending.items():
+            try:
+                shard_refs = [
+                    ref.collection(SHARDS_SUBCOLLECTION).document(_shard_id(field, i))
+                    for i in range(self.shards)
+                ]
+                shards = [doc for doc in await get_all(shard_refs) if doc.exists]
+                total = 0
+                batch = db.batch()
+                for doc in shards:
+                    value = (doc.to_dict() or {}).get(field, 0)
+                    if value:
+                        # Subtract what was read rather than resetting, so increments
+                        # landing on the shard meanwhile are kept for the next roll-up.
+                        batch.update(doc.reference, {field: firestore.Increment(-value)})
+                        total += value
+                if not total:
+                    continue
+                batch.update(ref, {field: firestore.Increment(total)})
+                await run_db(batch.commit)
+                await self._increment_mirrors(mirrors, field, total)
+                rolled += 1
+            except NotFound:
+                print(f"[WARN] Counter {path}.{field} target is gone; skipping roll-up")
+            except Exception as e:
+                print(f"[WARN] Counter roll-up failed for {path}.{field}: {e}")
+                self._pending.setdefault((path, field), (ref, mirrors))
+        return rolled
+
+    async def _rollup_loop(self):
+        while True:
+            await asyncio.sleep(self.rollup_interval)
+            await self.rollup()
+
+    async def start(self):
+        if self._task is None and self.shards >= 2:
+            self._task = asyncio.create_task(self._rollup_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.rollup()
+
+
+counters = CounterService(COUNTER_SHARDS, COUNTER_HOT_RATE, COUNTER_ROLLUP_INTERVAL)
+
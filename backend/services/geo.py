@@ -0,0 +1,59 @@
+"""Vectorized geographic helpers for post-enrichment plan optimization"""
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def activity_coords(activities: list[Any]) -> tuple[np.ndarray, np.ndarray]:
+    """Return (coords[n, 2] in degrees, valid[n]) from each activity's place_details."""
+    coords = np.zeros((len(activities), 2), dtype=np.float64)
+    valid = np.zeros(len(activities), dtype=bool)
+    for i, activity in enumerate(activities):
+        details = activity.get("place_details") if isinstance(activity, dict) else None
+        if not isinstance(details, dict):
+            continue
+        try:
+            lat = float(details.get("lat") or 0)
+            lng = float(details.get("lng") or 0)
+        except (TypeError, ValueError):
+            continue
+        if lat and lng:
+            coords[i] = (lat, lng)
+            valid[i] = True
+    return coords, valid
+
+
+def haversine_matrix(coords: np.ndarray) -> np.ndarray:
+    """Pairwise great-circle distances (km) for coords[n, 2] in degrees."""
+    rad = np.radians(coords)
+    lat = rad[:, 0][:, None]
+    lng = rad[:, 1][:, None]
+    dlat = lat.T - lat
+    dlng = lng.T - lng
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_cross(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Great-circle distances (km) from every row of a[n, 2] to every row of b[k, 2]."""
+    ra = np.radians(a)[:, None, :]
+    rb = np.radians(b)[None, :, :]
+    dlat = rb[..., 0] - ra[..., 0]
+    dlng = rb[..., 1] - ra[..., 1]
+    h = np.sin(dlat / 2) ** 2 + np.cos(ra[..., 0]) * np.cos(rb[..., 0]) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def haversine_pairs(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Element-wise great-circle distances (km) between rows of a[n, 2] and b[n, 2]."""
+    ra = np.radians(a)
+    rb = np.radians(b)
+    dlat = rb[:, 0] - ra[:, 0]
+    dlng = rb[:, 1] - ra[:, 1]
+    h = np.sin(dlat / 2) ** 2 + np.cos(ra[:, 0]) * np.cos(rb[:, 0]) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
@@ -0,0 +1,345 @@
+"""Durable background jobs for long-running plan, blog and podcast generation"""
+import asyncio
+import hashlib
+import hmac
+import json
+import secrets
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from core.config import (JOB_WORKER_CONCURRENCY, JOB_RESULT_TTL, JOB_LEASE_SECONDS, JOB_RESULT_MAX_BYTES,
+                         JOB_MAX_ATTEMPTS)
+from core.database import db, firestore, run_db, get_doc, stream_docs, set_doc, update_doc, delete_doc
+from models.trip import TripRequest
+from services.admission import LLMOverloadedError
+from services.ai import generate_blog_from_trip
+from services.planner import plan_and_save_trip
+from services.podcast import podcast_service
+
+
+JOBS_COLLECTION = "jobs"
+
+# Terminal states never go back to the queue.
+TERMINAL_STATUSES = {"succeeded", "failed", "cancelled"}
+
+
+class JobNotFoundError(LookupError):
+    pass
+
+
+async def _run_plan(payload: dict, user: Optional[dict]) -> dict:
+    trip_request = TripRequest(**payload["trip_request"])
+    return await plan_and_save_trip(trip_request, user)
+
+
+async def _run_blog(payload: dict, user: Optional[dict]) -> dict:
+    trip_ref = db.collection("trips").where("user_id", "==", user["uid"]).where("id", "==", payload["trip_id"]).limit(1)
+    trips = await stream_docs(trip_ref)
+    if not trips:
+        raise ValueError("Trip not found")
+    blog_content = await generate_blog_from_trip(trips[0].to_dict(), user=user)
+    return {"success": True, "blog": blog_content}
+
+
+async def _run_podcast(payload: dict, user: Optional[dict]) -> dict:
+    return await podcast_service.generate_trip_podcast(
+        payload["trip_id"], user["uid"], payload.get("language", "vi"), user=user
+    )
+
+
+JOB_HANDLERS = {
+    "plan": _run_plan,
+    "blog": _run_blog,
+    "podcast": _run_podcast,
+}
+
+
+def _now() -> datetime:
+    # UTC so lease and expiry strings compare the same on every worker, across DST changes.
+    return datetime.now(timezone.utc)
+
+
+def _hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def is_job_owner(job: dict, user: Optional[dict], owner_token: Optional[str]) -> bool:
+    """Signed-in jobs need the same uid; anonymous jobs need the token returned at submit."""
+    if job.get("user_id"):
+        return bool(user) and user["uid"] == job["user_id"]
+    stored = job.get("owner_token_hash")
+    return bool(stored and owner_token) and hmac.compare_digest(stored, _hash_token(owner_token))
+
+
+def _persistable_result(result: dict) -> dict:
+    """Drop oversized fields (e.g. inline podcast audio) that would exceed Firestore's document limit."""
+    if len(json.dumps(result, ensure_ascii=False, default=str).encode("utf-8")) <= JOB_RESULT_MAX_BYTES:
+        return result
+    trimmed = {k: v for k, v in result.items() if not (isinstance(v, str) and len(v) > 10000)}
+    trimmed["truncated"] = True
+    return trimmed
+
+
+class JobManager:
+    """Firestore-backed job queue served by an asyncio worker pool."""
+
+    def __init__(self, concurrency: int, result_ttl: int, lease_seconds: int, max_attempts: int):
+        self.concurrency = max(1, concurrency)
+        self.result_ttl = result_ttl
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.worker_id = uuid.uuid4().hex[:12]
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._running = {}
+        self._stopping = False
+        # Full results for jobs finished by this process (persisted copies may be trimmed).
+        self._local_results = {}
+
+    def _ref(self, job_id: str):
+        return db.collection(JOBS_COLLECTION).document(job_id)
+
+    async def start(self):
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        for _ in range(self.concurrency):
+            self._workers.append(asyncio.create_task(self._worker()))
+        self._workers.append(asyncio.create_task(self._maintenance()))
+        try:
+            await self._recover()
+        except Exception as e:
+            print(f"[WARN] Could not recover pending jobs: {e}")
+        print(f"[OK] Job workers started ({self.concurrency} concurrent, worker {self.worker_id})")
+
+    async def stop(self):
+        self._stopping = True
+        for task in self._running.values():
+            task.cancel()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _recover(self, include_queued: bool = True):
+        """Re-enqueue queued jobs and running jobs whose lease expired (worker died or hung).
+
+        Periodic rescans pass `include_queued=False`: queued jobs are already in
+        some worker's queue or backing off after an overload.
+        """
+        now_iso = _now().isoformat()
+        for status in ("queued", "running") if include_queued else ("running",):
+            for doc in await stream_docs(db.collection(JOBS_COLLECTION).where("status", "==", status)):
+                job = doc.to_dict()
+                if status == "running" and (job.get("lease_until", "") > now_iso or doc.id in self._running):
+                    continue
+                self._queue.put_nowait(doc.id)
+
+    async def submit(self, kind: str, payload: dict, user: Optional[dict]) -> dict:
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        now_iso = _now().isoformat()
+        job = {
+            "id": job_id,
+            "kind": kind,
+            "status": "queued",
+            "user_id": user["uid"] if user else None,
+            "user": {k: user.get(k) for k in ("uid", "email", "displayName", "is_anonymous")} if user else None,
+            "payload": payload,
+            "attempts": 0,
+            "created_at": now_iso,
+            "updated_at": now_iso,
+        }
+        owner_token = None
+        if not user:
+            # Anonymous submitters prove ownership with this token; only its hash is stored.
+            owner_token = secrets.token_urlsafe(24)
+            job["owner_token_hash"] = _hash_token(owner_token)
+        await set_doc(self._ref(job_id), job)
+        self._queue.put_nowait(job_id)
+        if owner_token:
+            job["owner_token"] = owner_token
+        return job
+
+    async def get(self, job_id: str) -> dict:
+        doc = await get_doc(self._ref(job_id))
+        if not doc.exists:
+            raise JobNotFoundError(job_id)
+        job = doc.to_dict()
+        if job.get("status") == "succeeded" and job_id in self._local_results:
+            job["result"] = self._local_results[job_id]
+        return job
+
+    async def cancel(self, job_id: str) -> dict:
+        job = await self.get(job_id)
+        if job.get("status") in TERMINAL_STATUSES:
+            return job
+        task = self._running.get(job_id)
+        if task:
+            task.cancel()
+        update = {"status": "cancelled", "updated_at": _now().isoformat(), "expires_at": self._expiry()}
+        await update_doc(self._ref(job_id), update)
+        job.update(update)
+        return job
+
+    def _expiry(self) -> str:
+        return (_now() + timedelta(seconds=self.result_ttl)).isoformat()
+
+    def _claim(self, job_id: str) -> Optional[dict]:
+        """Atomically move a job to running so only one worker process executes it."""
+        ref = self._ref(job_id)
+        now = _now()
+
+        @firestore.transactional
+        def claim(transaction):
+            snap = ref.get(transaction=transaction)
+            if not snap.exists:
+                return None
+            job = snap.to_dict()
+            status = job.get("status")
+            if status == "running" and job.get("lease_until", "") > now.isoformat():
+                return None
+            if status not in ("queued", "running"):
+                return None
+            if job.get("attempts", 0) >= self.max_attempts:
+                # Lease expired on the last allowed run: give up instead of retrying forever.
+                transaction.update(ref, {
+                    "status": "failed",
+                    "error": f"Gave up after {job.get('attempts', 0)} attempts",
+                    "lease_until": "",
+                    "updated_at": now.isoformat(),
+                    "expires_at": self._expiry(),
+                })
+                return None
+            update = {
+                "status": "running",
+                "worker_id": self.worker_id,
+                "attempts": job.get("attempts", 0) + 1,
+                "started_at": now.isoformat(),
+                "lease_until": (now + timedelta(seconds=self.lease_seconds)).isoformat(),
+                "updated_at": now.isoformat(),
+            }
+            transaction.update(ref, update)
+            job.update(update)
+            return job
+
+        return claim(db.transaction())
+
+    async def _heartbeat(self, job_id: str):
+        """Extend the lease and notice cancellations requested through another worker."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                doc = await get_doc(self._ref(job_id))
+                if doc.exists and doc.to_dict().get("status") == "cancelled":
+                    task = self._running.get(job_id)
+                    if task:
+                        task.cancel()
+                    return
+                await update_doc(self._ref(job_id), {
+                    "lease_until": (_now() + timedelta(seconds=self.lease_seconds)).isoformat(),
+                })
+            except Exception as e:
+                print(f"[WARN] Job {job_id} heartbeat failed: {e}")
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._execute(job_id)
+            except Exception as e:
+                print(f"[ERROR] Job worker error for {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job_id: str):
+        job = await run_db(self._claim, job_id)
+        if job is None:
+            return
+
+        handler = JOB_HANDLERS[job["kind"]]
+        print(f"[INFO] Job {job_id} ({job['kind']}) started")
+        task = asyncio.create_task(handler(job.get("payload") or {}, job.get("user")))
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        self._running[job_id] = task
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if self._stopping:
+                # Shutting down: hand the job back so the next worker picks it up.
+                await update_doc(self._ref(job_id), {"status": "queued", "lease_until": "", "updated_at": _now().isoformat()})
+                raise
+            print(f"[INFO] Job {job_id} cancelled")
+            await update_doc(self._ref(job_id), {
+                "status": "cancelled",
+                "updated_at": _now().isoformat(),
+                "expires_at": self._expiry(),
+            })
+            return
+        except LLMOverloadedError as e:
+            if job.get("attempts", 0) >= self.max_attempts:
+                print(f"[ERROR] Job {job_id} failed: still overloaded after {job['attempts']} attempts")
+                await update_doc(self._ref(job_id), {
+                    "status": "failed",
+                    "error": str(e),
+                    "lease_until": "",
+                    "updated_at": _now().isoformat(),
+                    "expires_at": self._expiry(),
+                })
+                return
+            # Back off and put the job back in line instead of failing it.
+            await update_doc(self._ref(job_id), {"status": "queued", "updated_at": _now().isoformat()})
+            asyncio.get_running_loop().call_later(e.retry_after, self._queue.put_nowait, job_id)
+            return
+        except Exception as e:
+            print(f"[ERROR] Job {job_id} failed: {e}")
+            await update_doc(self._ref(job_id), {
+                "status": "failed",
+                "error": str(e),
+                "updated_at": _now().isoformat(),
+                "expires_at": self._expiry(),
+            })
+            return
+        finally:
+            heartbeat.cancel()
+            self._running.pop(job_id, None)
+
+        self._local_results[job_id] = result
+        await update_doc(self._ref(job_id), {
+            "status": "succeeded",
+            "result": _persistable_result(result),
+            "finished_at": _now().isoformat(),
+            "updated_at": _now().isoformat(),
+            "expires_at": self._expiry(),
+        })
+        print(f"[OK] Job {job_id} ({job['kind']}) finished")
+
+    async def _maintenance(self):
+        """Reclaim jobs whose lease expired and delete jobs whose result TTL has passed."""
+        cleanup_every = min(300, max(30, self.result_ttl // 4))
+        rescan_every = max(10, self.lease_seconds)
+        last_cleanup = time.monotonic()
+        while True:
+            await asyncio.sleep(min(cleanup_every, rescan_every))
+            try:
+                await self._recover(include_queued=False)
+            except Exception as e:
+                print(f"[WARN] Could not reclaim expired job leases: {e}")
+
+            if time.monotonic() - last_cleanup < cleanup_every:
+                continue
+            last_cleanup = time.monotonic()
+            try:
+                now_iso = _now().isoformat()
+                expired = await stream_docs(db.collection(JOBS_COLLECTION).where("expires_at", "<", now_iso).limit(200))
+                for doc in expired:
+                    await delete_doc(doc.reference)
+                    self._local_results.pop(doc.id, None)
+            except Exception as e:
+                print(f"[WARN] Job cleanup failed: {e}")
+
+
+job_manager = JobManager(JOB_WORKER_CONCURRENCY, JOB_RESULT_TTL, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS)
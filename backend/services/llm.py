@@ -0,0 +1,163 @@
+"""Gemini model router with per-task latency tiers and automatic fallback"""
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+from core.config import (GEMINI_MODEL_TIERS, LLM_TASKS, SAFETY_SETTINGS,
+                         LLM_HEALTH_WINDOW, LLM_ERROR_BUDGET, LLM_TIER_COOLDOWN)
+from services.admission import llm_admission, llm_priority
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised when every tier for a task failed or timed out."""
+
+
+# Errors worth retrying on another tier: rate limits (429), server errors (5xx)
+# and dropped connections. Anything else (bad request, safety block) would fail
+# the same way on every tier.
+TRANSIENT_ERRORS = (google_exceptions.TooManyRequests, google_exceptions.ServerError, ConnectionError)
+
+
+class _TierHealth:
+    """Rolling latency/error window for one (task, model) pair."""
+
+    def __init__(self, window: int):
+        self.samples = deque(maxlen=window)
+        self.cooldown_until = 0.0
+
+    def record(self, latency: float, ok: bool):
+        self.samples.append((latency, ok))
+
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def median_latency(self) -> float:
+        latencies = sorted(lat for lat, ok in self.samples if ok)
+        if not latencies:
+            return 0.0
+        return latencies[len(latencies) // 2]
+
+    def is_cooling(self, now: float) -> bool:
+        return now < self.cooldown_until
+
+
+class LLMRouter:
+    """Route each task to its configured model, falling back to faster tiers."""
+
+    def __init__(self, tasks: dict, tiers: list):
+        self.tasks = tasks
+        self.tiers = tiers
+        self._models = {}
+        self._health = {}
+
+    def _get_model(self, name: str, generation_config: dict):
+        key = (name, tuple(sorted(generation_config.items())))
+        if key not in self._models:
+            self._models[key] = genai.GenerativeModel(
+                name,
+                generation_config=generation_config,
+                safety_settings=SAFETY_SETTINGS,
+            )
+        return self._models[key]
+
+    def _health_for(self, task: str, name: str) -> _TierHealth:
+        key = (task, name)
+        if key not in self._health:
+            self._health[key] = _TierHealth(LLM_HEALTH_WINDOW)
+        return self._health[key]
+
+    def candidates(self, task: str) -> list:
+        """Primary model first, then every faster tier; cooling tiers go last."""
+        primary = self.tasks[task]["model"]
+        chain = [primary]
+        if primary in self.tiers:
+            chain += self.tiers[self.tiers.index(primary) + 1:]
+        else:
+            chain += [t for t in self.tiers if t != primary]
+
+        now = time.monotonic()
+        healthy = [m for m in chain if not self._health_for(task, m).is_cooling(now)]
+        cooling = [m for m in chain if m not in healthy]
+        return healthy + cooling
+
+    def _record(self, task: str, name: str, latency: float, ok: bool):
+        health = self._health_for(task, name)
+        health.record(latency, ok)
+
+        if len(health.samples) < 3:
+            return
+        budget = self.tasks[task]["latency_budget"]
+        if health.error_rate() > LLM_ERROR_BUDGET or health.median_latency() > budget:
+            if not health.is_cooling(time.monotonic()):
+                print(f"[WARN] LLM tier {name} breached budget for '{task}', cooling down {LLM_TIER_COOLDOWN:.0f}s")
+            health.cooldown_until = time.monotonic() + LLM_TIER_COOLDOWN
+            health.samples.clear()
+
+    async def generate_text(self, task: str, prompt: str) -> str:
+        """Generate text for `task`, trying each tier until one succeeds.
+
+        The whole chain shares the task's `timeout`. A tier with fallbacks
+        left gets at most `latency_budget` of it, so a slow primary still
+        leaves time for a faster tier. Only timeouts and transient errors
+        fall back; other errors are raised as is.
+        """
+        if task not in self.tasks:
+            raise ValueError(f"Unknown LLM task: {task}")
+
+        spec = self.tasks[task]
+        deadline = time.monotonic() + spec["timeout"]
+        chain = self.candidates(task)
+        last_error: Optional[Exception] = None
+        for position, name in enumerate(chain):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            timeout = remaining if position == len(chain) - 1 else min(remaining, spec["latency_budget"])
+            model = self._get_model(name, spec["generation_config"])
+            started = time.monotonic()
+            try:
+                response = await asyncio.wait_for(model.generate_content_async(prompt), timeout=timeout)
+                text = response.text.strip()
+            except asyncio.TimeoutError:
+                last_error = TimeoutError(f"{name} timed out after {timeout:.0f}s")
+                self._record(task, name, time.monotonic() - started, ok=False)
+                print(f"[WARN] LLM '{task}' on {name} timed out, falling back")
+                continue
+            except TRANSIENT_ERRORS as e:
+                last_error = e
+                self._record(task, name, time.monotonic() - started, ok=False)
+                print(f"[WARN] LLM '{task}' on {name} failed: {e}")
+                continue
+
+            latency = time.monotonic() - started
+            self._record(task, name, latency, ok=True)
+            print(f"[INFO] LLM '{task}' served by {name} in {latency:.2f}s")
+            return text
+
+        raise LLMUnavailableError(f"All Gemini tiers failed for '{task}': {last_error}")
+
+    def status(self) -> dict:
+        now = time.monotonic()
+        return {
+            f"{task}:{name}": {
+                "error_rate": round(h.error_rate(), 3),
+                "median_latency": round(h.median_latency(), 3),
+                "cooling": h.is_cooling(now),
+            }
+            for (task, name), h in self._health.items()
+        }
+
+
+llm_router = LLMRouter(LLM_TASKS, GEMINI_MODEL_TIERS)
+
+
+async def generate_text(task: str, prompt: str, user: Optional[dict] = None) -> str:
+    """Generate text for `task` once the admission controller grants a slot."""
+    async with llm_admission.slot(llm_priority(task, user)):
+        return await llm_router.generate_text(task, prompt)
@@ -58,6 +58,12 @@ def sanitize_place_name(s: str) -> str:
     return s
 
 
+def place_dedup_key(place_name: str, place_type_hint: Optional[str] = None) -> tuple:
+    """Normalized (name, hint) key used to resolve each place once per plan."""
+    name = sanitize_place_name(place_name).casefold() or (place_name or "").strip().casefold()
+    return (name, (place_type_hint or "").strip().lower() or None)
+
+
 def _haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
     """Great-circle distance in kilometers."""
     r = 6371.0
@@ -77,7 +83,7 @@ def get_place_details(place_name: str, location: str, place_type_hint: Optional[
         "name": place_name, "address": "", "rating": 0, "total_ratings": 0,
         "photo_url": "", "lat": 0, "lng": 0, "types": [], "price_level": 0,
         "weather": {"forecasts": []}, "phone": "", "website": "", "opening_hours": [],
-        "reviews": [], "google_maps_link": "", "booking_link": "", "is_hotel": False
+        "reviews": [], "google_maps_link": "", "booking_link": "", "is_hotel": False, "place_id": ""
     }
     
     try:
@@ -235,7 +241,8 @@ def get_place_details(place_name: str, location: str, place_type_hint: Optional[
             "reviews": reviews,
             "google_maps_link": google_maps_link,
             "booking_link": booking_link,
-            "is_hotel": is_hotel
+            "is_hotel": is_hotel,
+            "place_id": place_id or ""
         }
     
     except Exception as e:
@@ -249,7 +256,7 @@ async def get_place_details_async(place_name: str, location: str, location_coord
         "name": place_name, "address": "", "rating": 0, "total_ratings": 0,
         "photo_url": "", "lat": 0, "lng": 0, "types": [], "price_level": 0,
         "weather": {"forecasts": []}, "phone": "", "website": "", "opening_hours": [],
-        "reviews": [], "google_maps_link": "", "booking_link": "", "is_hotel": False
+        "reviews": [], "google_maps_link": "", "booking_link": "", "is_hotel": False, "place_id": ""
     }
 
     try:
@@ -395,7 +402,8 @@ async def get_place_details_async(place_name: str, location: str, location_coord
             "reviews": reviews,
             "google_maps_link": google_maps_link,
             "booking_link": booking_link,
-            "is_hotel": is_hotel
+            "is_hotel": is_hotel,
+            "place_id": place_id or ""
         }
     
     except Exception as e:
@@ -403,9 +411,11 @@ async def get_place_details_async(place_name: str, location: str, location_coord
         return empty_result
 
 
-async def enrich_activities_parallel(trip_plan: dict, destination: str, batch_size: int = 5) -> dict:
+async def enrich_activities_parallel(trip_plan: dict, destination: str, batch_size: int = 5,
+                                     location_coords: Optional[dict] = None) -> dict:
     """Enrich all activities with place details in parallel batches"""
-    location_coords = await async_geocode(destination)
+    if not location_coords or not location_coords.get("lat"):
+        location_coords = await async_geocode(destination)
 
     empty_result = {
         "name": "",
@@ -425,38 +435,47 @@ async def enrich_activities_parallel(trip_plan: dict, destination: str, batch_si
         "google_maps_link": "",
         "booking_link": "",
         "is_hotel": False,
+        "place_id": "",
     }
     
-    all_activities = []
+    # Group activities by normalized (name, hint) so repeated places in a plan
+    # (same hotel, market, restaurant on several days) are resolved once.
+    groups = {}
     for day in trip_plan.get("days", []):
         for activity in day.get("activities", []):
             if activity.get("place"):
-                all_activities.append(activity)
+                hint = (activity.get("place_type_hint") or "").strip().lower() or None
+                groups.setdefault(place_dedup_key(activity["place"], hint), []).append(activity)
     
-    total_activities = len(all_activities)
-    #print(f"Enriching {total_activities} activities in parallel batches of {batch_size}...")
+    unique_keys = list(groups.keys())
+    total_activities = sum(len(v) for v in groups.values())
+    print(f"[INFO] Enriching {total_activities} activities ({len(unique_keys)} unique places)")
     
-    for batch_start in range(0, total_activities, batch_size):
-        batch_end = min(batch_start + batch_size, total_activities)
-        batch = all_activities[batch_start:batch_end]
-        
-        # print(f"  Batch {batch_start // batch_size + 1}: Processing activities {batch_start + 1}-{batch_end}")
+    for batch_start in range(0, len(unique_keys), batch_size):
+        batch = unique_keys[batch_start:batch_start + batch_size]
         
         tasks = [
-            get_place_details_async(activity.get("place", ""), destination, location_coords)
-            for activity in batch
+            get_place_details_async(
+                groups[key][0].get("place", ""),
+                destination,
+                location_coords,
+                place_type_hint=key[1],
+            )
+            for key in batch
         ]
         
         results = await asyncio.gather(*tasks, return_exceptions=True)
         
-        for i, result in enumerate(results):
+        for key, result in zip(batch, results):
+            activities = groups[key]
             if isinstance(result, Exception):
-                print(f"    Error for {batch[i].get('place', 'unknown')}: {result}")
-                batch[i]["place_details"] = empty_result
-            else:
-                batch[i]["place_details"] = result
-                if result.get("address"):
-                    print(f"    {batch[i].get('place', 'unknown')[:30]}...")
+                print(f"    Error for {activities[0].get('place', 'unknown')}: {result}")
+                result = empty_result
+            elif result.get("address"):
+                print(f"    {activities[0].get('place', 'unknown')[:30]}...")
+            # Each activity gets its own copy so later per-activity edits stay local.
+            for activity in activities:
+                activity["place_details"] = dict(result)
     return trip_plan
 
 
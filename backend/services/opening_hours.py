@@ -0,0 +1,207 @@
+"""Opening-hours parsing and schedule validation for enriched trip plans."""
+
+from __future__ import annotations
+
+import re
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Optional
+
+import numpy as np
+
+from services.routing import is_anchor_activity
+from services.schedule import apply_time_buffers, parse_time_arrays
+from services.text import fold_vietnamese
+
+
+# Index matches date.weekday(): Monday == 0.
+WEEKDAY_NAMES = {
+    "thu hai": 0, "thu ba": 1, "thu tu": 2, "thu nam": 3, "thu sau": 4, "thu bay": 5, "chu nhat": 6,
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6,
+}
+CLOSED_MARKERS = ("dong cua", "closed")
+ALL_DAY_MARKERS = ("mo cua ca ngay", "open 24 hours", "24 gio")
+
+_RANGE_RE = re.compile(
+    r"(\d{1,2})(?::(\d{2}))?\s*(sa|ch|am|pm)?\s*[-–—]\s*(\d{1,2})(?::(\d{2}))?\s*(sa|ch|am|pm)?"
+)
+
+WeeklyHours = tuple  # 7 entries: np.ndarray[k, 2] of (open_min, close_min), or None if unknown
+
+_CACHE_MAX = 4096
+_hours_cache: OrderedDict[str, WeeklyHours] = OrderedDict()
+
+
+def _to_minutes(hour: str, minute: str, suffix: Optional[str]) -> int:
+    h, m = int(hour), int(minute or 0)
+    if suffix in ("pm", "ch") and h < 12:
+        h += 12
+    elif suffix in ("am", "sa") and h == 12:
+        h = 0
+    return h * 60 + m
+
+
+def _parse_day_body(body: str) -> tuple:
+    """(intervals for the day or None if unreadable, intervals spilling past midnight)."""
+    if any(marker in body for marker in CLOSED_MARKERS):
+        return np.zeros((0, 2), dtype=np.int16), []
+    if any(marker in body for marker in ALL_DAY_MARKERS):
+        return np.array([[0, 1440]], dtype=np.int16), []
+
+    intervals, spill = [], []
+    for h1, m1, s1, h2, m2, s2 in _RANGE_RE.findall(body):
+        end = _to_minutes(h2, m2, s2 or None)
+        start = _to_minutes(h1, m1, s1 or None)
+        if not s1 and s2:
+            # "1:00 – 5:00 PM": the start shares the end's period unless that puts it after the end.
+            shared = _to_minutes(h1, m1, s2)
+            if shared <= end:
+                start = shared
+        if end <= start:
+            # Past midnight: open until the end of the day, then into the next morning.
+            if end > 0:
+                spill.append((0, end))
+            end = 1440
+        intervals.append((start, end))
+    if not intervals:
+        return None, []
+    return np.array(sorted(intervals), dtype=np.int16).reshape(-1, 2), spill
+
+
+def parse_weekday_text(weekday_text: list[str]) -> WeeklyHours:
+    """Parse Google `weekday_text` lines (vi or en) into per-weekday interval arrays.
+
+    Days whose text cannot be read stay None (unknown); hours past midnight
+    are added to the following day.
+    """
+    week: list[Optional[np.ndarray]] = [None] * 7
+    spills: list[list] = [[] for _ in range(7)]
+    for line in weekday_text or []:
+        if not isinstance(line, str) or ":" not in line:
+            continue
+        name, body = line.split(":", 1)
+        weekday = WEEKDAY_NAMES.get(fold_vietnamese(name))
+        if weekday is None:
+            continue
+        week[weekday], spills[(weekday + 1) % 7] = _parse_day_body(fold_vietnamese(body))
+    for weekday, spill in enumerate(spills):
+        if spill and week[weekday] is not None:
+            merged = sorted(week[weekday].tolist() + [list(i) for i in spill])
+            week[weekday] = np.array(merged, dtype=np.int16).reshape(-1, 2)
+    return tuple(week)
+
+
+def hours_for_place(place_details: dict) -> Optional[WeeklyHours]:
+    """Parsed hours for a place, cached per place_id."""
+    weekday_text = place_details.get("opening_hours") if isinstance(place_details, dict) else None
+    if not weekday_text:
+        return None
+
+    place_id = place_details.get("place_id")
+    if not place_id:
+        return parse_weekday_text(weekday_text)
+
+    cached = _hours_cache.get(place_id)
+    if cached is not None:
+        _hours_cache.move_to_end(place_id)
+        return cached
+
+    hours = parse_weekday_text(weekday_text)
+    _hours_cache[place_id] = hours
+    if len(_hours_cache) > _CACHE_MAX:
+        _hours_cache.popitem(last=False)
+    return hours
+
+
+def is_open_during(hours: Optional[WeeklyHours], weekday: int, start_min: int, end_min: int) -> bool:
+    """True if [start, end] fits inside one opening interval (unknown hours count as open)."""
+    if hours is None:
+        return True
+    day = hours[weekday]
+    if day is None:
+        return True
+    if len(day) == 0:
+        return False
+    return bool(np.any((day[:, 0] <= start_min) & (day[:, 1] >= end_min)))
+
+
+def _day_conflicts(activities: list[Any], weekday: int) -> list[int]:
+    start, end, valid = parse_time_arrays(activities)
+    conflicts = []
+    for i in np.flatnonzero(valid).tolist():
+        hours = hours_for_place(activities[i].get("place_details") or {})
+        if not is_open_during(hours, weekday, int(start[i]), int(end[i])):
+            conflicts.append(i)
+    return conflicts
+
+
+def _reschedule(activities: list[Any], schedule_kwargs: dict) -> list[Any]:
+    candidate = [dict(a) if isinstance(a, dict) else a for a in activities]
+    apply_time_buffers({"days": [{"activities": candidate}]}, **schedule_kwargs)
+    return candidate
+
+
+def _repair_day(activities: list[Any], weekday: int, schedule_kwargs: dict) -> list[Any]:
+    """Swap activities within the day until no swap reduces the number of conflicts.
+
+    Anchors (check-in/out, meals) keep their slot, as in route ordering.
+    """
+    best = activities
+    best_conflicts = _day_conflicts(best, weekday)
+    movable = [i for i, a in enumerate(activities) if isinstance(a, dict) and not is_anchor_activity(a)]
+
+    while best_conflicts:
+        improved = False
+        for i in best_conflicts:
+            if i not in movable:
+                continue
+            for j in movable:
+                if j == i:
+                    continue
+                order = list(best)
+                order[i], order[j] = order[j], order[i]
+                candidate = _reschedule(order, schedule_kwargs)
+                conflicts = _day_conflicts(candidate, weekday)
+                if len(conflicts) < len(best_conflicts):
+                    best, best_conflicts, improved = candidate, conflicts, True
+                    break
+            if improved:
+                break
+        if not improved:
+            break
+
+    for i, activity in enumerate(best):
+        if isinstance(activity, dict):
+            activity.pop("opening_hours_warning", None)
+            if i in best_conflicts:
+                activity["opening_hours_warning"] = "Địa điểm có thể đóng cửa vào thời gian này"
+    return best
+
+
+def fix_opening_hours_conflicts(trip_plan: dict[str, Any], *,
+                                start_date: date,
+                                active_time_start: Optional[int],
+                                active_time_end: Optional[int],
+                                travel_mode: Optional[str]) -> dict[str, Any]:
+    """Check every activity against the trip date's opening hours and repair locally.
+
+    Conflicts are resolved by swapping activities inside the same day and
+    re-running the time buffers; whatever cannot be fixed is flagged with
+    `opening_hours_warning` instead of re-prompting the model.
+    """
+    days = trip_plan.get("days") if isinstance(trip_plan, dict) else None
+    if not isinstance(days, list):
+        return trip_plan
+
+    schedule_kwargs = {
+        "active_time_start": active_time_start,
+        "active_time_end": active_time_end,
+        "travel_mode": travel_mode,
+    }
+    for idx, day in enumerate(days):
+        if not isinstance(day, dict) or not isinstance(day.get("activities"), list):
+            continue
+        day_number = day.get("day") if isinstance(day.get("day"), int) else idx + 1
+        weekday = (start_date + timedelta(days=day_number - 1)).weekday()
+        day["activities"] = _repair_day(day["activities"], weekday, schedule_kwargs)
+    return trip_plan
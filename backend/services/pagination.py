@@ -0,0 +1,21 @@
+"""Opaque page tokens for cursor-paginated endpoints"""
+import base64
+import binascii
+import json
+
+
+def encode_page_token(payload: dict) -> str:
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_page_token(token: str) -> dict:
+    """Payload of a token from `encode_page_token`; ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+    if not isinstance(payload, dict):
+        raise ValueError("Invalid cursor")
+    return payload
@@ -0,0 +1,167 @@
+"""Single-pass post-processing pipeline for trip plans."""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Optional
+
+from services.schedule import active_window, schedule_activity_days
+
+
+# Bump when a stage changes what a normalized plan looks like; stored plans
+# stamped with an older version are normalized again on read.
+PLAN_SCHEMA_VERSION = 1
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_PLACEHOLDER_PREFIXES = ("di chuyển", "di chuyen")
+_PLACEHOLDER_NAMES = {"travel", "transit", "commute", "move"}
+
+
+def _normalize_compact_text(text: str) -> str:
+    return _WHITESPACE_RE.sub(" ", (text or "").strip().lower())
+
+
+def is_travel_placeholder_activity(activity: dict) -> bool:
+    """Detect AI-generated travel-only rows like 'Di chuyển'."""
+    try:
+        place = _normalize_compact_text(str(activity.get("place", "")))
+        if not place:
+            return False
+
+        # Vietnamese placeholders
+        for prefix in _PLACEHOLDER_PREFIXES:
+            if place == prefix or place.startswith(prefix + " "):
+                return True
+
+        # Common English placeholders
+        if place in _PLACEHOLDER_NAMES:
+            return True
+    except Exception:
+        return False
+
+    return False
+
+
+class PlanStage:
+    """A pluggable pipeline stage.
+
+    Stages override `keep_activity` (per-activity filter), `process_day`
+    (per-day transform on the already-filtered activity list) and/or
+    `finish_plan` (once, after every day has been processed). The pipeline
+    only calls the hooks a stage actually overrides.
+    """
+
+    def keep_activity(self, activity: dict, ctx: dict) -> bool:
+        return True
+
+    def process_day(self, day: dict, activities: list, ctx: dict) -> list:
+        return activities
+
+    def finish_plan(self, trip_plan: dict, ctx: dict) -> None:
+        return None
+
+
+class DropTravelPlaceholders(PlanStage):
+    def keep_activity(self, activity: dict, ctx: dict) -> bool:
+        return not is_travel_placeholder_activity(activity)
+
+
+class CapActivities(PlanStage):
+    def __init__(self, max_per_day: int = 8):
+        self.max_per_day = max_per_day
+
+    def process_day(self, day: dict, activities: list, ctx: dict) -> list:
+        if self.max_per_day > 0 and len(activities) > self.max_per_day:
+            return activities[:self.max_per_day]
+        return activities
+
+
+class TimeBuffers(PlanStage):
+    """Distance-aware buffers; reads active_time_start/end and travel_mode from ctx.
+
+    Days are collected while the pipeline walks the plan and scheduled together
+    at the end, so the array engine runs once per plan rather than once per day.
+    """
+
+    def process_day(self, day: dict, activities: list, ctx: dict) -> list:
+        ctx.setdefault("schedule_days", []).append(activities)
+        return activities
+
+    def finish_plan(self, trip_plan: dict, ctx: dict) -> None:
+        schedule_activity_days(
+            ctx.get("schedule_days") or [],
+            travel_mode=ctx.get("travel_mode"),
+            start_floor=ctx.get("start_floor"),
+            end_cap=ctx.get("end_cap"),
+        )
+
+
+class PlanPipeline:
+    """Run all stages over a plan in one traversal of its days and activities."""
+
+    def __init__(self, stages: list[PlanStage], stamp_version: bool = True):
+        self.stages = list(stages)
+        self.stamp_version = stamp_version
+        # "Compile": keep only the hooks each stage overrides.
+        self._filters = [
+            s.keep_activity for s in self.stages
+            if type(s).keep_activity is not PlanStage.keep_activity
+        ]
+        self._day_fns = [
+            s.process_day for s in self.stages
+            if type(s).process_day is not PlanStage.process_day
+        ]
+        self._finishers = [
+            s.finish_plan for s in self.stages
+            if type(s).finish_plan is not PlanStage.finish_plan
+        ]
+
+    def run(self, trip_plan: dict[str, Any], *,
+            active_time_start: Optional[int] = None,
+            active_time_end: Optional[int] = None,
+            travel_mode: Optional[str] = None) -> dict[str, Any]:
+        if not isinstance(trip_plan, dict):
+            return trip_plan
+        days = trip_plan.get("days")
+        if not isinstance(days, list):
+            return trip_plan
+
+        start_floor, end_cap = active_window(active_time_start, active_time_end)
+        ctx = {"start_floor": start_floor, "end_cap": end_cap, "travel_mode": travel_mode}
+        filters = self._filters
+        day_fns = self._day_fns
+
+        for day in days:
+            if not isinstance(day, dict):
+                continue
+            activities = day.get("activities")
+            if not isinstance(activities, list) or not activities:
+                continue
+            kept = [
+                a for a in activities
+                if isinstance(a, dict) and all(f(a, ctx) for f in filters)
+            ]
+            for fn in day_fns:
+                kept = fn(day, kept, ctx)
+            day["activities"] = kept
+
+        for fn in self._finishers:
+            fn(trip_plan, ctx)
+
+        if self.stamp_version:
+            trip_plan["plan_schema_version"] = PLAN_SCHEMA_VERSION
+        return trip_plan
+
+
+def is_normalized(trip_plan: Any) -> bool:
+    return isinstance(trip_plan, dict) and trip_plan.get("plan_schema_version") == PLAN_SCHEMA_VERSION
+
+
+# Read-side cleanup for legacy (unstamped) documents; does not claim normalization.
+SANITIZE_PIPELINE = PlanPipeline([DropTravelPlaceholders()], stamp_version=False)
+
+# Placeholders removed and days capped; used right after generation.
+CLEANUP_PIPELINE = PlanPipeline([DropTravelPlaceholders(), CapActivities(max_per_day=8)])
+
+# Full normalization for user-saved plans: cleanup plus time buffers in the same pass.
+SAVE_PIPELINE = PlanPipeline([DropTravelPlaceholders(), CapActivities(max_per_day=8), TimeBuffers()])
@@ -0,0 +1,350 @@
+"""Trip planning pipeline: Gemini generation, post-processing, enrichment and persistence"""
+from datetime import date, datetime, timedelta
+from typing import Optional
+import json
+import re
+import time
+
+from core.database import db, set_doc
+from models.trip import TripRequest
+from services.ai import create_day_regeneration_prompt, create_trip_planning_prompt
+from services.clustering import cluster_trip_days
+from services.llm import generate_text
+from services.maps import async_geocode, enrich_activities_parallel
+from services.opening_hours import fix_opening_hours_conflicts
+from services.plan_pipeline import CLEANUP_PIPELINE
+from services.prefetch import DestinationPrefetch
+from services.pricing import apply_cost_bands
+from services.routing import optimize_day_order, optimize_trip_routes
+from services.schedule import apply_time_buffers, assign_local_times
+from services.templates import find_template_trip, fork_template_plan
+from services.weather_fit import fit_plan_to_weather
+
+
+class TripPlanParseError(ValueError):
+    """Raised when the model response does not contain a JSON plan."""
+
+    def __init__(self, raw_text: str):
+        super().__init__("JSON not found in response")
+        self.raw_text = raw_text
+
+
+def _extract_json_object(raw_text: str) -> dict:
+    text = (raw_text or "").strip()
+    if text.startswith("{"):
+        # JSON response mode returns the bare object.
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            pass
+    match = re.search(r'```json\s*(\{.*?\})\s*```|(\{.*?\})', raw_text, re.DOTALL)
+    if not match:
+        print("[ERROR] JSON not found in response")
+        raise TripPlanParseError(raw_text)
+    return json.loads(match.group(1) or match.group(2))
+
+
+def prepare_compact_plan(trip_plan: dict, *, active_time_start: Optional[int]) -> dict:
+    """Expand the compact model output: provisional times and Places hints from categories."""
+    for day in trip_plan.get("days") or []:
+        for activity in (day.get("activities") if isinstance(day, dict) else None) or []:
+            if isinstance(activity, dict) and activity.get("category") == "hotel" and not activity.get("place_type_hint"):
+                activity["place_type_hint"] = "hotel"
+    return assign_local_times(trip_plan, active_time_start=active_time_start)
+
+
+def build_daily_weather(forecasts: list, start_date: date, duration: int) -> list:
+    """Map provider forecasts onto trip days by calendar date."""
+    forecast_by_date = {}
+    for fc in forecasts:
+        if isinstance(fc, dict) and fc.get("date"):
+            forecast_by_date[str(fc.get("date"))] = fc
+
+    destination_weather = []
+    for i in range(int(duration or 0)):
+        trip_date = (start_date + timedelta(days=i)).strftime("%Y-%m-%d")
+        fc = forecast_by_date.get(trip_date)
+        if not fc:
+            continue
+        destination_weather.append({
+            "day": i + 1,
+            "date": fc.get("date", trip_date),
+            "temp_max": fc.get("temp_max", 0),
+            "temp_min": fc.get("temp_min", 0),
+            "condition": fc.get("condition", ""),
+            "rain_chance": fc.get("rain_chance", 0),
+            "humidity": fc.get("humidity", 0),
+            "is_rainy": fc.get("is_rainy", False),
+            "is_sunny": fc.get("is_sunny", False),
+        })
+    return destination_weather
+
+
+async def plan_and_save_trip(trip_request: TripRequest, user: Optional[dict] = None) -> dict:
+    """Generate, enrich and (for signed-in users) persist a trip plan.
+
+    With `instant`, a close public trip is forked instead of calling Gemini.
+    """
+    template = None
+    if trip_request.instant:
+        try:
+            template = await find_template_trip(trip_request)
+        except Exception as e:
+            print(f"[WARN] Template lookup failed: {e}")
+
+    # Destination-only lookups run concurrently with the Gemini call.
+    prefetch = DestinationPrefetch(trip_request.destination, with_cover_image=bool(user) and template is None)
+    try:
+        if template is not None:
+            return await _plan_from_template(trip_request, user, prefetch, template)
+        return await _plan_and_save_trip(trip_request, user, prefetch)
+    finally:
+        prefetch.cancel()
+
+
+async def _plan_from_template(trip_request: TripRequest, user: Optional[dict], prefetch: DestinationPrefetch,
+                              template: dict) -> dict:
+    start_time = time.time()
+    print(f"[INFO] Instant plan for {trip_request.destination} from template {template['id']}")
+
+    trip_plan = fork_template_plan(template)
+    weather_info = await _attach_weather(trip_plan, trip_request, prefetch)
+    _finalize_schedule(trip_plan, trip_request)
+
+    if user:
+        await _save_trip(trip_request, user, trip_plan, weather_info, template.get("cover_image"))
+
+    elapsed = time.time() - start_time
+    print(f"[SUCCESS] Instant plan completed in {elapsed:.2f} seconds")
+    return trip_plan
+
+
+async def _plan_and_save_trip(trip_request: TripRequest, user: Optional[dict], prefetch: DestinationPrefetch) -> dict:
+    start_time = time.time()
+    print(f"Trip Planning for: {trip_request.destination}")
+    print(f"Duration: {trip_request.duration} days | Budget: {trip_request.budget}")
+    
+    trip_prompt = create_trip_planning_prompt(trip_request)
+    
+    print("[INFO] Gemini processing...")
+    raw_text = await generate_text("plan", trip_prompt, user=user)
+    trip_plan = _extract_json_object(raw_text)
+
+    # Drop travel-only rows and cap activities/day in one pass, before scheduling.
+    try:
+        trip_plan = CLEANUP_PIPELINE.run(trip_plan)
+    except Exception as e:
+        print(f"[WARN] Could not clean up trip plan: {e}")
+
+    # The model only returns order and duration classes; lay out provisional times locally.
+    trip_plan = prepare_compact_plan(trip_plan, active_time_start=trip_request.active_time_start)
+
+    weather_info = await _attach_weather(trip_plan, trip_request, prefetch)
+    
+    print("[INFO] Enriching activities with Google Places...")
+    trip_plan = await enrich_activities_parallel(
+        trip_plan, 
+        trip_request.destination, 
+        batch_size=5,
+        location_coords=await prefetch.coords,
+    )
+    
+    trip_plan = apply_cost_bands(trip_plan, trip_request.budget)
+    
+    # Regroup activities so each day covers one area, then order within days.
+    try:
+        trip_plan = cluster_trip_days(trip_plan)
+    except Exception as e:
+        print(f"[WARN] Could not cluster activities by area: {e}")
+    
+    # Reorder each day geographically now that coordinates are known.
+    try:
+        trip_plan = optimize_trip_routes(trip_plan)
+    except Exception as e:
+        print(f"[WARN] Could not optimize day routes: {e}")
+    
+    _finalize_schedule(trip_plan, trip_request)
+    
+    total_activities = sum(len(day.get("activities", [])) for day in trip_plan.get("days", []))
+    print(f"[SUCCESS] Trip plan generated with {total_activities} activities!")
+    
+    # Save trip if user is authenticated
+    if user:
+        await _save_trip(trip_request, user, trip_plan, weather_info, await prefetch.cover_image)
+    
+    elapsed = time.time() - start_time
+    print(f"[SUCCESS] Trip Planning completed in {elapsed:.2f} seconds")
+    
+    return trip_plan
+
+
+async def _attach_weather(trip_plan: dict, trip_request: TripRequest, prefetch: DestinationPrefetch) -> dict:
+    """Set trip_plan["weather_forecast"] for the trip dates; returns the raw forecast info."""
+    # Get destination weather forecast (Google Maps Platform Weather API supports up to 10 days)
+    destination_weather = []
+    weather_info = {}
+    forecasts = []
+    try:
+        start_date = datetime.strptime(trip_request.start_date, "%Y-%m-%d").date()
+        today = datetime.now().date()
+        days_until_trip = (start_date - today).days
+
+        weather_data = await prefetch.weather
+        forecasts = weather_data.get("forecasts", [])
+        if forecasts:
+            weather_info = {"forecasts": forecasts}
+            print(f"[OK] Weather API returned {len(forecasts)} days of forecast")
+
+            destination_weather = build_daily_weather(forecasts, start_date, trip_request.duration)
+            if destination_weather:
+                print(f"[OK] Weather forecast added for {len(destination_weather)} days")
+            else:
+                if days_until_trip > 10:
+                    print(
+                        f"[WARN] Trip starts in {days_until_trip} days; forecast only available for up to 10 days"
+                    )
+                else:
+                    print("[WARN] No matching forecast dates for trip window")
+    except Exception as e:
+        print(f"[ERROR] Could not fetch destination weather: {e}")
+
+    trip_plan["weather_forecast"] = destination_weather
+    return weather_info
+
+
+def _finalize_schedule(trip_plan: dict, trip_request: TripRequest) -> None:
+    """Weather fit, buffers and opening hours for the request's dates and active window."""
+    # Put outdoor activities on dry forecast days; buffers below re-time the result.
+    try:
+        trip_plan = fit_plan_to_weather(trip_plan)
+    except Exception as e:
+        print(f"[WARN] Could not fit plan to weather: {e}")
+    
+    # Enforce buffer time between consecutive activities (deterministic post-process)
+    try:
+        trip_plan = apply_time_buffers(
+            trip_plan,
+            active_time_start=getattr(trip_request, "active_time_start", None),
+            active_time_end=getattr(trip_request, "active_time_end", None),
+            travel_mode=getattr(trip_request, "travel_mode", None),
+        )
+    except Exception as e:
+        print(f"[WARN] Could not apply time buffers: {e}")
+    
+    # Move activities away from times when the venue is closed.
+    try:
+        trip_plan = fix_opening_hours_conflicts(
+            trip_plan,
+            start_date=datetime.strptime(trip_request.start_date, "%Y-%m-%d").date(),
+            active_time_start=getattr(trip_request, "active_time_start", None),
+            active_time_end=getattr(trip_request, "active_time_end", None),
+            travel_mode=getattr(trip_request, "travel_mode", None),
+        )
+    except Exception as e:
+        print(f"[WARN] Could not validate opening hours: {e}")
+
+
+async def _save_trip(trip_request: TripRequest, user: dict, trip_plan: dict, weather_info: dict,
+               cover_image_url: Optional[str]) -> str:
+    trip_id = f"{user['uid']}_{int(datetime.now().timestamp())}"
+    
+    trip_data = {
+        "id": trip_id,
+        "user_id": user['uid'],
+        "is_anonymous": user.get('is_anonymous', False),
+        "destination": trip_request.destination,
+        "duration": trip_request.duration,
+        "budget": trip_request.budget,
+        "start_date": trip_request.start_date,
+        "preferences": trip_request.preferences,
+        "activity_level": trip_request.activity_level,
+        "travel_group": trip_request.travel_group,
+        "group_size": trip_request.group_size,
+        "travel_mode": trip_request.travel_mode,
+        "categories": trip_request.categories,
+        "active_time_start": trip_request.active_time_start,
+        "active_time_end": trip_request.active_time_end,
+        "trip_plan": trip_plan,
+        "weather": weather_info,
+        "created_at": datetime.now().isoformat(),
+        "rating": 0,
+        "is_public": False,
+        "views_count": 0,
+        "likes_count": 0,
+        "category_tags": trip_request.categories or [],
+        "cover_image": cover_image_url,
+    }
+    
+    await set_doc(db.collection("trips").document(trip_id), trip_data)
+    print(f"[OK] Trip saved: {trip_id}")
+    
+    trip_plan["trip_id"] = trip_id
+    trip_plan["cover_image"] = cover_image_url
+    return trip_id
+
+
+def _plan_center(trip_plan: dict) -> dict:
+    """Mean coordinates of the already-enriched activities, used to bias Places lookups."""
+    coords = [
+        (a["place_details"].get("lat"), a["place_details"].get("lng"))
+        for day in trip_plan.get("days") or [] if isinstance(day, dict)
+        for a in day.get("activities") or []
+        if isinstance(a, dict) and isinstance(a.get("place_details"), dict)
+    ]
+    coords = [(lat, lng) for lat, lng in coords if lat and lng]
+    if not coords:
+        return {}
+    return {
+        "lat": sum(lat for lat, _ in coords) / len(coords),
+        "lng": sum(lng for _, lng in coords) / len(coords),
+    }
+
+
+async def regenerate_trip_day(trip_data: dict, day_number: int, instructions: str = "",
+                              user: Optional[dict] = None) -> dict:
+    """Generate, enrich and schedule a replacement for one day of a saved trip.
+
+    Places used on the other days are passed to Gemini as exclusions; only the
+    new day's activities go through Places, routing and the scheduler.
+    """
+    trip_plan = trip_data.get("trip_plan") or {}
+    exclude_places = []
+    for i, day in enumerate(trip_plan.get("days") or []):
+        if not isinstance(day, dict) or day.get("day", i + 1) == day_number:
+            continue
+        for activity in day.get("activities") or []:
+            if isinstance(activity, dict) and activity.get("place"):
+                exclude_places.append(str(activity["place"]))
+
+    prompt = create_day_regeneration_prompt(trip_data, day_number, exclude_places, instructions)
+    raw_text = await generate_text("day", prompt, user=user)
+    new_day = _extract_json_object(raw_text)
+    if not isinstance(new_day.get("activities"), list):
+        raise TripPlanParseError(raw_text)
+    new_day["day"] = day_number
+
+    day_plan = CLEANUP_PIPELINE.run({"days": [new_day]})
+    day_plan = prepare_compact_plan(day_plan, active_time_start=trip_data.get("active_time_start"))
+    destination = trip_data.get("destination") or ""
+    location_coords = _plan_center(trip_plan) or await async_geocode(destination)
+    day_plan = await enrich_activities_parallel(day_plan, destination, batch_size=5, location_coords=location_coords)
+    apply_cost_bands(day_plan, trip_data.get("budget"))
+    new_day["activities"] = optimize_day_order(new_day["activities"])
+
+    schedule_kwargs = {
+        "active_time_start": trip_data.get("active_time_start"),
+        "active_time_end": trip_data.get("active_time_end"),
+        "travel_mode": trip_data.get("travel_mode"),
+    }
+    try:
+        apply_time_buffers(day_plan, **schedule_kwargs)
+    except Exception as e:
+        print(f"[WARN] Could not apply time buffers: {e}")
+    try:
+        start_date = datetime.strptime(trip_data.get("start_date") or "", "%Y-%m-%d").date()
+        fix_opening_hours_conflicts(day_plan, start_date=start_date, **schedule_kwargs)
+    except Exception as e:
+        print(f"[WARN] Could not validate opening hours: {e}")
+
+    print(f"[OK] Regenerated day {day_number} with {len(new_day['activities'])} activities")
+    return new_day
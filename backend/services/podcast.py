@@ -1,8 +1,8 @@
 """Podcast generation service using Google Cloud Text-to-Speech"""
 from google.cloud import texttospeech
 from google.cloud import storage
-from core.database import db
-from services.ai import model
+from core.database import db, get_doc, set_doc
+from services.llm import generate_text
 import io
 import json
 import re
@@ -33,11 +33,11 @@ class PodcastService:
             self.tts_client = None
         # Storage will be handled by Firebase Storage in future implementation
     
-    async def generate_trip_podcast(self, trip_id: str, user_id: str, language: str = "vi") -> dict:
+    async def generate_trip_podcast(self, trip_id: str, user_id: str, language: str = "vi", user: Optional[dict] = None) -> dict:
         """Generate audio podcast from trip data"""
         try:
             # Fetch trip data using document ID
-            trip_doc = db.collection("trips").document(trip_id).get()
+            trip_doc = await get_doc(db.collection("trips").document(trip_id))
             
             if not trip_doc.exists:
                 raise ValueError("Trip not found")
@@ -45,7 +45,7 @@ class PodcastService:
             trip_data = trip_doc.to_dict()
             
             # Generate podcast script using AI
-            script = await self._generate_script(trip_data, language)
+            script = await self._generate_script(trip_data, language, user=user)
             
             # Convert to audio (truncate if needed to stay within 5000 byte limit)
             full_text = script["full_text"]
@@ -85,7 +85,7 @@ class PodcastService:
                 "created_at": datetime.now().isoformat()
             }
             
-            db.collection("podcasts").document(trip_id).set(podcast_data)
+            await set_doc(db.collection("podcasts").document(trip_id), podcast_data)
             
             return {
                 "success": True,
@@ -98,7 +98,7 @@ class PodcastService:
             print(f"Error generating podcast: {e}")
             raise
     
-    async def _generate_script(self, trip_data: dict, language: str) -> dict:
+    async def _generate_script(self, trip_data: dict, language: str, user: Optional[dict] = None) -> dict:
         """Generate podcast script using Gemini AI with weather info"""
         try:
             trip_plan = trip_data.get("trip_plan", {})
@@ -167,8 +167,7 @@ QUAN TRỌNG: full_text phải là văn nói hoàn toàn tự nhiên, không có
 CHỈ TRẢ VỀ JSON, KHÔNG TEXT KHÁC.
 """
             
-            response = await model.generate_content_async(prompt)
-            raw_text = response.text.strip()
+            raw_text = await generate_text("podcast", prompt, user=user)
             
             # Try multiple patterns to extract JSON
             patterns = [
@@ -231,10 +230,10 @@ CHỈ TRẢ VỀ JSON, KHÔNG TEXT KHÁC.
             print(f"Error in text-to-speech: {e}")
             raise
     
-    def get_podcast(self, trip_id: str) -> Optional[dict]:
+    async def get_podcast(self, trip_id: str) -> Optional[dict]:
         """Get podcast metadata for a trip"""
         try:
-            podcast_doc = db.collection("podcasts").document(trip_id).get()
+            podcast_doc = await get_doc(db.collection("podcasts").document(trip_id))
             if podcast_doc.exists:
                 return podcast_doc.to_dict()
             return None
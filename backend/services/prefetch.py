@@ -0,0 +1,44 @@
+"""Speculative prefetch of destination-only data while Gemini generates the plan"""
+import asyncio
+
+from services.maps import async_geocode
+from services.weather import get_weather_forecast_async
+from services.image import get_unsplash_image_async
+
+
+class DestinationPrefetch:
+    """Start geocode, weather and cover image lookups as soon as a request is validated.
+
+    Each lookup is exposed as an awaitable task; later pipeline stages await
+    the one they need, so the network latency overlaps with the LLM call.
+    """
+
+    def __init__(self, destination: str, with_cover_image: bool = True):
+        self.destination = destination
+        self.coords = asyncio.create_task(async_geocode(destination))
+        self.weather = asyncio.create_task(self._fetch_weather())
+        self.cover_image = (
+            asyncio.create_task(get_unsplash_image_async(destination))
+            if with_cover_image
+            else None
+        )
+
+    async def _fetch_weather(self) -> dict:
+        coords = await self.coords
+        if not coords.get("lat"):
+            print("[WARN] Missing destination coordinates; skipping weather")
+            return {"forecasts": []}
+        # Request the maximum supported days (10). The planner maps them by date.
+        return await get_weather_forecast_async(coords["lat"], coords["lng"], 10)
+
+    def _tasks(self) -> list:
+        return [t for t in (self.coords, self.weather, self.cover_image) if t is not None]
+
+    def cancel(self):
+        """Cancel lookups nobody awaited (e.g. the LLM call failed)."""
+        for task in self._tasks():
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                # Retrieve the exception so asyncio does not log it as unhandled.
+                task.exception()
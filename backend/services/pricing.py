@@ -0,0 +1,58 @@
+"""Local cost estimates (VND) from Google price_level and the trip budget"""
+from typing import Any, Optional
+
+
+# Fallback per-activity bands when Places has no price_level.
+BUDGET_COST_BANDS = {
+    "low": (50_000, 100_000),
+    "medium": (100_000, 200_000),
+    "high": (500_000, 1_000_000),
+}
+PRICE_LEVEL_COST_BANDS = {
+    1: (50_000, 150_000),
+    2: (150_000, 400_000),
+    3: (400_000, 800_000),
+    4: (800_000, 2_000_000),
+}
+
+
+def cost_band(price_level: Any, budget: Optional[str]) -> tuple:
+    """(low, high) VND for one activity; price_level wins over the budget default."""
+    try:
+        level = int(price_level or 0)
+    except (TypeError, ValueError):
+        level = 0
+    if level > 0:
+        return PRICE_LEVEL_COST_BANDS[min(level, 4)]
+    return BUDGET_COST_BANDS.get(budget or "medium", BUDGET_COST_BANDS["medium"])
+
+
+def format_vnd_range(low: int, high: int) -> str:
+    return f"{low:,} - {high:,} đ".replace(",", ".")
+
+
+def estimate_cost(price_level: Any, budget: Optional[str]) -> str:
+    return format_vnd_range(*cost_band(price_level, budget))
+
+
+def apply_cost_bands(trip_plan: dict, budget: Optional[str]) -> dict:
+    """Fill `estimated_cost` per activity and the plan's `total_estimated_cost` when missing."""
+    days = trip_plan.get("days") if isinstance(trip_plan, dict) else None
+    if not isinstance(days, list):
+        return trip_plan
+
+    total_low = total_high = 0
+    for day in days:
+        for activity in (day.get("activities") if isinstance(day, dict) else None) or []:
+            if not isinstance(activity, dict):
+                continue
+            details = activity.get("place_details") if isinstance(activity.get("place_details"), dict) else {}
+            low, high = cost_band(details.get("price_level"), budget)
+            if not activity.get("estimated_cost"):
+                activity["estimated_cost"] = format_vnd_range(low, high)
+            total_low += low
+            total_high += high
+
+    if not trip_plan.get("total_estimated_cost") and total_high:
+        trip_plan["total_estimated_cost"] = format_vnd_range(total_low, total_high)
+    return trip_plan
@@ -0,0 +1,138 @@
+"""Like/vote toggles and comment deletes committed in a single Firestore transaction.
+
+Reaction documents use deterministic ids (`{target_id}_{uid}`), so the
+toggle reads the target and the user's reaction in one `get_all` and
+writes the reaction plus the counter `Increment` in one commit. Likes on a
+hot trip go to a counter shard in that same commit (see services.counters).
+"""
+from datetime import datetime
+
+from core.database import db, firestore, run_db
+from services.catalog_index import catalog_ref
+from services.counters import counters
+
+
+class ReactionTargetNotFound(LookupError):
+    pass
+
+
+def _read(transaction, refs: list) -> dict:
+    return {snap.reference.path: snap for snap in transaction.get_all(refs)}
+
+
+def _toggle_trip_like(trip_id: str, user_id: str, counter_ref, sharded: bool) -> dict:
+    trip_ref = db.collection("trips").document(trip_id)
+    like_ref = db.collection("trip_likes").document(f"{trip_id}_{user_id}")
+    summary_ref = catalog_ref(trip_id)
+
+    @firestore.transactional
+    def toggle(transaction):
+        snaps = _read(transaction, [trip_ref, like_ref, summary_ref])
+        trip = snaps.get(trip_ref.path)
+        if trip is None or not trip.exists:
+            raise ReactionTargetNotFound(trip_id)
+
+        liked = not (snaps.get(like_ref.path) and snaps[like_ref.path].exists)
+        delta = 1 if liked else -1
+        if liked:
+            transaction.set(like_ref, {
+                "trip_id": trip_id,
+                "user_id": user_id,
+                "created_at": datetime.now().isoformat(),
+            })
+        else:
+            transaction.delete(like_ref)
+        if sharded:
+            # The roll-up folds the shard into the trip and its summary.
+            transaction.set(counter_ref, {"likes_count": firestore.Increment(delta)}, merge=True)
+        else:
+            transaction.update(trip_ref, {"likes_count": firestore.Increment(delta)})
+            summary = snaps.get(summary_ref.path)
+            if summary is not None and summary.exists:
+                transaction.update(summary_ref, {"likes_count": firestore.Increment(delta)})
+
+        likes_count = max(0, (trip.to_dict() or {}).get("likes_count", 0) + delta)
+        return {"liked": liked, "likes_count": likes_count}
+
+    return toggle(db.transaction())
+
+
+def _cast_blog_vote(blog_id: str, user_id: str, vote_type: str) -> dict:
+    blog_ref = db.collection("blogs").document(blog_id)
+    vote_ref = db.collection("blog_votes").document(f"{blog_id}_{user_id}")
+
+    @firestore.transactional
+    def cast(transaction):
+        snaps = _read(transaction, [blog_ref, vote_ref])
+        blog = snaps.get(blog_ref.path)
+        if blog is None or not blog.exists:
+            raise ReactionTargetNotFound(blog_id)
+
+        vote = snaps.get(vote_ref.path)
+        old_type = (vote.to_dict() or {}).get("vote_type") if vote is not None and vote.exists else None
+        if old_type == vote_type:
+            return {"message": "Already voted"}
+
+        if old_type:
+            old_field = "upvotes" if old_type == "up" else "downvotes"
+            transaction.update(blog_ref, {old_field: firestore.Increment(-1)})
+        transaction.set(vote_ref, {
+            "blog_id": blog_id,
+            "user_id": user_id,
+            "vote_type": vote_type,
+            "created_at": datetime.now().isoformat(),
+        })
+        new_field = "upvotes" if vote_type == "up" else "downvotes"
+        transaction.update(blog_ref, {new_field: firestore.Increment(1)})
+        return {"message": "Vote added", "vote_type": vote_type}
+
+    return cast(db.transaction())
+
+
+def _remove_blog_comment(blog_id: str, comment_id: str, user_id: str, counter_ref, sharded: bool):
+    blog_ref = db.collection("blogs").document(blog_id)
+    comment_ref = db.collection("blog_comments").document(comment_id)
+
+    @firestore.transactional
+    def delete(transaction):
+        snaps = _read(transaction, [comment_ref, blog_ref])
+        comment = snaps.get(comment_ref.path)
+        if comment is None or not comment.exists:
+            raise ReactionTargetNotFound(comment_id)
+        if (comment.to_dict() or {}).get("user_id") != user_id:
+            raise PermissionError(comment_id)
+
+        transaction.delete(comment_ref)
+        blog = snaps.get(blog_ref.path)
+        if blog is None or not blog.exists:
+            return
+        # Only a comment that existed in this transaction takes one off the count.
+        if sharded:
+            transaction.set(counter_ref, {"comments_count": firestore.Increment(-1)}, merge=True)
+        elif (blog.to_dict() or {}).get("comments_count", 0) > 0:
+            transaction.update(blog_ref, {"comments_count": firestore.Increment(-1)})
+
+    delete(db.transaction())
+
+
+async def toggle_trip_like(trip_id: str, user_id: str) -> dict:
+    """Like or unlike a trip; raises ReactionTargetNotFound for unknown trips."""
+    trip_ref = db.collection("trips").document(trip_id)
+    counter_ref, sharded = counters.write_target(trip_ref, "likes_count", mirrors=(catalog_ref(trip_id),))
+    return await run_db(_toggle_trip_like, trip_id, user_id, counter_ref, sharded)
+
+
+async def cast_blog_vote(blog_id: str, user_id: str, vote_type: str) -> dict:
+    """Record an up/down vote, replacing the user's previous one."""
+    return await run_db(_cast_blog_vote, blog_id, user_id, vote_type)
+
+
+async def remove_blog_comment(blog_id: str, comment_id: str, user_id: str) -> None:
+    """Delete the user's comment and decrement the blog's count in one commit.
+
+    Raises ReactionTargetNotFound if the comment is gone and PermissionError
+    if it belongs to someone else.
+    """
+    blog_ref = db.collection("blogs").document(blog_id)
+    counter_ref, sharded = counters.write_target(blog_ref, "comments_count")
+    await run_db(_remove_blog_comment, blog_id, comment_id, user_id, counter_ref, sharded)
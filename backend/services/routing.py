@@ -0,0 +1,138 @@
+"""Deterministic per-day route ordering for enriched trip plans."""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Optional
+
+import numpy as np
+
+from services.geo import activity_coords, haversine_matrix
+
+
+MEAL_TYPES = {"restaurant", "cafe", "bakery", "meal_takeaway", "meal_delivery", "food", "bar"}
+MEAL_KEYWORDS = re.compile(
+    r"\b(ăn sáng|ăn trưa|ăn tối|bữa sáng|bữa trưa|bữa tối|an sang|an trua|an toi|breakfast|lunch|dinner)\b",
+    re.IGNORECASE,
+)
+CHECKIN_KEYWORDS = re.compile(r"(nhận phòng|trả phòng|check[- ]?in|check[- ]?out)", re.IGNORECASE)
+
+
+def is_anchor_activity(activity: dict) -> bool:
+    """Hotels (check-in/out) and meals keep their slot in the day."""
+    details = activity.get("place_details") if isinstance(activity.get("place_details"), dict) else {}
+    if details.get("is_hotel"):
+        return True
+    types = set(details.get("types") or [])
+    if types & MEAL_TYPES:
+        return True
+    text = f"{activity.get('place', '')} {activity.get('description', '')}"
+    return bool(MEAL_KEYWORDS.search(text) or CHECKIN_KEYWORDS.search(text))
+
+
+def _path_length(order: list[int], dist: np.ndarray) -> float:
+    if len(order) < 2:
+        return 0.0
+    idx = np.asarray(order)
+    return float(dist[idx[:-1], idx[1:]].sum())
+
+
+def _nearest_neighbor(slots: list[Optional[int]], free: list[int], dist: np.ndarray) -> list[int]:
+    """Fill free slots (None) walking the day, always taking the closest remaining stop."""
+    remaining = list(free)
+    order: list[int] = []
+    current: Optional[int] = None
+    for slot in slots:
+        if slot is not None:
+            order.append(slot)
+            current = slot
+            continue
+        if current is None:
+            # No anchor before the first free slot: start from the Gemini-first free stop.
+            pick = remaining[0]
+        else:
+            pick = min(remaining, key=lambda j: (dist[current, j], j))
+        remaining.remove(pick)
+        order.append(pick)
+        current = pick
+    return order
+
+
+def _improve(order: list[int], free_pos: list[int], dist: np.ndarray, max_rounds: int = 50) -> list[int]:
+    """2-opt reversals inside runs of free slots, plus swaps between free slots across anchors."""
+    best = list(order)
+    best_len = _path_length(best, dist)
+
+    runs: list[list[int]] = []
+    for pos in free_pos:
+        if runs and runs[-1][-1] == pos - 1:
+            runs[-1].append(pos)
+        else:
+            runs.append([pos])
+
+    for _ in range(max_rounds):
+        improved = False
+        for run in runs:
+            for a in range(len(run) - 1):
+                for b in range(a + 1, len(run)):
+                    i, j = run[a], run[b]
+                    cand = best[:i] + best[i:j + 1][::-1] + best[j + 1:]
+                    cand_len = _path_length(cand, dist)
+                    if cand_len + 1e-9 < best_len:
+                        best, best_len, improved = cand, cand_len, True
+        for a in range(len(free_pos)):
+            for b in range(a + 1, len(free_pos)):
+                i, j = free_pos[a], free_pos[b]
+                cand = list(best)
+                cand[i], cand[j] = cand[j], cand[i]
+                cand_len = _path_length(cand, dist)
+                if cand_len + 1e-9 < best_len:
+                    best, best_len, improved = cand, cand_len, True
+        if not improved:
+            break
+    return best
+
+
+def optimize_day_order(activities: list[Any]) -> list[Any]:
+    """Reorder one day's activities to shorten the route, keeping anchors in place.
+
+    Activities without coordinates are treated as anchors too, since we cannot
+    reason about where they are.
+    """
+    if not isinstance(activities, list) or len(activities) < 3:
+        return activities
+    if not all(isinstance(a, dict) for a in activities):
+        return activities
+
+    coords, valid = activity_coords(activities)
+    anchors = [(not valid[i]) or is_anchor_activity(a) for i, a in enumerate(activities)]
+    free = [i for i, fixed in enumerate(anchors) if not fixed]
+    if len(free) < 2:
+        return activities
+
+    # Unknown coordinates contribute zero distance; they are pinned anyway.
+    dist = haversine_matrix(coords)
+    dist[~valid, :] = 0.0
+    dist[:, ~valid] = 0.0
+
+    slots = [i if anchors[i] else None for i in range(len(activities))]
+    seed = _nearest_neighbor(slots, free, dist)
+    free_pos = [pos for pos, slot in enumerate(slots) if slot is None]
+    order = _improve(seed, free_pos, dist)
+
+    original = list(range(len(activities)))
+    if _path_length(order, dist) + 1e-6 >= _path_length(original, dist):
+        return activities
+    return [activities[i] for i in order]
+
+
+def optimize_trip_routes(trip_plan: dict[str, Any]) -> dict[str, Any]:
+    """Apply optimize_day_order to every day of an enriched plan."""
+    days = trip_plan.get("days") if isinstance(trip_plan, dict) else None
+    if not isinstance(days, list):
+        return trip_plan
+
+    for day in days:
+        if isinstance(day, dict) and isinstance(day.get("activities"), list):
+            day["activities"] = optimize_day_order(day["activities"])
+    return trip_plan
@@ -2,9 +2,14 @@
 
 from __future__ import annotations
 
+import re
 from dataclasses import dataclass
 from typing import Any, Optional
 
+import numpy as np
+
+from services.geo import activity_coords, haversine_pairs
+
 
 @dataclass(frozen=True)
 class ParsedTimeRange:
@@ -16,47 +21,55 @@ class ParsedTimeRange:
         return max(0, self.end_min - self.start_min)
 
 
-def _parse_hhmm(text: str) -> Optional[int]:
-    text = (text or "").strip()
-    if not text:
-        return None
-    # Accept HH:MM
-    if ":" not in text:
-        return None
-    hh, mm = text.split(":", 1)
-    try:
-        h = int(hh)
-        m = int(mm)
-    except ValueError:
-        return None
-    if h < 0 or h > 23 or m < 0 or m > 59:
-        return None
-    return h * 60 + m
-
+# '08:00 - 10:00', '08:00-10:00', en/em dashes; anything after a further dash is ignored.
+_TIME_RANGE_RE = re.compile(r"\s*(\d{1,2}):(\d{1,2})\s*[-–—]\s*(\d{1,2}):(\d{1,2})\s*(?:[-–—].*)?", re.DOTALL)
 
-def parse_time_range(time_text: str) -> Optional[ParsedTimeRange]:
-    """Parse strings like '08:00 - 10:00' into minute ranges."""
-    s = (time_text or "").strip()
-    if not s:
-        return None
+MIN_ACTIVITY_MIN = 30
 
-    # Normalize separators
-    s = s.replace("–", "-").replace("—", "-")
 
-    # Support '08:00-10:00' or '08:00 - 10:00'
-    parts = [p.strip() for p in s.split("-") if p.strip()]
-    if len(parts) < 2:
-        return None
+def parse_time_arrays(activities: list[Any]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Parse every activity's `time` into (start_min[n], end_min[n], valid[n]) arrays.
 
-    start = _parse_hhmm(parts[0])
-    end = _parse_hhmm(parts[1])
-    if start is None or end is None:
-        return None
+    Reversed ranges are swapped, like the AI sometimes outputs them.
+    """
+    n = len(activities)
+    rows: list[tuple[int, int, int, int]] = []
+    idx: list[int] = []
+    match = _TIME_RANGE_RE.fullmatch
+    for i, activity in enumerate(activities):
+        if not isinstance(activity, dict):
+            continue
+        m = match(str(activity.get("time", "")))
+        if m is not None:
+            rows.append(tuple(int(g) for g in m.groups()))
+            idx.append(i)
+
+    start = np.zeros(n, dtype=np.int32)
+    end = np.zeros(n, dtype=np.int32)
+    valid = np.zeros(n, dtype=bool)
+    if not rows:
+        return start, end, valid
+
+    raw = np.asarray(rows, dtype=np.int32)
+    hours, minutes = raw[:, [0, 2]], raw[:, [1, 3]]
+    ok = np.all((hours <= 23) & (minutes <= 59), axis=1)
+    total = hours * 60 + minutes
+    pos = np.asarray(idx)[ok]
+    start[pos] = total[ok].min(axis=1)
+    end[pos] = total[ok].max(axis=1)
+    valid[pos] = True
+    return start, end, valid
 
-    # If AI outputs reversed times, fix ordering
-    if end < start:
-        start, end = end, start
 
+def parse_time_range(time_text: str) -> Optional[ParsedTimeRange]:
+    """Parse strings like '08:00 - 10:00' into minute ranges."""
+    m = _TIME_RANGE_RE.fullmatch(time_text or "")
+    if m is None:
+        return None
+    h1, m1, h2, m2 = (int(g) for g in m.groups())
+    if h1 > 23 or h2 > 23 or m1 > 59 or m2 > 59:
+        return None
+    start, end = sorted((h1 * 60 + m1, h2 * 60 + m2))
     return ParsedTimeRange(start_min=start, end_min=end)
 
 
@@ -68,32 +81,123 @@ def format_time_range(start_min: int, end_min: int) -> str:
     return f"{sh:02d}:{sm:02d} - {eh:02d}:{em:02d}"
 
 
-def buffer_minutes_for_mode(travel_mode: Optional[str]) -> int:
+# Duration classes of the compact LLM output contract; unknown classes get DEFAULT_ACTIVITY_MIN.
+DURATION_CLASS_MINUTES = {"short": 60, "medium": 120, "long": 180}
+DEFAULT_ACTIVITY_MIN = 90
+
+
+def assign_local_times(trip_plan: dict[str, Any], *, active_time_start: Optional[int]) -> dict[str, Any]:
+    """Give activities without a usable `time` a provisional range from their `duration` class.
+
+    Activities are laid back to back from the day start; apply_time_buffers
+    inserts the travel buffers afterwards. The `duration` field is consumed.
+    """
+    start_floor, _ = active_window(active_time_start, None)
+    days = trip_plan.get("days") if isinstance(trip_plan, dict) else None
+    if not isinstance(days, list):
+        return trip_plan
+
+    for day in days:
+        activities = day.get("activities") if isinstance(day, dict) else None
+        if not isinstance(activities, list):
+            continue
+        cursor = start_floor if start_floor is not None else 8 * 60
+        for activity in activities:
+            if not isinstance(activity, dict):
+                continue
+            duration_class = str(activity.pop("duration", "") or "").strip().lower()
+            parsed = parse_time_range(str(activity.get("time", "")))
+            if parsed is not None:
+                cursor = parsed.end_min
+                continue
+            minutes = DURATION_CLASS_MINUTES.get(duration_class, DEFAULT_ACTIVITY_MIN)
+            activity["time"] = format_time_range(cursor, cursor + minutes)
+            cursor += minutes
+    return trip_plan
+
+
+# Door-to-door speed (km/h) and fixed overhead (parking, waiting) per travel mode.
+SPEED_PROFILES = {
+    "walking": {"speed_kmh": 4.5, "overhead_min": 0, "fallback_min": 15},
+    "bicycle": {"speed_kmh": 12.0, "overhead_min": 3, "fallback_min": 20},
+    "motorbike": {"speed_kmh": 25.0, "overhead_min": 5, "fallback_min": 25},
+    "car": {"speed_kmh": 22.0, "overhead_min": 8, "fallback_min": 30},
+    "public": {"speed_kmh": 15.0, "overhead_min": 10, "fallback_min": 30},
+}
+DEFAULT_PROFILE = {"speed_kmh": 20.0, "overhead_min": 5, "fallback_min": 20}
+
+# Road distance is longer than the great-circle distance.
+DETOUR_FACTOR = 1.3
+MIN_BUFFER_MIN = 10
+MAX_BUFFER_MIN = 120
+
+
+def travel_profile(travel_mode: Optional[str]) -> dict:
     mode = (travel_mode or "").strip().lower()
     if not mode:
-        return 20
+        return DEFAULT_PROFILE
 
     if "đi bộ" in mode or "di bo" in mode:
-        return 15
+        return SPEED_PROFILES["walking"]
     if "xe đạp" in mode or "xe dap" in mode:
-        return 20
+        return SPEED_PROFILES["bicycle"]
     if "xe máy" in mode or "xe may" in mode:
-        return 25
+        return SPEED_PROFILES["motorbike"]
     if "ô tô" in mode or "oto" in mode or "o to" in mode:
-        return 30
+        return SPEED_PROFILES["car"]
     if "công cộng" in mode or "cong cong" in mode:
-        return 30
+        return SPEED_PROFILES["public"]
 
-    return 20
+    return DEFAULT_PROFILE
 
 
-def apply_time_buffers(trip_plan: dict[str, Any], *,
-                       active_time_start: Optional[int],
-                       active_time_end: Optional[int],
-                       travel_mode: Optional[str]) -> dict[str, Any]:
+def buffer_minutes_for_mode(travel_mode: Optional[str]) -> int:
+    return travel_profile(travel_mode)["fallback_min"]
+
+
+def travel_buffers_for_plan(days: list[Any], travel_mode: Optional[str]) -> list[list[int]]:
+    """Buffer (minutes) before each activity, from the distance to the previous one.
 
-    buffer_min = buffer_minutes_for_mode(travel_mode)
+    All consecutive pairs of the plan are evaluated in one vectorized pass.
+    Gaps where either side lacks coordinates fall back to the per-mode default.
+    """
+    profile = travel_profile(travel_mode)
+    fallback = profile["fallback_min"]
 
+    buffers: list[list[int]] = []
+    pair_slots: list[tuple[int, int]] = []
+    prev_coords: list[tuple[float, float]] = []
+    next_coords: list[tuple[float, float]] = []
+
+    for d, day in enumerate(days):
+        activities = day.get("activities") if isinstance(day, dict) else None
+        if not isinstance(activities, list):
+            buffers.append([])
+            continue
+        coords, valid = activity_coords(activities)
+        buffers.append([fallback] * len(activities))
+        for i in range(1, len(activities)):
+            if valid[i - 1] and valid[i]:
+                pair_slots.append((d, i))
+                prev_coords.append(tuple(coords[i - 1]))
+                next_coords.append(tuple(coords[i]))
+
+    if not pair_slots:
+        return buffers
+
+    km = haversine_pairs(np.asarray(prev_coords), np.asarray(next_coords)) * DETOUR_FACTOR
+    minutes = profile["overhead_min"] + km / profile["speed_kmh"] * 60.0
+    # Round up to the next 5 minutes so schedules stay readable.
+    minutes = np.clip(np.ceil(minutes / 5.0) * 5.0, MIN_BUFFER_MIN, MAX_BUFFER_MIN).astype(int)
+
+    for (d, i), value in zip(pair_slots, minutes.tolist()):
+        buffers[d][i] = value
+    return buffers
+
+
+def active_window(active_time_start: Optional[int],
+                  active_time_end: Optional[int]) -> tuple[Optional[int], Optional[int]]:
+    """Convert active hours into (start_floor, end_cap) minutes, ignoring invalid values."""
     start_floor = None
     if isinstance(active_time_start, int) and 0 <= active_time_start <= 23:
         start_floor = active_time_start * 60
@@ -102,58 +206,151 @@ def apply_time_buffers(trip_plan: dict[str, Any], *,
     if isinstance(active_time_end, int) and 0 <= active_time_end <= 23:
         end_cap = active_time_end * 60
 
-    days = trip_plan.get("days")
-    if not isinstance(days, list):
-        return trip_plan
-
-    for day in days:
-        activities = day.get("activities") if isinstance(day, dict) else None
-        if not isinstance(activities, list) or len(activities) == 0:
-            continue
-
-        current_end = None
-
-        force_sequential = start_floor is not None
-
-        for idx, activity in enumerate(activities):
-            if not isinstance(activity, dict):
-                continue
-
-            parsed = parse_time_range(str(activity.get("time", "")))
-            if parsed is None:
-                continue
-
-            duration = max(30, parsed.duration_min)  # never shorter than 30min
-
-            if idx == 0:
-                start = parsed.start_min
-                if start_floor is not None:
-                    # Force the day to begin at the configured start hour.
-                    # This avoids AI plans always starting at 09:00.
-                    start = start_floor
-                end = start + duration
-                activity["time"] = format_time_range(start, end)
-                current_end = end
-                continue
+    return start_floor, end_cap
+
+
+# Separates days in segmented scans; far larger than any minute value in a plan.
+_SEGMENT_STRIDE = 1 << 40
+
+
+def schedule_minutes(start: np.ndarray, end: np.ndarray, buffers: np.ndarray, head: np.ndarray, *,
+                     start_floor: Optional[int],
+                     end_cap: Optional[int]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sequence parsed activities, many days at once; returns (start, end, overflow).
+
+    `head` marks the first activity of each day. It opens the day (at
+    `start_floor` when set); every later one starts at least `buffers[i]` after
+    the previous end. Without a floor, AI start times are kept when they are
+    later. Ends past `end_cap` are clamped and flagged in `overflow`.
+    The running max is a segmented cumulative scan, so there is no loop per
+    activity or per day.
+    """
+    n = len(start)
+    start = start.astype(np.int64)
+    buffers = buffers.astype(np.int64)
+    duration = np.maximum(end - start, MIN_ACTIVITY_MIN)
+    segment = np.cumsum(head) - 1
+    head_pos = np.flatnonzero(head)
+
+    first_start = np.full(len(head_pos), start_floor, dtype=np.int64) if start_floor is not None else start[head_pos]
+    first_end = first_start + duration[head_pos]
+
+    step = buffers + duration
+    step[head] = 0
+    running = np.cumsum(step)
+    offset = running - running[head_pos][segment]
+
+    if start_floor is not None:
+        # Sequential from the day start, ignoring AI-provided absolute times.
+        earliest = first_end[segment]
+    else:
+        earliest = start + duration - offset
+        earliest[head] = first_end
+        lift = segment * _SEGMENT_STRIDE
+        earliest = np.maximum.accumulate(earliest + lift) - lift
+    new_end = offset + earliest
+
+    overflow = np.zeros(n, dtype=bool)
+    if end_cap is not None:
+        # We do not try to squeeze earlier activities; only cap extreme overflow.
+        overflow = ~head & (new_end > end_cap)
+        new_end = np.where(head, new_end, np.minimum(new_end, end_cap))
+
+    new_start = np.empty_like(new_end)
+    new_start[1:] = new_end[:-1] + buffers[1:]
+    if start_floor is None:
+        new_start = np.maximum(new_start, start)
+    new_start = np.minimum(new_start, new_end)
+    new_start[head_pos] = first_start
+    return new_start, new_end, overflow
+
+
+def _schedule_activity_lists(day_lists: list[list[Any]], day_buffers: list[list[int]], *,
+                             start_floor: Optional[int],
+                             end_cap: Optional[int]) -> int:
+    """Parse, schedule and rewrite `time` for all given days; returns the overflow count."""
+    flat = [a for activities in day_lists for a in activities]
+    if not flat:
+        return 0
+
+    start, end, valid = parse_time_arrays(flat)
+    positions = np.flatnonzero(valid)
+    if len(positions) == 0:
+        return 0
+
+    day_of = np.repeat(np.arange(len(day_lists)), [len(activities) for activities in day_lists])[positions]
+    head = np.ones(len(positions), dtype=bool)
+    head[1:] = day_of[1:] != day_of[:-1]
+    buffers = np.fromiter((b for day in day_buffers for b in day), dtype=np.int64, count=len(flat))[positions]
+
+    new_start, new_end, overflow = schedule_minutes(
+        start[positions], end[positions], buffers, head,
+        start_floor=start_floor, end_cap=end_cap,
+    )
+    for pos, s, e in zip(positions.tolist(), new_start.tolist(), new_end.tolist()):
+        flat[pos]["time"] = format_time_range(s, e)
+    return int(overflow.sum())
+
+
+def schedule_activity_days(day_lists: list[list[Any]], *,
+                           travel_mode: Optional[str],
+                           start_floor: Optional[int],
+                           end_cap: Optional[int]) -> int:
+    """Rewrite `time` strings for the given days in one pass; returns the overflow count.
+
+    Activities whose time cannot be parsed are left untouched and skipped.
+    """
+    day_lists = [activities for activities in day_lists if isinstance(activities, list) and activities]
+    if not day_lists:
+        return 0
+    day_buffers = travel_buffers_for_plan([{"activities": a} for a in day_lists], travel_mode)
+    return _schedule_activity_lists(day_lists, day_buffers, start_floor=start_floor, end_cap=end_cap)
+
+
+def apply_time_buffers_batch(trip_plans: list[dict[str, Any]], *,
+                             active_time_start: Optional[int],
+                             active_time_end: Optional[int],
+                             travel_modes: list[Optional[str]]) -> int:
+    """Re-schedule many plans in one array pass (bulk re-normalization).
+
+    `travel_modes[i]` belongs to `trip_plans[i]`. Plans are modified in place;
+    returns how many activities had to be clamped at the end of the day.
+    """
+    start_floor, end_cap = active_window(active_time_start, active_time_end)
+
+    by_mode: dict[str, list[Any]] = {}
+    for trip_plan, travel_mode in zip(trip_plans, travel_modes):
+        days = trip_plan.get("days") if isinstance(trip_plan, dict) else None
+        if isinstance(days, list):
+            by_mode.setdefault(travel_mode or "", []).extend(days)
+
+    day_lists: list[list[Any]] = []
+    day_buffers: list[list[int]] = []
+    for travel_mode, days in by_mode.items():
+        buffers = travel_buffers_for_plan(days, travel_mode)
+        for day, day_buf in zip(days, buffers):
+            activities = day.get("activities") if isinstance(day, dict) else None
+            if isinstance(activities, list) and activities:
+                day_lists.append(activities)
+                day_buffers.append(day_buf)
+
+    return _schedule_activity_lists(day_lists, day_buffers, start_floor=start_floor, end_cap=end_cap)
 
-            if current_end is None:
-                current_end = parsed.end_min
 
-            # Enforce buffer between previous end and next start
-            desired_start = current_end + buffer_min
-            # If active_time_start is set, schedule sequentially from the day start,
-            # ignoring the AI-provided absolute times to optimize earlier starts.
-            start = desired_start if force_sequential else max(parsed.start_min, desired_start)
-            end = start + duration
-
-            if end_cap is not None:
-                # We do not try to squeeze earlier activities; only cap extreme overflow.
-                end = min(end, end_cap)
-                start = min(start, end)
+def apply_time_buffers(trip_plan: dict[str, Any], *,
+                       active_time_start: Optional[int],
+                       active_time_end: Optional[int],
+                       travel_mode: Optional[str]) -> dict[str, Any]:
 
-            activity["time"] = format_time_range(start, end)
-            current_end = end
+    if not isinstance(trip_plan.get("days"), list):
+        return trip_plan
 
+    apply_time_buffers_batch(
+        [trip_plan],
+        active_time_start=active_time_start,
+        active_time_end=active_time_end,
+        travel_modes=[travel_mode],
+    )
     return trip_plan
 
 
@@ -0,0 +1,136 @@
+"""Diacritic-insensitive inverted index for catalog search.
+
+Text is folded with `fold_vietnamese`, so "Da Nang", "đà nẵng" and
+"Đà Nẵng" all produce the tokens `da` and `nang`. Every query token must
+match a document token exactly or as a prefix; matches are scored by the
+field they came from.
+"""
+import re
+from typing import Optional
+
+from services.text import fold_vietnamese
+
+
+FIELD_WEIGHTS = {"destination": 3.0, "trip_name": 2.0, "place_names": 1.5, "overview": 1.0}
+# Score multiplier when the query token is only a prefix of the indexed token.
+PREFIX_WEIGHT = 0.6
+MIN_PREFIX_LEN = 2
+MAX_PREFIX_LEN = 12
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text) -> list:
+    return _TOKEN_RE.findall(fold_vietnamese(str(text or "")))
+
+
+def entry_tokens(entry: dict) -> dict:
+    """token -> best field weight for one catalog entry."""
+    tokens = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        value = entry.get(field)
+        texts = value if isinstance(value, list) else [value]
+        for text in texts:
+            for token in tokenize(text):
+                if weight > tokens.get(token, 0.0):
+                    tokens[token] = weight
+    return tokens
+
+
+def _token_score(query_token: str, token: str, weight: float) -> float:
+    if token == query_token:
+        return weight
+    if len(query_token) >= MIN_PREFIX_LEN and token.startswith(query_token):
+        return weight * PREFIX_WEIGHT
+    return 0.0
+
+
+def score_entry(entry: dict, query: str) -> float:
+    """Relevance of one entry without an index (0 when some query token does not match)."""
+    query_tokens = tokenize(query)
+    if not query_tokens:
+        return 0.0
+    tokens = entry_tokens(entry)
+    total = 0.0
+    for query_token in dict.fromkeys(query_tokens):
+        best = max((_token_score(query_token, t, w) for t, w in tokens.items()), default=0.0)
+        if best <= 0:
+            return 0.0
+        total += best
+    return total
+
+
+class SearchIndex:
+    """token -> {trip_id: weight} postings plus a prefix table for partial words.
+
+    Not thread-safe on its own; the catalog cache calls it under its lock.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._prefixes = {}
+        self._doc_tokens = {}
+
+    def __len__(self):
+        return len(self._doc_tokens)
+
+    def add(self, trip_id: str, entry: dict):
+        self.remove(trip_id)
+        tokens = entry_tokens(entry)
+        self._doc_tokens[trip_id] = tokens
+        for token, weight in tokens.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                for n in range(MIN_PREFIX_LEN, min(len(token), MAX_PREFIX_LEN) + 1):
+                    self._prefixes.setdefault(token[:n], set()).add(token)
+            postings[trip_id] = weight
+
+    def remove(self, trip_id: str):
+        tokens = self._doc_tokens.pop(trip_id, None)
+        if not tokens:
+            return
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(trip_id, None)
+            if postings:
+                continue
+            del self._postings[token]
+            for n in range(MIN_PREFIX_LEN, min(len(token), MAX_PREFIX_LEN) + 1):
+                bucket = self._prefixes.get(token[:n])
+                if bucket is not None:
+                    bucket.discard(token)
+                    if not bucket:
+                        del self._prefixes[token[:n]]
+
+    def _candidates(self, query_token: str) -> set:
+        if len(query_token) < MIN_PREFIX_LEN:
+            return {query_token} if query_token in self._postings else set()
+        if len(query_token) <= MAX_PREFIX_LEN:
+            return set(self._prefixes.get(query_token, ()))
+        # Longer than the prefix table: narrow by its longest prefix.
+        return {t for t in self._prefixes.get(query_token[:MAX_PREFIX_LEN], ()) if t.startswith(query_token)}
+
+    def search(self, query: str) -> Optional[dict]:
+        """trip_id -> score for entries matching every query token; None for an empty query."""
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return None
+
+        scores = None
+        for query_token in dict.fromkeys(query_tokens):
+            token_scores = {}
+            for token in self._candidates(query_token):
+                for trip_id, weight in self._postings[token].items():
+                    score = _token_score(query_token, token, weight)
+                    if score > token_scores.get(trip_id, 0.0):
+                        token_scores[trip_id] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {tid: s + token_scores[tid] for tid, s in scores.items() if tid in token_scores}
+            if not scores:
+                return {}
+        return scores
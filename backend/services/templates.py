@@ -0,0 +1,107 @@
+"""Public catalog trips reused as templates for instant plans (no Gemini call)"""
+import copy
+from typing import Optional
+
+from core.database import db, get_doc, stream_docs
+from models.trip import TripRequest
+from services.catalog_cache import catalog_cache
+from services.catalog_index import CATALOG_INDEX_COLLECTION
+from services.text import fold_vietnamese
+
+
+# Score weights over the request's soft attributes; destination and duration must match.
+SCORE_WEIGHTS = {"budget": 0.35, "activity_level": 0.2, "categories": 0.3, "travel_group": 0.15}
+MIN_TEMPLATE_SCORE = 0.5
+MAX_TEMPLATE_CANDIDATES = 50
+CANDIDATE_FIELDS = [
+    "destination", "budget", "activity_level", "travel_group", "category_tags",
+    "likes_count", "views_count", "rating",
+]
+
+
+def _destination_matches(a: str, b: str) -> bool:
+    fa, fb = fold_vietnamese(a), fold_vietnamese(b)
+    return bool(fa and fb) and (fa == fb or fa in fb or fb in fa)
+
+
+def template_score(trip_data: dict, trip_request: TripRequest) -> float:
+    """Similarity in [0, 1] between a public trip and a plan request."""
+    score = 0.0
+    if trip_data.get("budget") == trip_request.budget:
+        score += SCORE_WEIGHTS["budget"]
+    if trip_data.get("activity_level", "medium") == (trip_request.activity_level or "medium"):
+        score += SCORE_WEIGHTS["activity_level"]
+    if trip_data.get("travel_group", "solo") == (trip_request.travel_group or "solo"):
+        score += SCORE_WEIGHTS["travel_group"]
+
+    wanted = {fold_vietnamese(str(c)) for c in trip_request.categories or []}
+    have = {fold_vietnamese(str(c)) for c in trip_data.get("category_tags") or []}
+    if not wanted:
+        score += SCORE_WEIGHTS["categories"]
+    elif have:
+        score += SCORE_WEIGHTS["categories"] * len(wanted & have) / len(wanted | have)
+    return score
+
+
+async def _template_candidates(trip_request: TripRequest) -> list:
+    """Public trip summaries with the requested duration and destination."""
+    if catalog_cache.ready:
+        entries = catalog_cache.search_entries(trip_request.destination)
+        return [
+            entry for entry in entries
+            if entry.get("duration") == trip_request.duration
+            and _destination_matches(entry.get("destination", ""), trip_request.destination)
+        ]
+
+    query = (
+        db.collection(CATALOG_INDEX_COLLECTION)
+        .where("destination_folded", "==", fold_vietnamese(trip_request.destination))
+        .where("duration", "==", trip_request.duration)
+        .select(CANDIDATE_FIELDS)
+        .limit(MAX_TEMPLATE_CANDIDATES)
+    )
+    return [{**(doc.to_dict() or {}), "trip_id": doc.id} for doc in await stream_docs(query)]
+
+
+async def find_template_trip(trip_request: TripRequest) -> Optional[dict]:
+    """Best public trip for the same destination and duration, or None if nothing is close.
+
+    Candidates come from the live catalog cache when it is loaded, otherwise
+    from an equality query on `catalog_index`; only the winner's full trip
+    document is read.
+    """
+    best_id, best_key = None, None
+    for data in await _template_candidates(trip_request):
+        score = template_score(data, trip_request)
+        if score < MIN_TEMPLATE_SCORE:
+            continue
+        key = (score, data.get("rating") or 0, data.get("likes_count", 0), data.get("views_count", 0))
+        if best_key is None or key > best_key:
+            best_id, best_key = data.get("trip_id"), key
+
+    if best_id is None:
+        return None
+
+    template_doc = await get_doc(db.collection("trips").document(best_id))
+    if not template_doc.exists:
+        return None
+    template = template_doc.to_dict()
+    days = (template.get("trip_plan") or {}).get("days")
+    if not isinstance(days, list) or len(days) != trip_request.duration:
+        return None
+    template["id"] = best_id
+    print(f"[OK] Template trip {best_id} matched (score {best_key[0]:.2f})")
+    return template
+
+
+def fork_template_plan(template: dict) -> dict:
+    """Copy a template's plan, dropping fields tied to the original trip or its dates."""
+    trip_plan = copy.deepcopy(template.get("trip_plan") or {})
+    for key in ("trip_id", "cover_image", "weather_forecast"):
+        trip_plan.pop(key, None)
+    for day in trip_plan.get("days") or []:
+        for activity in (day.get("activities") if isinstance(day, dict) else None) or []:
+            if isinstance(activity, dict):
+                activity.pop("opening_hours_warning", None)
+    trip_plan["template_trip_id"] = template.get("id")
+    return trip_plan
@@ -0,0 +1,11 @@
+"""Text normalization helpers for Vietnamese/English matching"""
+import re
+import unicodedata
+
+
+def fold_vietnamese(text: str) -> str:
+    """Lowercase and strip diacritics so 'Đà Nẵng' matches 'da nang'."""
+    text = (text or "").replace("đ", "d").replace("Đ", "D")
+    decomposed = unicodedata.normalize("NFD", text)
+    stripped = "".join(ch for ch in decomposed if unicodedata.category(ch) != "Mn")
+    return re.sub(r"\s+", " ", stripped.lower()).strip()
@@ -0,0 +1,89 @@
+"""Batched loading of public user profile fields (author name and photo).
+
+A `UserProfileLoader` lives for one request: it memoizes what it has loaded
+and fetches every uncached uid in a single `get_all`. Results are also kept
+in a short-TTL process cache shared by all requests.
+"""
+import time
+from typing import Iterable, Optional
+
+from core.config import USER_PROFILE_CACHE_SIZE, USER_PROFILE_CACHE_TTL
+from core.database import db, get_all
+
+
+PUBLIC_PROFILE_FIELDS = ["username", "photo_url"]
+
+
+class ProfileCache:
+    """uid -> public profile fields, expiring after `ttl` seconds."""
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max(1, max_size)
+        self._items = {}
+
+    def get(self, uid: str) -> Optional[dict]:
+        item = self._items.get(uid)
+        if item is None:
+            return None
+        expires_at, profile = item
+        if expires_at < time.monotonic():
+            self._items.pop(uid, None)
+            return None
+        return profile
+
+    def put(self, uid: str, profile: dict):
+        if len(self._items) >= self.max_size and uid not in self._items:
+            # Dicts keep insertion order: drop the oldest entry.
+            self._items.pop(next(iter(self._items)), None)
+        self._items[uid] = (time.monotonic() + self.ttl, profile)
+
+    def invalidate(self, uid: str):
+        self._items.pop(uid, None)
+
+
+profile_cache = ProfileCache(USER_PROFILE_CACHE_TTL, USER_PROFILE_CACHE_SIZE)
+
+
+class UserProfileLoader:
+    """Request-scoped loader; missing users resolve to an empty dict."""
+
+    def __init__(self, cache: ProfileCache = profile_cache):
+        self.cache = cache
+        self._memo = {}
+
+    async def load_many(self, uids: Iterable[str]) -> dict:
+        """uid -> public profile fields; uncached uids are fetched in one `get_all`."""
+        wanted = [uid for uid in dict.fromkeys(uids) if uid]
+        missing = []
+        for uid in wanted:
+            if uid in self._memo:
+                continue
+            cached = self.cache.get(uid)
+            if cached is not None:
+                self._memo[uid] = cached
+            else:
+                missing.append(uid)
+
+        if missing:
+            refs = [db.collection("users").document(uid) for uid in missing]
+            found = {}
+            for doc in await get_all(refs, field_paths=PUBLIC_PROFILE_FIELDS):
+                if doc.exists:
+                    found[doc.id] = doc.to_dict() or {}
+            for uid in missing:
+                profile = {k: v for k, v in found.get(uid, {}).items() if k in PUBLIC_PROFILE_FIELDS}
+                self._memo[uid] = profile
+                self.cache.put(uid, profile)
+
+        return {uid: self._memo[uid] for uid in wanted}
+
+    async def load(self, uid: Optional[str]) -> dict:
+        if not uid:
+            return {}
+        return (await self.load_many([uid]))[uid]
+
+
+def get_profile_loader() -> UserProfileLoader:
+    """FastAPI dependency: one loader per request."""
+    return UserProfileLoader()
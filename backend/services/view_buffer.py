@@ -0,0 +1,183 @@
+"""Write-behind buffering for trip view counts.
+
+Views are counted in memory per trip and flushed as batched `Increment`
+writes every VIEW_FLUSH_INTERVAL seconds, or sooner once VIEW_FLUSH_MAX_PENDING
+views are waiting. Stored counts lag by at most one interval; the buffer
+is drained on shutdown. Catalog summaries get the same increments once the
+live catalog says which trips are public.
+"""
+import asyncio
+from typing import Optional
+
+from google.api_core.exceptions import NotFound
+
+from core.config import VIEW_FLUSH_INTERVAL, VIEW_FLUSH_MAX_PENDING
+from core.database import db, firestore, get_all, run_db
+from services.catalog_cache import catalog_cache
+from services.catalog_index import catalog_ref
+
+
+# Firestore batches are capped at 500 writes.
+MAX_BATCH_WRITES = 500
+# Trips outside the live catalog whose stored count is remembered for approximate totals.
+MAX_STORED_COUNTS = 10000
+
+
+def _trip_ref(trip_id: str):
+    return db.collection("trips").document(trip_id)
+
+
+class ViewBuffer:
+    def __init__(self, interval: float, max_pending: int):
+        self.interval = interval
+        self.max_pending = max(1, max_pending)
+        self._counts = {}
+        self._pending = 0
+        # Views already written to trips whose summary share waits for the catalog to load.
+        self._unsynced = {}
+        # trip_id -> stored views_count for trips the live catalog does not cover.
+        self._stored = {}
+        self._flush_now: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def record(self, trip_id: str, amount: int = 1) -> int:
+        """Buffer a view; returns the trip's approximate total."""
+        if trip_id not in self._stored and not (catalog_cache.ready and trip_id in catalog_cache):
+            await self._seed(trip_id)
+        self._counts[trip_id] = self._counts.get(trip_id, 0) + amount
+        self._pending += amount
+        if self._pending >= self.max_pending and self._flush_now is not None:
+            self._flush_now.set()
+        return self.approximate_count(trip_id)
+
+    async def _seed(self, trip_id: str):
+        """Remember the stored count of a trip the live catalog cannot answer for (one projected read)."""
+        try:
+            docs = await get_all([_trip_ref(trip_id)], field_paths=["views_count"])
+        except Exception as e:
+            print(f"[WARN] Could not read views for trip {trip_id}: {e}")
+            return
+        stored = next(((doc.to_dict() or {}).get("views_count", 0) for doc in docs if doc.exists), 0)
+        if len(self._stored) >= MAX_STORED_COUNTS:
+            # Dicts keep insertion order: drop the oldest entry.
+            self._stored.pop(next(iter(self._stored)), None)
+        self._stored[trip_id] = stored or 0
+
+    def approximate_count(self, trip_id: str) -> int:
+        entry = catalog_cache.get(trip_id) if catalog_cache.ready else None
+        if entry is not None:
+            stored = entry.get("views_count", 0) or 0
+        else:
+            stored = self._stored.get(trip_id, 0)
+        return stored + self._counts.get(trip_id, 0)
+
+    def _increment_all(self, items: list, done: Optional[set] = None):
+        """Add views to (trip_id, ref, count) items in batches.
+
+        A batch that hits a missing document is redone one write at a time,
+        skipping the missing ones. Trip ids whose write is settled go in `done`.
+        """
+        for start in range(0, len(items), MAX_BATCH_WRITES):
+            chunk = items[start:start + MAX_BATCH_WRITES]
+            batch = db.batch()
+            for _, ref, count in chunk:
+                batch.update(ref, {"views_count": firestore.Increment(count)})
+            try:
+                batch.commit()
+            except NotFound:
+                for trip_id, ref, count in chunk:
+                    try:
+                        ref.update({"views_count": firestore.Increment(count)})
+                    except NotFound:
+                        pass
+                    if done is not None:
+                        done.add(trip_id)
+            if done is not None:
+                done.update(trip_id for trip_id, _, _ in chunk)
+
+    def _commit(self, counts: dict, summary_counts: dict, done: set):
+        # Trips first: a failure here is retried by the next flush. Summaries are
+        # best effort (rebuild_catalog_index repairs them) and never fail the flush.
+        self._increment_all([(tid, _trip_ref(tid), count) for tid, count in counts.items()], done)
+        if not summary_counts:
+            return
+        try:
+            self._increment_all([(tid, catalog_ref(tid), count) for tid, count in summary_counts.items()])
+        except Exception as e:
+            print(f"[WARN] Could not update views on {len(summary_counts)} catalog entries: {e}")
+
+    def _summary_counts(self, counts: dict, owed: dict) -> dict:
+        merged = dict(owed)
+        for trip_id, count in counts.items():
+            merged[trip_id] = merged.get(trip_id, 0) + count
+        if catalog_cache.ready:
+            return {tid: count for tid, count in merged.items() if tid in catalog_cache}
+        # No live catalog: try every trip; missing summaries are skipped one by one.
+        return merged
+
+    async def flush(self) -> int:
+        """Write all buffered views; returns the number of trips flushed."""
+        counts, self._counts, self._pending = self._counts, {}, 0
+        loading = catalog_cache.loading
+        if loading:
+            # Public trips cannot be told apart yet: write trips only, summaries once loaded.
+            owed, summary_counts = {}, {}
+        else:
+            owed, self._unsynced = self._unsynced, {}
+            summary_counts = self._summary_counts(counts, owed)
+        if not counts and not summary_counts:
+            return 0
+
+        done = set()
+        summaries_written = not loading
+        try:
+            await run_db(self._commit, counts, summary_counts, done)
+        except Exception as e:
+            summaries_written = False
+            # Keep what was not written for the next flush instead of dropping it.
+            for trip_id, count in counts.items():
+                if trip_id in done:
+                    continue
+                self._counts[trip_id] = self._counts.get(trip_id, 0) + count
+                self._pending += count
+            for trip_id, count in owed.items():
+                self._unsynced[trip_id] = self._unsynced.get(trip_id, 0) + count
+            print(f"[WARN] View flush failed ({len(counts) - len(done)} trips), will retry: {e}")
+            return 0
+        finally:
+            for trip_id in done:
+                if trip_id in self._stored:
+                    self._stored[trip_id] += counts[trip_id]
+                if not summaries_written:
+                    self._unsynced[trip_id] = self._unsynced.get(trip_id, 0) + counts[trip_id]
+        return len(counts)
+
+    async def _flush_loop(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            await self.flush()
+
+    async def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._flush_now = asyncio.Event()
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        # Let an in-flight flush finish rather than cancelling it halfway through a commit.
+        if self._task is not None:
+            self._stopping = True
+            self._flush_now.set()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        flushed = await self.flush()
+        if flushed:
+            print(f"[OK] Flushed buffered views for {flushed} trips")
+
+
+view_buffer = ViewBuffer(VIEW_FLUSH_INTERVAL, VIEW_FLUSH_MAX_PENDING)
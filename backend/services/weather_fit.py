@@ -0,0 +1,159 @@
+"""Weather-aware reshuffling of trip days and activities (no model round trip)."""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Optional
+
+import numpy as np
+
+from services.routing import CHECKIN_KEYWORDS, is_anchor_activity, optimize_day_order
+from services.text import fold_vietnamese
+
+
+OUTDOOR_TYPES = {
+    "park", "natural_feature", "campground", "amusement_park", "zoo", "beach",
+    "hiking_area", "marina", "rv_park", "stadium",
+}
+INDOOR_TYPES = {
+    "museum", "art_gallery", "aquarium", "shopping_mall", "department_store", "store",
+    "movie_theater", "bowling_alley", "spa", "library", "restaurant", "cafe", "bakery",
+    "bar", "night_club", "casino", "church", "hindu_temple", "lodging",
+}
+# Folded (no diacritics) name keywords, used when Places types are missing or ambiguous.
+OUTDOOR_KEYWORDS = re.compile(
+    r"\b(bai bien|bien|nui|thac|dao|cong vien|vuon|ho|song|deo|ruong|beach|island|mountain|waterfall|park|trekking)\b"
+)
+
+# Swap only when the expected number of outdoor activities hit by rain drops by this much.
+MIN_GAIN = 0.1
+
+
+def outdoor_score(activity: dict) -> int:
+    """1 for outdoor, -1 for indoor, 0 when unknown."""
+    details = activity.get("place_details") if isinstance(activity.get("place_details"), dict) else {}
+    types = set(details.get("types") or [])
+    if types & INDOOR_TYPES:
+        return -1
+    if types & OUTDOOR_TYPES:
+        return 1
+    if OUTDOOR_KEYWORDS.search(fold_vietnamese(str(activity.get("place", "")))):
+        return 1
+    return 0
+
+
+def _rain_weights(trip_plan: dict, n_days: int) -> np.ndarray:
+    """Per-day rain weight in [0, 1]; NaN where there is no forecast."""
+    weights = np.full(n_days, np.nan)
+    for fc in trip_plan.get("weather_forecast") or []:
+        if not isinstance(fc, dict) or not isinstance(fc.get("day"), int):
+            continue
+        i = fc["day"] - 1
+        if 0 <= i < n_days:
+            try:
+                chance = float(fc.get("rain_chance") or 0) / 100.0
+            except (TypeError, ValueError):
+                chance = 0.0
+            weights[i] = 1.0 if fc.get("is_rainy") else min(max(chance, 0.0), 1.0)
+    return weights
+
+
+def _is_pinned_day(day: dict) -> bool:
+    """Days with check-in/check-out stay on their date."""
+    for activity in day.get("activities") or []:
+        if not isinstance(activity, dict):
+            continue
+        text = f"{activity.get('place', '')} {activity.get('description', '')}"
+        if CHECKIN_KEYWORDS.search(text):
+            return True
+    return False
+
+
+def _outdoor_counts(days: list[dict]) -> np.ndarray:
+    return np.array([
+        sum(1 for a in day.get("activities") or [] if isinstance(a, dict) and outdoor_score(a) > 0)
+        for day in days
+    ], dtype=np.float64)
+
+
+def _reorder_days(days: list[dict], rain: np.ndarray) -> bool:
+    """Move outdoor-heavy days onto the driest forecast dates (rearrangement inequality)."""
+    movable = [
+        i for i, day in enumerate(days)
+        if not np.isnan(rain[i]) and not _is_pinned_day(day)
+    ]
+    if len(movable) < 2:
+        return False
+
+    outdoor = _outdoor_counts(days)
+    # Driest dates get the most outdoor days; stable sorts keep ties in place.
+    dates = sorted(movable, key=lambda i: rain[i])
+    contents = sorted(movable, key=lambda i: -outdoor[i])
+    before = float(np.dot(outdoor[movable], rain[movable]))
+    after = float(sum(outdoor[c] * rain[d] for d, c in zip(dates, contents)))
+    if before - after < MIN_GAIN:
+        return False
+
+    originals = list(days)
+    for date_idx, content_idx in zip(dates, contents):
+        day = dict(originals[content_idx])
+        day["day"] = originals[date_idx].get("day", date_idx + 1)
+        days[date_idx] = day
+    return True
+
+
+def _swap_activities(days: list[dict], rain: np.ndarray) -> set[int]:
+    """Trade single outdoor activities on wet days for indoor ones on drier days."""
+    touched: set[int] = set()
+    order = [i for i in np.argsort(-np.nan_to_num(rain, nan=0.0), kind="stable") if not np.isnan(rain[i])]
+    for wet in order:
+        wet_acts = days[wet].get("activities") or []
+        for a_idx, activity in enumerate(wet_acts):
+            if not isinstance(activity, dict) or is_anchor_activity(activity) or outdoor_score(activity) <= 0:
+                continue
+            best: Optional[tuple[float, int, int]] = None
+            for dry in order[::-1]:
+                gap = rain[wet] - rain[dry]
+                if gap < MIN_GAIN:
+                    break
+                for b_idx, other in enumerate(days[dry].get("activities") or []):
+                    if not isinstance(other, dict) or is_anchor_activity(other):
+                        continue
+                    gain = gap * (1 - outdoor_score(other))
+                    if gain >= MIN_GAIN and (best is None or gain > best[0]):
+                        best = (gain, dry, b_idx)
+            if best is None:
+                continue
+            _, dry, b_idx = best
+            dry_acts = days[dry]["activities"]
+            wet_acts[a_idx], dry_acts[b_idx] = dry_acts[b_idx], wet_acts[a_idx]
+            touched.update((wet, dry))
+    return touched
+
+
+def fit_plan_to_weather(trip_plan: dict[str, Any]) -> dict[str, Any]:
+    """Reshuffle days, then single activities, so outdoor stops land on dry days.
+
+    Uses the plan's `weather_forecast`; days without a forecast are left alone.
+    Changed days are re-routed here; callers re-run the time buffers afterwards.
+    """
+    days = trip_plan.get("days") if isinstance(trip_plan, dict) else None
+    if not isinstance(days, list) or len(days) < 2:
+        return trip_plan
+    if not all(isinstance(day, dict) and isinstance(day.get("activities"), list) for day in days):
+        return trip_plan
+
+    rain = _rain_weights(trip_plan, len(days))
+    known = rain[~np.isnan(rain)]
+    if len(known) < 2 or float(known.max() - known.min()) < MIN_GAIN:
+        return trip_plan
+
+    if _reorder_days(days, rain):
+        print("[INFO] Reordered trip days to match the weather forecast")
+
+    touched = _swap_activities(days, rain)
+    for i in touched:
+        days[i]["activities"] = optimize_day_order(days[i]["activities"])
+    if touched:
+        print(f"[INFO] Moved activities between {len(touched)} days for weather")
+    return trip_plan
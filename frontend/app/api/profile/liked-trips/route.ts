@@ -10,7 +10,13 @@ export async function GET(request: NextRequest) {
       return NextResponse.json({ error: 'No authorization header' }, { status: 401 });
     }
 
-    const response = await fetch(`${BACKEND_URL}/api/user/liked-trips`, {
+    const { searchParams } = new URL(request.url);
+    const queryString = searchParams.toString();
+    const url = queryString
+      ? `${BACKEND_URL}/api/user/liked-trips?${queryString}`
+      : `${BACKEND_URL}/api/user/liked-trips`;
+
+    const response = await fetch(url, {
       headers: {
         'Authorization': authHeader,
       },
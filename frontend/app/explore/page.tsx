@@ -1,6 +1,6 @@
 "use client";
 
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { useRouter } from "next/navigation";
 import { useLanguage } from "../../contexts/LanguageContext";
 import TripCard from "../../components/TripCard";
@@ -56,6 +56,8 @@ export default function ExplorePage() {
   const [page, setPage] = useState(1);
   const [hasMore, setHasMore] = useState(false);
   const [total, setTotal] = useState(0);
+  // Page tokens returned by the backend, keyed by filter set and page number
+  const pageCursors = useRef<Record<string, string>>({});
 
   const fetchTrips = async () => {
     try {
@@ -74,6 +76,10 @@ export default function ExplorePage() {
         params.append("category_tags", selectedCategories.join(","));
       if (searchQuery) params.append("search", searchQuery);
 
+      const filterKey = JSON.stringify([selectedDuration, selectedBudget, selectedCategories, sortBy, searchQuery]);
+      const cursor = pageCursors.current[`${filterKey}|${page}`];
+      if (page > 1 && cursor) params.append("cursor", cursor);
+
       const response = await fetch(`/api/explore?${params}`);
 
       if (!response.ok) {
@@ -82,8 +88,9 @@ export default function ExplorePage() {
 
       const data = await response.json();
       setTrips(data.trips);
-      setTotal(data.total);
+      setTotal(data.total ?? data.trips.length);
       setHasMore(data.has_more);
+      if (data.next_cursor) pageCursors.current[`${filterKey}|${page + 1}`] = data.next_cursor;
     } catch (err) {
       setError(err instanceof Error ? err.message : "An error occurred");
     } finally {
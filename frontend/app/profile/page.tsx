@@ -124,6 +124,8 @@ export default function ProfilePage() {
   
   const [profile, setProfile] = useState<UserProfile | null>(null);
   const [likedTrips, setLikedTrips] = useState<LikedTrip[]>([]);
+  const [likedCursor, setLikedCursor] = useState<string | null>(null);
+  const [loadingMoreLiked, setLoadingMoreLiked] = useState(false);
   const [badges, setBadges] = useState<Badge[]>([]);
   const [userStats, setUserStats] = useState<UserStats | null>(null);
   const [userLevel, setUserLevel] = useState<UserLevel | null>(null);
@@ -328,12 +330,14 @@ export default function ProfilePage() {
     }
   };
 
-  const fetchLikedTrips = async () => {
+  const fetchLikedTrips = async (cursor?: string) => {
     if (!user) return;
     
+    if (cursor) setLoadingMoreLiked(true);
     try {
       const token = await getIdToken();
-      const response = await fetch(`/api/profile/liked-trips`, {
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+      const response = await fetch(`/api/profile/liked-trips${query}`, {
         headers: {
           Authorization: `Bearer ${token}`,
         },
@@ -341,10 +345,14 @@ export default function ProfilePage() {
 
       if (response.ok) {
         const data = await response.json();
-        setLikedTrips(data.liked_trips || []);
+        const trips: LikedTrip[] = data.liked_trips || [];
+        setLikedTrips((prev) => (cursor ? [...prev, ...trips] : trips));
+        setLikedCursor(data.has_more ? data.next_cursor || null : null);
       }
     } catch (err) {
       console.error("Failed to fetch liked trips:", err);
+    } finally {
+      setLoadingMoreLiked(false);
     }
   };
 
@@ -848,7 +856,7 @@ export default function ProfilePage() {
                       </div>
                     ))}
                   </div>
-                ) : (
+                ) : likedCursor ? null : (
                   <div className="text-center py-12">
                     <div className="w-16 h-16 mx-auto mb-4 rounded-full bg-gray-100 flex items-center justify-center">
                       <svg className="w-8 h-8 text-gray-400" fill="none" stroke="currentColor" viewBox="0 0 24 24">
@@ -863,6 +871,18 @@ export default function ProfilePage() {
                     </p>
                   </div>
                 )}
+                {likedCursor && (
+                  <div className="flex justify-center mt-6">
+                    <button
+                      className="btn btn-outline btn-primary"
+                      onClick={() => fetchLikedTrips(likedCursor)}
+                      disabled={loadingMoreLiked}
+                    >
+                      {loadingMoreLiked && <span className="loading loading-spinner loading-sm"></span>}
+                      {language === "en" ? "Load more" : "Xem thêm"}
+                    </button>
+                  </div>
+                )}
               </div>
             </div>
           </>